@@ -0,0 +1,171 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import sys
+import threading
+
+import eventlet
+from eventlet import event
+from oslo_context import context
+import six
+
+from networking_odl.common import utils
+
+
+class Batcher(object):
+    """Group items added close together in time and flush them at once.
+
+    The first item added under a batch key schedules the flush of that
+    batch ``window`` seconds later. With a window of 0 the flush runs as
+    soon as the calling greenthread yields, so items added back-to-back by
+    a single API request (e.g. a bulk create) end up in the same batch.
+
+    An item added under the item key of an item still pending in the same
+    batch replaces it, and shares its future, so that only the latest
+    state of an object is flushed.
+
+    add returns the future of the item, an eventlet Event whose wait()
+    returns once the batch was flushed, or raises the error of the item.
+    flush_fn is called as flush_fn(batch_key, items) and may return a list
+    of the errors of the items, in their order, None for an item which
+    succeeded. An error raised by flush_fn is the error of every item of
+    the batch. Items removed or discarded before the flush succeed.
+
+    Flushes run one at a time, so that a flush, e.g. of a batch of subnets,
+    waits for the ones in flight, e.g. of a batch of networks started by
+    its timer, and batches reach flush_fn in the order they were started.
+    flush_fn must not flush its own batcher. The flushes run by the timer
+    use the request context of the call which started the batch.
+    """
+
+    def __init__(self, flush_fn, window=0):
+        self._flush_fn = flush_fn
+        self._window = window
+        self._lock = threading.Lock()
+        # Held by the flush in flight
+        self._flush_lock = threading.Lock()
+        self._batches = collections.OrderedDict()
+        self._timers = {}
+
+    def add(self, batch_key, item, item_key=None):
+        """Add an item to a batch, return its future."""
+        with self._lock:
+            batch = self._batches.get(batch_key)
+            if batch is None:
+                batch = self._batches[batch_key] = collections.OrderedDict()
+                self._timers[batch_key] = eventlet.spawn_after(
+                    self._window, self._timed_flush, context.get_current(),
+                    batch_key)
+            if item_key is None:
+                item_key = object()
+            future = (batch[item_key][1] if item_key in batch else
+                      event.Event())
+            batch[item_key] = (item, future)
+            return future
+
+    def replace(self, batch_key, item_key, item):
+        """Replace an item still pending.
+
+        Return the future of the item, or None if there was none.
+        """
+        with self._lock:
+            batch = self._batches.get(batch_key)
+            if batch is None or item_key not in batch:
+                return None
+            future = batch[item_key][1]
+            batch[item_key] = (item, future)
+            return future
+
+    def remove(self, batch_key, item_key):
+        """Remove an item still pending, return whether there was one.
+
+        The batch is left in place, and flushed even if empty.
+        """
+        with self._lock:
+            batch = self._batches.get(batch_key)
+            if batch is None or item_key not in batch:
+                return False
+            future = batch.pop(item_key)[1]
+        future.send()
+        return True
+
+    def discard(self, batch_key):
+        """Drop a pending batch without flushing it."""
+        with self._lock:
+            if batch_key not in self._batches:
+                return
+            batch = self._batches.pop(batch_key)
+            timer = self._timers.pop(batch_key)
+        timer.cancel()
+        for item, future in batch.values():
+            future.send()
+
+    def _timed_flush(self, ctx, batch_key):
+        with utils.request_context(ctx):
+            self.flush(batch_key)
+
+    def flush(self, batch_key=None):
+        """Flush one batch, or every pending batch if batch_key is None.
+
+        Return once the flushes in flight, if any, completed as well.
+        """
+        if batch_key is None:
+            self.flush_if(lambda key: True)
+        else:
+            self.flush_if(lambda key: key == batch_key)
+
+    def flush_if(self, match):
+        """Flush the pending batches whose key satisfies match(key)."""
+        with self._flush_lock:
+            with self._lock:
+                keys = [key for key in self._batches if match(key)]
+                batches = [(key, self._batches.pop(key)) for key in keys]
+                timers = [self._timers.pop(key) for key in keys]
+            # NOTE: cancelling may switch greenthreads, so it is done
+            # without holding the lock. It does nothing when called from
+            # the timer.
+            for timer in timers:
+                timer.cancel()
+            exc_info = None
+            for key, batch in batches:
+                try:
+                    self._flush_batch(key, batch)
+                except Exception:
+                    # The other batches are flushed before it is reraised
+                    exc_info = exc_info or sys.exc_info()
+            if exc_info is not None:
+                six.reraise(*exc_info)
+
+    def _flush_batch(self, batch_key, batch):
+        items = [item for item, future in batch.values()]
+        futures = [future for item, future in batch.values()]
+        try:
+            errors = self._flush_fn(batch_key, items)
+        except Exception as e:
+            for future in futures:
+                future.send_exception(e)
+            raise
+        if not isinstance(errors, list):
+            errors = []
+        for future, error in six.moves.zip_longest(futures, errors):
+            if error is None:
+                future.send()
+            else:
+                future.send_exception(error)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(items) for items in self._batches.values())
@@ -13,53 +13,82 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import weakref
+
+from oslo_config import cfg
 from oslo_log import log as logging
 
 from neutron.callbacks import events
 from neutron.callbacks import registry
 from neutron.callbacks import resources
 
+from networking_odl.common import batching
+from networking_odl.common import config  # noqa
 from networking_odl.common import constants as odl_const
+from networking_odl.openstack.common._i18n import _LE
 
 LOG = logging.getLogger(__name__)
 
+# Look up the ODL's counterpart resource label and key
+# e.g. resources.SECURITY_GROUP -> odl_const.ODL_SGS
+# Note: 1) url will use dashes instead of underscore;
+#       2) when res is a list, append 's' to odl_res_key
+# Ref: https://github.com/opendaylight/neutron/blob/master
+#      /northbound-api/src/main/java/org/opendaylight
+#      /neutron/northbound/api
+#      /NeutronSecurityGroupRequest.java#L33
+_RESOURCE_MAPPING = {
+    resources.SECURITY_GROUP: (odl_const.ODL_SGS, odl_const.ODL_SG),
+    resources.SECURITY_GROUP_RULE: (odl_const.ODL_SG_RULES,
+                                    odl_const.ODL_SG_RULE),
+}
+_OPS_MAPPING = {
+    events.AFTER_CREATE: odl_const.ODL_CREATE,
+    events.AFTER_UPDATE: odl_const.ODL_UPDATE,
+    events.AFTER_DELETE: odl_const.ODL_DELETE,
+}
+_SUBSCRIPTIONS = (
+    (resources.SECURITY_GROUP, events.AFTER_CREATE),
+    (resources.SECURITY_GROUP, events.AFTER_UPDATE),
+    (resources.SECURITY_GROUP, events.AFTER_DELETE),
+    (resources.SECURITY_GROUP_RULE, events.AFTER_CREATE),
+    (resources.SECURITY_GROUP_RULE, events.AFTER_DELETE),
+)
+
+_Dispatch = collections.namedtuple(
+    '_Dispatch', ['odl_res_type', 'odl_res_key', 'odl_res_type_uri',
+                  'odl_ops'])
+
 
 class OdlSecurityGroupsHandler(object):
 
     def __init__(self, odl_client):
         self.odl_client = odl_client
+        self.rule_batcher = batching.Batcher(self.sync_rule_batch)
+        self._dispatch_table = {}
+        # Security group of the rules being deleted, per request context,
+        # so that the deletes are queued behind the operations of the group
+        self._deleted_rule_sgs = weakref.WeakKeyDictionary()
         self.subscribe()
 
     def sg_callback(self, resource, event, trigger, **kwargs):
-
-        res_key_mapping = {
-            odl_const.ODL_SGS: odl_const.ODL_SG,
-            odl_const.ODL_SG_RULES: odl_const.ODL_SG_RULE,
-        }
-        res_name_mapping = {
-            resources.SECURITY_GROUP: odl_const.ODL_SGS,
-            resources.SECURITY_GROUP_RULE: odl_const.ODL_SG_RULES,
-        }
-        ops_mapping = {
-            events.AFTER_CREATE: odl_const.ODL_CREATE,
-            events.AFTER_UPDATE: odl_const.ODL_UPDATE,
-            events.AFTER_DELETE: odl_const.ODL_DELETE,
-        }
-
-        # Loop up the ODL's counterpart resource label
-        # e.g. resources.SECURITY_GROUP -> odl_const.ODL_SGS
-        # Note: 1) url will use dashes instead of underscore;
-        #       2) when res is a list, append 's' to odl_res_key
-        # Ref: https://github.com/opendaylight/neutron/blob/master
-        #      /northbound-api/src/main/java/org/opendaylight
-        #      /neutron/northbound/api
-        #      /NeutronSecurityGroupRequest.java#L33
+        odl_res_type, odl_res_key, odl_res_type_uri, odl_ops = (
+            self._dispatch_table[(resource, event)])
         res = kwargs.get(resource)
         res_id = kwargs.get("%s_id" % resource)
-        odl_res_type = res_name_mapping[resource]
-        odl_res_key = res_key_mapping[odl_res_type]
-        odl_ops = ops_mapping[event]
-        odl_res_type_uri = odl_res_type.replace('_', '-')
+
+        if (cfg.CONF.ml2_odl.enable_bulk and res is not None and
+                odl_res_type == odl_const.ODL_SG_RULES and
+                odl_ops == odl_const.ODL_CREATE):
+            # The rules created by one request, e.g. a security group from
+            # a Heat template, are sent as a single bulk request once the
+            # request yields. See sync_rule_batch for failures.
+            for rule in (res if type(res) is list else [res]):
+                self.rule_batcher.add(odl_res_type_uri, rule)
+            return
+        # Rules created earlier have to reach ODL first
+        self.rule_batcher.flush()
 
         if type(res) is list:
             odl_res_key += "s"
@@ -69,27 +98,88 @@ class OdlSecurityGroupsHandler(object):
         else:
             odl_res_dict = {odl_res_key: res}
 
-        LOG.debug("Calling sync_from_callback with ODL_OPS (%(odl_ops)s) "
-                  "ODL_RES_TYPE (%(odl_res_type)s) RES_ID (%(res_id)s) "
-                  "ODL_RES_KEY (%(odl_res_key)s) RES (%(res)s) "
-                  "KWARGS (%(kwargs)s)",
-                  {'odl_ops': odl_ops, 'odl_res_type': odl_res_type,
-                   'res_id': res_id, 'odl_res_key': odl_res_key, 'res': res,
-                   'kwargs': kwargs})
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug("Calling sync_from_callback with ODL_OPS (%(odl_ops)s) "
+                      "ODL_RES_TYPE (%(odl_res_type)s) RES_ID (%(res_id)s) "
+                      "ODL_RES_KEY (%(odl_res_key)s) RES (%(res)s)",
+                      {'odl_ops': odl_ops, 'odl_res_type': odl_res_type,
+                       'res_id': res_id, 'odl_res_key': odl_res_key,
+                       'res': res})
+
+        if cfg.CONF.ml2_odl.async_sg_callbacks:
+            self.odl_client.queue_from_callback(
+                self._ordering_key(odl_res_type, odl_ops, res, res_id,
+                                   kwargs),
+                odl_ops, odl_res_type_uri, res_id, odl_res_dict)
+        else:
+            self.odl_client.sync_from_callback(odl_ops, odl_res_type_uri,
+                                               res_id, odl_res_dict)
+
+    def _ordering_key(self, odl_res_type, odl_ops, res, res_id, kwargs):
+        """Return the id of the security group an operation applies to."""
+        if odl_res_type == odl_const.ODL_SGS:
+            return res_id or res['id']
+        if odl_ops == odl_const.ODL_DELETE:
+            sg_id = kwargs.get('security_group_id')
+            if sg_id is None and 'context' in kwargs:
+                rule_sgs = self._deleted_rule_sgs.get(kwargs['context'], {})
+                sg_id = rule_sgs.pop(res_id, None)
+            return sg_id or res_id
+        rules = res if type(res) is list else [res]
+        return rules[0]['security_group_id']
+
+    def rule_before_delete(self, resource, event, trigger, **kwargs):
+        """Look up the security group of a rule before it is deleted."""
+        if not cfg.CONF.ml2_odl.async_sg_callbacks:
+            return
+        context = kwargs['context']
+        rule_id = kwargs['security_group_rule_id']
+        try:
+            rule = trigger.get_security_group_rule(
+                context, rule_id, fields=['security_group_id'])
+        except Exception:
+            # The delete is queued under the id of the rule instead
+            return
+        self._deleted_rule_sgs.setdefault(context, {})[rule_id] = (
+            rule['security_group_id'])
+
+    def sync_rule_batch(self, odl_res_type_uri, rules):
+        """Send a batch of security group rule creates to OpenDaylight.
 
-        self.odl_client.sync_from_callback(odl_ops, odl_res_type_uri, res_id,
-                                           odl_res_dict)
+        The API requests which created the rules have already returned, so a
+        failure marks the driver out of sync for the next operation to run a
+        full resync instead of being raised.
+        """
+        try:
+            if cfg.CONF.ml2_odl.async_sg_callbacks:
+                # The rules of each group are queued behind its operations
+                groups = collections.OrderedDict()
+                for rule in rules:
+                    groups.setdefault(rule['security_group_id'],
+                                      []).append(rule)
+                for sg_id, sg_rules in groups.items():
+                    self.odl_client.queue_bulk_from_callback(
+                        sg_id, odl_const.ODL_SG_RULES, odl_res_type_uri,
+                        sg_rules)
+            else:
+                self.odl_client.sync_bulk_from_callback(
+                    odl_const.ODL_SG_RULES, odl_res_type_uri, rules)
+        except Exception:
+            LOG.exception(_LE("Unable to create %d security group rules"),
+                          len(rules))
+            self.odl_client.out_of_sync = True
 
     def subscribe(self):
-        registry.subscribe(
-            self.sg_callback, resources.SECURITY_GROUP, events.AFTER_CREATE)
-        registry.subscribe(
-            self.sg_callback, resources.SECURITY_GROUP, events.AFTER_UPDATE)
-        registry.subscribe(
-            self.sg_callback, resources.SECURITY_GROUP, events.AFTER_DELETE)
-        registry.subscribe(
-            self.sg_callback, resources.SECURITY_GROUP_RULE,
-            events.AFTER_CREATE)
-        registry.subscribe(
-            self.sg_callback, resources.SECURITY_GROUP_RULE,
-            events.AFTER_DELETE)
+        # NOTE: everything sg_callback needs to know about an event is
+        # computed once here, leaving a single lookup per callback.
+        dispatch_table = {}
+        for resource, event in _SUBSCRIPTIONS:
+            odl_res_type, odl_res_key = _RESOURCE_MAPPING[resource]
+            dispatch_table[(resource, event)] = _Dispatch(
+                odl_res_type, odl_res_key, odl_res_type.replace('_', '-'),
+                _OPS_MAPPING[event])
+            registry.subscribe(self.sg_callback, resource, event)
+        registry.subscribe(self.rule_before_delete,
+                           resources.SECURITY_GROUP_RULE,
+                           events.BEFORE_DELETE)
+        self._dispatch_table = dispatch_table
@@ -13,30 +13,123 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo_context import context
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 import requests
 
+from networking_odl.common import tracing
+from networking_odl.openstack.common._i18n import _LW
+
 
 LOG = logging.getLogger(__name__)
 
+REQUEST_ID_HEADER = 'X-Openstack-Request-Id'
+
+
+def _get_request_id():
+    """Return the request id of the Neutron API request being served."""
+    ctx = context.get_current()
+    return getattr(ctx, 'request_id', None)
+
 
 class OpenDaylightRestClient(object):
 
-    def __init__(self, url, username, password, timeout):
+    def __init__(self, url, username, password, timeout, tracer=None):
         self.url = url
         self.timeout = timeout
         self.auth = (username, password)
+        self.tracer = tracer or tracing.get_tracer()
 
     def sendjson(self, method, urlpath, obj):
         """Send json to the OpenDaylight controller."""
 
         headers = {'Content-Type': 'application/json'}
+        request_id = _get_request_id()
+        if request_id:
+            # NOTE: ties the controller side logs of this call to the
+            # Neutron API request which caused it.
+            headers[REQUEST_ID_HEADER] = request_id
         data = jsonutils.dumps(obj, indent=2) if obj else None
         url = '/'.join([self.url, urlpath])
         LOG.debug("Sending METHOD (%(method)s) URL (%(url)s) JSON (%(obj)s)",
                   {'method': method, 'url': url, 'obj': obj})
-        r = requests.request(method, url=url,
-                             headers=headers, data=data,
-                             auth=self.auth, timeout=self.timeout)
-        r.raise_for_status()
+        span = self.tracer.start_span(
+            'sendjson', method=method, urlpath=urlpath, request_id=request_id,
+            payload_size=len(data) if data else 0)
+        try:
+            r = requests.request(method, url=url,
+                                 headers=headers, data=data,
+                                 auth=self.auth, timeout=self.timeout)
+            span.set_tag('status', r.status_code)
+            r.raise_for_status()
+        except Exception as e:
+            span.set_tag('error', e.__class__.__name__)
+            raise
+        finally:
+            span.finish()
+        return r
+
+    def get_collection(self, collection_name, urlpath=None):
+        """Return the resources of an ODL collection."""
+        urlpath = urlpath or collection_name.replace('_', '-')
+        r = self.sendjson('get', urlpath, None)
+        return r.json().get(collection_name, [])
+
+    def post_bulk(self, collection_name, resources, chunk_size,
+                  urlpath=None):
+        """POST resources to an ODL collection, chunk_size at a time.
+
+        A chunk holding a single resource is sent under the singular key,
+        larger ones under the plural key as ODL expects for bulk requests.
+        The collection is posted to urlpath, by default its name with
+        dashes instead of underscores.
+        """
+        urlpath = urlpath or collection_name.replace('_', '-')
+        for chunk, obj in self._bulk_chunks(collection_name, resources,
+                                            chunk_size):
+            self.sendjson('post', urlpath, obj)
+
+    @staticmethod
+    def _bulk_chunks(collection_name, resources, chunk_size):
+        for i in range(0, len(resources), chunk_size):
+            chunk = resources[i:i + chunk_size]
+            if len(chunk) == 1:
+                obj = {collection_name[:-1]: chunk[0]}
+            else:
+                obj = {collection_name: chunk}
+            yield chunk, obj
+
+    def post_bulk_with_fallback(self, collection_name, resources, chunk_size,
+                                urlpath=None):
+        """POST resources in bulk, one by one for the chunks which fail.
+
+        Return a list of (resource, error) pairs in the order of
+        resources, error being None for the resources created, so that
+        each failure is reported against its own resource.
+        """
+        urlpath = urlpath or collection_name.replace('_', '-')
+        results = []
+        for chunk, obj in self._bulk_chunks(collection_name, resources,
+                                            chunk_size):
+            try:
+                self.sendjson('post', urlpath, obj)
+            except Exception as e:
+                if len(chunk) == 1:
+                    results.append((chunk[0], e))
+                    continue
+                LOG.warning(_LW("Unable to create %(count)d %(collection)s "
+                                "in bulk, creating them one by one"),
+                            {'count': len(chunk),
+                             'collection': collection_name})
+                for resource in chunk:
+                    try:
+                        self.sendjson('post', urlpath,
+                                      {collection_name[:-1]: resource})
+                    except Exception as e:
+                        results.append((resource, e))
+                    else:
+                        results.append((resource, None))
+                continue
+            results.extend((resource, None) for resource in chunk)
+        return results
@@ -24,6 +24,110 @@ odl_opts = [
                help=_("HTTP password for authentication")),
     cfg.IntOpt('timeout', default=10,
                help=_("HTTP timeout in seconds.")),
+    cfg.StrOpt('tracer',
+               help=_("Class path of the tracer receiving a span for each "
+                      "request sent to OpenDaylight, e.g. "
+                      "networking_odl.common.tracing.LoggingTracer. Spans "
+                      "are discarded when unset.")),
+    cfg.BoolOpt('enable_bulk', default=False,
+                help=_("Send the resources created by one Neutron API "
+                       "request, such as a bulk port create, to "
+                       "OpenDaylight as bulk requests instead of one "
+                       "request per resource. The creates of networks, "
+                       "subnets, ports and security group rules are then "
+                       "sent after the API request returns: a failure is "
+                       "logged and triggers a full resync instead of "
+                       "failing the request.")),
+    cfg.IntOpt('bulk_chunk_size', default=100, min=1,
+               help=_("Maximum number of resources sent in a single bulk "
+                      "request to OpenDaylight.")),
+    cfg.IntOpt('update_coalescing_window', default=0, min=0,
+               help=_("Time in milliseconds during which the updates of a "
+                      "resource are coalesced, only its latest state being "
+                      "sent to OpenDaylight at the end of the window. "
+                      "Updates pending when a worker stops are sent by the "
+                      "full sync the driver runs after a restart. 0 sends "
+                      "every update synchronously.")),
+    cfg.IntOpt('dispatch_workers', default=0, min=0,
+               help=_("Maximum number of requests sent concurrently to "
+                      "OpenDaylight, queued by priority class when all "
+                      "workers are busy. 0 sends every request from the "
+                      "thread issuing it, without prioritization.")),
+    cfg.DictOpt('dispatch_weights',
+                default={'interactive': 8, 'update': 4, 'background': 1},
+                help=_("Relative share of the dispatch workers given to "
+                       "each priority class when requests are queued: "
+                       "interactive creates and deletes, updates, and "
+                       "background work such as resyncs.")),
+    cfg.IntOpt('tenant_max_inflight', default=0, min=0,
+               help=_("Maximum number of requests of a single tenant sent "
+                      "concurrently by the dispatch workers, the queued "
+                      "requests of the tenants being served round-robin. "
+                      "0 means no limit.")),
+    cfg.BoolOpt('async_sg_callbacks', default=False,
+                help=_("Send security group changes to OpenDaylight in the "
+                       "background instead of within the API request. "
+                       "Requires dispatch_workers.")),
+    cfg.StrOpt('port_security_groups', default='full',
+               choices=['full', 'id'],
+               help=_("How ports reference their security groups: 'full' "
+                      "embeds the group records and their rules, as "
+                      "required by Helium and Lithium, 'id' sends the "
+                      "group ids only, which Beryllium and later resolve "
+                      "from the security groups they were sent.")),
+    cfg.IntOpt('l3_resync_interval', default=0, min=0,
+               help=_("Interval in seconds between two reconciliations of "
+                      "the routers and floating IPs of OpenDaylight with "
+                      "Neutron. 0 disables the periodic resync.")),
+    cfg.BoolOpt('async_l3', default=False,
+                help=_("Send router and floating IP changes to OpenDaylight "
+                       "in the background, in order per router, instead of "
+                       "within the API request. Requires dispatch_workers, "
+                       "changes are sent synchronously without them. The "
+                       "plugin then starts with a resync, and "
+                       "l3_resync_interval should be set as well.")),
+    cfg.IntOpt('floatingip_batch_window', default=0, min=0,
+               help=_("Time in milliseconds during which floating IP "
+                      "creates are gathered into bulk requests and updates "
+                      "of a floating IP coalesced. The API request waits "
+                      "for its batch to be sent and fails with the error "
+                      "of its floating IP. 0 disables batching.")),
+    cfg.StrOpt('router_update_mode', default='full',
+               choices=['full', 'diff'],
+               help=_("Router updates send either the 'full' router or, "
+                      "with 'diff', only the attributes which changed, "
+                      "for OpenDaylight releases merging partial updates. "
+                      "OpenDaylight replaces the routes of a router as a "
+                      "whole, so 'diff' still sends all the routes when "
+                      "any of them changed.")),
+    cfg.IntOpt('lbaas_stats_interval', default=0, min=0,
+               help=_("Interval in seconds between two collections of the "
+                      "statistics of all the LBaaS v2 load balancers. 0 "
+                      "disables the collection.")),
+    cfg.IntOpt('lbaas_stats_ttl', default=60, min=1,
+               help=_("Time in seconds the collected load balancer "
+                      "statistics are served for.")),
+    cfg.IntOpt('lbaas_member_batch_window', default=0, min=0,
+               help=_("Time in milliseconds during which the LBaaS "
+                      "members added to a pool, and the LBaaS v1 health "
+                      "monitors associated to pools, are gathered into bulk "
+                      "requests. 0 disables batching.")),
+    cfg.IntOpt('lbaas_resync_interval', default=0, min=0,
+               help=_("Interval in seconds between two reconciliations of "
+                      "the LBaaS objects of OpenDaylight with Neutron. 0 "
+                      "disables the periodic resync.")),
+    cfg.IntOpt('lbaas_resync_concurrency', default=4, min=1,
+               help=_("Maximum number of requests sent concurrently by an "
+                      "LBaaS v2 reconciliation.")),
+    cfg.BoolOpt('optimize_firewall_rules', default=False,
+                help=_("Drop the firewall rules shadowed by earlier ones and "
+                       "merge adjacent rules before pushing a policy to "
+                       "OpenDaylight. The rules of OpenDaylight then differ "
+                       "from the Neutron ones, merged rules being pushed "
+                       "under the id of the first one.")),
+    cfg.IntOpt('fwaas_concurrency', default=4, min=1,
+               help=_("Maximum number of firewall rule requests sent "
+                      "concurrently when pushing a firewall policy.")),
 ]
 
 cfg.CONF.register_opts(odl_opts, "ml2_odl")
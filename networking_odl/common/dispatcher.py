@@ -0,0 +1,241 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import sys
+import threading
+
+from oslo_config import cfg
+from oslo_context import context
+import six
+
+from networking_odl.common import config  # noqa
+from networking_odl.common import constants as odl_const
+from networking_odl.common import utils
+
+# Priority classes of the operations sent to OpenDaylight
+INTERACTIVE = 'interactive'
+UPDATE = 'update'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, UPDATE, BACKGROUND)
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_priority(operation):
+    """Return the priority class of a create, update or delete."""
+    if operation == odl_const.ODL_UPDATE:
+        return UPDATE
+    return INTERACTIVE
+
+
+class Operation(object):
+    """A call queued in the dispatcher, and its outcome.
+
+    The call runs with the request context current when it was queued.
+    """
+
+    def __init__(self, priority, tenant_id, fn, args, kwargs):
+        self.priority = priority
+        self.tenant_id = tenant_id
+        self.ordering_key = None
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._context = context.get_current()
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+
+    def run(self):
+        try:
+            with utils.request_context(self._context):
+                self._result = self._fn(*self._args, **self._kwargs)
+        except Exception:
+            self._exc_info = sys.exc_info()
+        finally:
+            self._done.set()
+
+    def wait(self):
+        """Wait for the call to complete and return or raise its outcome."""
+        self._done.wait()
+        if self._exc_info is not None:
+            six.reraise(*self._exc_info)
+        return self._result
+
+
+class _Lane(object):
+    """Queue of one priority class, served round-robin across tenants."""
+
+    def __init__(self):
+        self._queues = collections.OrderedDict()
+
+    def append(self, op):
+        self._queues.setdefault(op.tenant_id, collections.deque()).append(op)
+
+    def ready(self, eligible):
+        return any(eligible(tenant_id) for tenant_id in self._queues)
+
+    def pop(self, eligible):
+        """Pop the oldest call of the next eligible tenant in turn."""
+        for tenant_id in list(self._queues):
+            if not eligible(tenant_id):
+                continue
+            queue = self._queues.pop(tenant_id)
+            op = queue.popleft()
+            if queue:
+                # Move on to the end of the round
+                self._queues[tenant_id] = queue
+            return op
+
+
+class Dispatcher(object):
+    """Run the calls to OpenDaylight on a bounded pool of workers.
+
+    Each priority class has its own queue. Idle workers pick the next call
+    among the non-empty queues by smooth weighted round-robin, so that
+    background work such as a resync only gets its share of the workers
+    while interactive creates and deletes are pending.
+
+    Within a priority class, tenants are served round-robin and each one
+    may be limited to tenant_max_inflight concurrent calls, so a tenant
+    tearing down a large stack does not starve the others. Calls made on
+    behalf of no tenant (tenant_id None) are not limited.
+
+    Calls submitted with submit_ordered run one at a time and in order for
+    a given ordering key, e.g. the id of the object they apply to.
+
+    With no workers, calls run synchronously in the caller's thread.
+    """
+
+    def __init__(self, workers, weights, tenant_max_inflight=0):
+        self._workers = workers
+        self._weights = weights
+        self._tenant_max_inflight = tenant_max_inflight
+        self._lanes = dict((p, _Lane()) for p in PRIORITIES)
+        self._credits = dict.fromkeys(PRIORITIES, 0)
+        self._inflight = collections.defaultdict(int)
+        self._ordered = {}
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, priority, tenant_id, fn, *args, **kwargs):
+        """Queue a call and return its Operation without waiting for it."""
+        op = Operation(priority, tenant_id, fn, args, kwargs)
+        if not self._workers:
+            op.run()
+            return op
+        with self._cond:
+            self._start_workers()
+            self._lanes[priority].append(op)
+            self._cond.notify()
+        return op
+
+    def submit_ordered(self, ordering_key, priority, tenant_id, fn, *args,
+                       **kwargs):
+        """Queue a call to run after those previously queued with the key.
+
+        Returns the Operation of the call without waiting for it.
+        """
+        op = Operation(priority, tenant_id, fn, args, kwargs)
+        op.ordering_key = ordering_key
+        if not self._workers:
+            op.run()
+            return op
+        with self._cond:
+            self._start_workers()
+            if ordering_key in self._ordered:
+                # Released once the calls queued before it have completed
+                self._ordered[ordering_key].append(op)
+            else:
+                self._ordered[ordering_key] = collections.deque()
+                self._lanes[priority].append(op)
+                self._cond.notify()
+        return op
+
+    def call(self, priority, tenant_id, fn, *args, **kwargs):
+        """Queue a call, wait for it and return its result."""
+        return self.submit(priority, tenant_id, fn, *args, **kwargs).wait()
+
+    def _start_workers(self):
+        while len(self._threads) < self._workers:
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _eligible(self, tenant_id):
+        return (tenant_id is None or not self._tenant_max_inflight or
+                self._inflight.get(tenant_id, 0) < self._tenant_max_inflight)
+
+    def _next(self):
+        """Pop the next operation to run, None if there is none."""
+        ready = [p for p in PRIORITIES if self._lanes[p].ready(self._eligible)]
+        if not ready:
+            return None
+        total = 0
+        for priority in PRIORITIES:
+            if priority in ready:
+                self._credits[priority] += self._weights[priority]
+                total += self._weights[priority]
+            else:
+                self._credits[priority] = 0
+        chosen = max(ready, key=lambda p: self._credits[p])
+        self._credits[chosen] -= total
+        op = self._lanes[chosen].pop(self._eligible)
+        self._inflight[op.tenant_id] += 1
+        return op
+
+    def _work(self):
+        while True:
+            with self._cond:
+                op = self._next()
+                while op is None:
+                    self._cond.wait()
+                    op = self._next()
+            op.run()
+            with self._cond:
+                self._inflight[op.tenant_id] -= 1
+                if not self._inflight[op.tenant_id]:
+                    del self._inflight[op.tenant_id]
+                if op.ordering_key is not None:
+                    self._release_next(op.ordering_key)
+                # A call of a tenant at its limit may now be eligible
+                self._cond.notify()
+
+    def _release_next(self, ordering_key):
+        waiting = self._ordered[ordering_key]
+        if waiting:
+            op = waiting.popleft()
+            self._lanes[op.priority].append(op)
+        else:
+            del self._ordered[ordering_key]
+
+
+def _get_weights():
+    weights = cfg.CONF.ml2_odl.dispatch_weights
+    return dict((p, max(int(weights.get(p, 1)), 1)) for p in PRIORITIES)
+
+
+def get_dispatcher():
+    """Return the dispatcher shared by all the OpenDaylight drivers."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher(cfg.CONF.ml2_odl.dispatch_workers,
+                                     _get_weights(),
+                                     cfg.CONF.ml2_odl.tenant_max_inflight)
+        return _dispatcher
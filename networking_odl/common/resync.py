@@ -0,0 +1,124 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+def diff_collection(neutron_resources, odl_resources):
+    """Compare the resources of a collection in Neutron and in ODL.
+
+    Return the Neutron resources missing from ODL, and the ids of the ODL
+    resources which no longer exist in Neutron.
+    """
+    odl_ids = set(resource['id'] for resource in odl_resources)
+    neutron_ids = set(resource['id'] for resource in neutron_resources)
+    missing = [resource for resource in neutron_resources
+               if resource['id'] not in odl_ids]
+    extra = [resource['id'] for resource in odl_resources
+             if resource['id'] not in neutron_ids]
+    return missing, extra
+
+
+def find_changed(neutron_resources, odl_resources):
+    """Return the Neutron resources which differ from their ODL copy.
+
+    Only the attributes ODL reports are compared, ODL leaving out the
+    ones it doesn't model.
+    """
+    odl_by_id = dict((resource['id'], resource) for resource in odl_resources)
+    changed = []
+    for resource in neutron_resources:
+        odl_resource = odl_by_id.get(resource['id'])
+        if odl_resource is not None and any(
+                key in odl_resource and odl_resource[key] != value
+                for key, value in resource.items()):
+            changed.append(resource)
+    return changed
+
+
+def _send_all(client, calls, pool=None):
+    if pool is None:
+        for call in calls:
+            client.sendjson(*call)
+    else:
+        # NOTE: consuming the results reraises the first failure
+        list(pool.starmap(client.sendjson, calls))
+
+
+def reconcile_collection(client, collection_name, neutron_resources,
+                         chunk_size, urlpath=None, update=False, pool=None,
+                         filter_update=None, stale=None):
+    """Make an ODL collection hold the same resources as Neutron.
+
+    The collection is read with a single GET. Missing resources are
+    created by chunked bulk POSTs, the ones Neutron no longer knows of
+    are deleted and, with update, the ones which differ are updated. An
+    update sends a copy of the resource passed through filter_update, if
+    given, to drop the attributes ODL doesn't accept in updates. The
+    updates and deletes run on the given eventlet GreenPool, if any, to
+    bound their concurrency. When stale is a list, the URL paths of the
+    resources to delete are appended to it instead, for the caller to
+    delete them later, e.g. children before parents. Return the resources
+    which were created.
+
+    The reconciliation is reported to the tracer of the client as a
+    'reconcile' span tagged with the number of resources changed.
+    """
+    urlpath = urlpath or collection_name.replace('_', '-')
+    span = client.tracer.start_span('reconcile', collection=collection_name,
+                                    urlpath=urlpath)
+    try:
+        odl_resources = client.get_collection(collection_name, urlpath)
+        missing, extra = diff_collection(neutron_resources, odl_resources)
+        changed = (find_changed(neutron_resources, odl_resources)
+                   if update else [])
+        LOG.debug("Resyncing %(collection)s: %(missing)d missing, "
+                  "%(changed)d changed, %(extra)d stale",
+                  {'collection': collection_name, 'missing': len(missing),
+                   'changed': len(changed), 'extra': len(extra)})
+        span.set_tag('created', len(missing))
+        span.set_tag('updated', len(changed))
+        span.set_tag('deleted', len(extra))
+        client.post_bulk(collection_name, missing, chunk_size, urlpath)
+        calls = []
+        for resource in changed:
+            resource_id = resource['id']
+            if filter_update is not None:
+                resource = dict(resource)
+                filter_update(resource)
+            calls.append(('put', urlpath + '/' + resource_id,
+                          {collection_name[:-1]: resource}))
+        deletes = [urlpath + '/' + resource_id for resource_id in extra]
+        if stale is None:
+            calls += [('delete', path, None) for path in deletes]
+        else:
+            stale.extend(deletes)
+        _send_all(client, calls, pool)
+    except Exception as e:
+        span.set_tag('error', e.__class__.__name__)
+        raise
+    finally:
+        span.finish()
+    return missing
+
+
+def delete_stale(client, stale, pool=None):
+    """Delete the resources at the URL paths gathered by reconcile_collection.
+
+    The deletes run on the given eventlet GreenPool, if any.
+    """
+    _send_all(client, [('delete', urlpath, None) for urlpath in stale], pool)
@@ -0,0 +1,79 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_utils import importutils
+
+from networking_odl.common import config  # noqa
+
+LOG = logging.getLogger(__name__)
+
+
+class Span(object):
+    """A single timed request sent to the OpenDaylight controller."""
+
+    def __init__(self, tracer, name, tags):
+        self.tracer = tracer
+        self.name = name
+        self.tags = dict(tags)
+        self.start_time = time.time()
+        self.end_time = None
+
+    @property
+    def duration(self):
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+
+    def finish(self):
+        self.end_time = time.time()
+        self.tracer.report(self)
+
+
+class NoopTracer(object):
+    """Tracer discarding every span it is handed.
+
+    Custom tracers subclass this one and override report(), which is called
+    once per span when the request it covers has completed.
+    """
+
+    def start_span(self, name, **tags):
+        return Span(self, name, tags)
+
+    def report(self, span):
+        pass
+
+
+class LoggingTracer(NoopTracer):
+    """Tracer writing every finished span to the log."""
+
+    def report(self, span):
+        LOG.info("ODL request %(name)s took %(duration).3fs %(tags)s",
+                 {'name': span.name, 'duration': span.duration,
+                  'tags': span.tags})
+
+
+def get_tracer():
+    """Load the tracer configured by the ml2_odl.tracer option."""
+    tracer = cfg.CONF.ml2_odl.tracer
+    if not tracer:
+        return NoopTracer()
+    return importutils.import_object(tracer)
@@ -13,6 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
+from oslo_context import context
+
 
 def try_del(d, keys):
     """Ignore key errors when deleting from a dictionary."""
@@ -21,3 +25,37 @@ def try_del(d, keys):
             del d[key]
         except KeyError:
             pass
+
+
+def freeze(obj):
+    """Return a hashable equivalent of a structure of dicts and lists."""
+    if isinstance(obj, dict):
+        return frozenset((key, freeze(value)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(value) for value in obj)
+    return obj
+
+
+@contextlib.contextmanager
+def request_context(ctx):
+    """Make ctx the current request context of the thread in the block.
+
+    Calls run on behalf of an API request by another thread or
+    greenthread, which don't inherit its thread-local context, use it to
+    keep reporting the id of the request.
+    """
+    previous = context.get_current()
+    _set_current(ctx)
+    try:
+        yield
+    finally:
+        _set_current(previous)
+
+
+def _set_current(ctx):
+    if ctx is not None:
+        ctx.update_store()
+    else:
+        # NOTE: oslo.context has no public way to clear the current
+        # context, only to install one.
+        context._request_store.context = None
@@ -0,0 +1,88 @@
+#
+# Copyright (C) 2015 OpenStack Foundation
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+#
+
+import six
+import webob.exc
+
+from neutron.api import extensions
+from neutron.common import exceptions as n_exc
+from neutron import manager
+from neutron.plugins.common import constants
+
+from networking_odl.openstack.common._i18n import _
+
+ADD_ROUTER_INTERFACES = 'add_router_interfaces'
+REMOVE_ROUTER_INTERFACES = 'remove_router_interfaces'
+
+
+def _interfaces_handler(action):
+    """Return the handler of a bulk interface action of the routers.
+
+    The action is requested as POST /routers/<id>/action with a body of
+    {<action>: {'interfaces': [<interface info>, ...]}}, each interface
+    info being the body of the matching single interface request. The
+    response holds a result per interface, in order, whose error is None
+    for the interfaces which were attached or detached.
+    """
+    def handler(input_dict, request, id):
+        body = input_dict[action]
+        interfaces_info = (body.get('interfaces')
+                           if isinstance(body, dict) else None)
+        if not isinstance(interfaces_info, list):
+            raise webob.exc.HTTPBadRequest(
+                _("%s expects a list of interfaces") % action)
+        context = request.context
+        plugin = manager.NeutronManager.get_service_plugins()[
+            constants.L3_ROUTER_NAT]
+        try:
+            # Only the routers visible to the tenant are found
+            plugin.get_router(context, id)
+        except n_exc.NotFound as e:
+            raise webob.exc.HTTPNotFound(six.text_type(e))
+        results = getattr(plugin, action)(context, id, interfaces_info)
+        for result in results:
+            if result['error'] is not None:
+                result['error'] = six.text_type(result['error'])
+        return {'router_interfaces': results}
+    return handler
+
+
+class Bulkrouterinterface(extensions.ExtensionDescriptor):
+    """Attach or detach many subnets or ports of a router at once."""
+
+    @classmethod
+    def get_name(cls):
+        return "Bulk router interface"
+
+    @classmethod
+    def get_alias(cls):
+        return "bulk-router-interface"
+
+    @classmethod
+    def get_description(cls):
+        return ("Router actions attaching or detaching several subnets or "
+                "ports in one request, with a result per interface")
+
+    @classmethod
+    def get_updated(cls):
+        return "2015-10-15T10:00:00-00:00"
+
+    @classmethod
+    def get_actions(cls):
+        return [extensions.ActionExtension('routers', action,
+                                           _interfaces_handler(action))
+                for action in (ADD_ROUTER_INTERFACES,
+                               REMOVE_ROUTER_INTERFACES)]
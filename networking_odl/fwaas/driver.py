@@ -14,16 +14,32 @@
 #  under the License.
 #
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log as logging
+import requests
 
+from neutron_fwaas.extensions import firewall as fw_ext
 from neutron_fwaas.services.firewall.drivers import fwaas_base
 
 from networking_odl.common import client as odl_client
 from networking_odl.common import config  # noqa
+from networking_odl.fwaas import policy
+from networking_odl.openstack.common._i18n import _LE, _LI
 
 LOG = logging.getLogger(__name__)
 
+FWAAS_DRIVER_NAME = 'OpenDaylight FWaaS driver'
+FIREWALLS = 'fw/firewalls'
+FIREWALL_POLICIES = 'fw/firewalls_policies'
+FIREWALL_RULES = 'fw/firewalls_rules'
+FIREWALL_ATTRIBUTES = ('id', 'tenant_id', 'name', 'description',
+                       'admin_state_up', 'firewall_policy_id')
+
+
+def _router_id(router_info):
+    return getattr(router_info, 'router_id', None) or router_info.router['id']
+
 
 class OpenDaylightFwaasDriver(fwaas_base.FwaasDriverBase):
 
@@ -42,29 +58,215 @@ class OpenDaylightFwaasDriver(fwaas_base.FwaasDriverBase):
             cfg.CONF.ml2_odl.timeout
         )
 
+        # The last version of each firewall and of the rules of each policy
+        # pushed to OpenDaylight, so that updates only send what changed.
+        self._firewalls = {}
+        self._policies = {}
+
+    def _firewall_payload(self, apply_list, firewall, policy_id):
+        payload = dict((attr, firewall.get(attr))
+                       for attr in FIREWALL_ATTRIBUTES)
+        payload['firewall_policy_id'] = policy_id
+        payload['router_ids'] = sorted(_router_id(router_info)
+                                       for router_info in apply_list)
+        return payload
+
+    def _pushed_rules(self, policy_id):
+        """Return the rules of a policy last pushed to OpenDaylight.
+
+        After a restart the attributes of the rules in OpenDaylight are not
+        known, so the rules of the policy found there are all sent again.
+        None means the policy doesn't exist in OpenDaylight.
+        """
+        if policy_id in self._policies:
+            return self._policies[policy_id]
+        try:
+            r = self.client.sendjson('get',
+                                     FIREWALL_POLICIES + '/' + policy_id, None)
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == requests.codes.not_found:
+                return None
+            raise
+        odl_policy = r.json().get('firewall_policy', {})
+        return [{'id': rule_id}
+                for rule_id in odl_policy.get('firewall_rules') or []]
+
+    def _policy_in_use(self, policy_id):
+        """Whether a firewall of OpenDaylight still uses a policy.
+
+        OpenDaylight is asked rather than relying on the firewalls pushed
+        by this instance, which are unknown after a restart.
+        """
+        return any(odl_firewall.get('firewall_policy_id') == policy_id
+                   for odl_firewall in self.client.get_collection(
+                       'firewalls', FIREWALLS))
+
+    def _send_all(self, firewall, router_ids, requests_):
+        """Send independent requests concurrently and wait for them.
+
+        At most fwaas_concurrency requests are in flight. The failed
+        requests are reported together with the routers of the firewall,
+        and raise FirewallInternalDriverError once all of them completed.
+        """
+        errors = []
+
+        def send(method, urlpath, obj):
+            try:
+                self.client.sendjson(method, urlpath, obj)
+            except Exception as e:
+                errors.append({'method': method, 'urlpath': urlpath,
+                               'error': e})
+
+        pool = eventlet.GreenPool(cfg.CONF.ml2_odl.fwaas_concurrency)
+        for request in requests_:
+            pool.spawn_n(send, *request)
+        pool.waitall()
+        if errors:
+            LOG.error(_LE("Failed to apply firewall %(firewall)s of routers "
+                          "%(routers)s, %(failed)d of %(total)d requests "
+                          "failed: %(errors)s"),
+                      {'firewall': firewall['id'],
+                       'routers': ', '.join(router_ids),
+                       'failed': len(errors), 'total': len(requests_),
+                       'errors': '; '.join(
+                           '%(method)s %(urlpath)s: %(error)s' % error
+                           for error in errors)})
+            raise fw_ext.FirewallInternalDriverError(driver=FWAAS_DRIVER_NAME)
+
+    @staticmethod
+    def _post_rules(rules):
+        """Return the requests creating rules, in bulk chunks."""
+        chunk_size = cfg.CONF.ml2_odl.bulk_chunk_size
+        chunks = [rules[i:i + chunk_size]
+                  for i in range(0, len(rules), chunk_size)]
+        return [('post', FIREWALL_RULES,
+                 {'firewall_rule': chunk[0]} if len(chunk) == 1 else
+                 {'firewall_rules': chunk}) for chunk in chunks]
+
+    def _push_policy(self, firewall, router_ids):
+        """Send the changes of the rules of the policy of a firewall.
+
+        The rules are created, updated and deleted concurrently; the policy,
+        holding their order, is sent once the rules it lists exist.
+        """
+        policy_id = firewall.get('firewall_policy_id')
+        if not policy_id:
+            return
+        rules = policy.compile_rules(firewall)
+        if cfg.CONF.ml2_odl.optimize_firewall_rules:
+            rules, removed = policy.optimize_rules(rules)
+            if removed:
+                LOG.info(_LI("Optimized out %(removed)d of the rules of "
+                             "firewall policy %(policy)s"),
+                         {'removed': removed, 'policy': policy_id})
+        old_rules = self._pushed_rules(policy_id)
+        odl_policy = {'id': policy_id,
+                      'tenant_id': firewall.get('tenant_id'),
+                      'firewall_rules': [rule['id'] for rule in rules]}
+        if old_rules is None:
+            self._send_all(firewall, router_ids, self._post_rules(rules))
+            self.client.sendjson('post', FIREWALL_POLICIES,
+                                 {'firewall_policy': odl_policy})
+            self._policies[policy_id] = rules
+            return
+
+        diff = policy.diff_rules(old_rules, rules)
+        LOG.debug("Firewall policy %(policy)s: %(inserted)d rules inserted, "
+                  "%(removed)d removed, %(changed)d changed and %(moved)d "
+                  "moved",
+                  {'policy': policy_id, 'inserted': len(diff.inserted),
+                   'removed': len(diff.removed),
+                   'changed': len(diff.changed), 'moved': len(diff.moved)})
+        self._send_all(firewall, router_ids,
+                       self._post_rules(diff.inserted) +
+                       [('put', FIREWALL_RULES + '/' + rule['id'],
+                         {'firewall_rule': rule}) for rule in diff.changed])
+        if diff.inserted or diff.removed or diff.moved:
+            # The order of the rules is only carried by the policy
+            self.client.sendjson('put', FIREWALL_POLICIES + '/' + policy_id,
+                                 {'firewall_policy': odl_policy})
+        self._send_all(firewall, router_ids,
+                       [('delete', FIREWALL_RULES + '/' + rule_id, None)
+                        for rule_id in diff.removed])
+        self._policies[policy_id] = rules
+
+    def _push_firewall(self, payload):
+        old_payload = self._firewalls.get(payload['id'])
+        if old_payload is None:
+            self.client.sendjson('post', FIREWALLS, {'firewall': payload})
+        elif payload != old_payload:
+            self.client.sendjson('put', FIREWALLS + '/' + payload['id'],
+                                 {'firewall': payload})
+        self._firewalls[payload['id']] = payload
+
+    def _apply(self, apply_list, firewall, default_policy=False):
+        """Push a firewall and its policy for all the routers of apply_list.
+
+        OpenDaylight takes the routers of a firewall as one of its
+        attributes rather than per router, so the firewall is sent once
+        whatever the number of routers.
+        """
+        policy_id = None if default_policy else firewall.get(
+            'firewall_policy_id')
+        payload = self._firewall_payload(apply_list, firewall, policy_id)
+        try:
+            if not default_policy:
+                self._push_policy(firewall, payload['router_ids'])
+            self._push_firewall(payload)
+        except Exception as e:
+            if not isinstance(e, fw_ext.FirewallInternalDriverError):
+                LOG.exception(_LE("Failed to apply firewall %s on "
+                                  "OpenDaylight"), firewall['id'])
+            # Start over from what OpenDaylight holds on the next push
+            self._policies.pop(firewall.get('firewall_policy_id'), None)
+            raise fw_ext.FirewallInternalDriverError(driver=FWAAS_DRIVER_NAME)
+
     def create_firewall(self, apply_list, firewall):
         """Create the Firewall with default (drop all) policy.
 
         The default policy will be applied on all the interfaces of
         trusted zone.
         """
-        pass
+        self._apply(apply_list, firewall)
 
     def delete_firewall(self, apply_list, firewall):
         """Delete firewall.
 
         Removes all policies created by this instance and frees up
-        all the resources.
+        all the resources. The policy and its rules are kept while another
+        firewall of OpenDaylight uses them.
         """
-        pass
+        policy_id = firewall.get('firewall_policy_id')
+        try:
+            self.client.sendjson('delete', FIREWALLS + '/' + firewall['id'],
+                                 None)
+            self._firewalls.pop(firewall['id'], None)
+            if policy_id and not self._policy_in_use(policy_id):
+                rules = self._pushed_rules(policy_id)
+                self._policies.pop(policy_id, None)
+                if rules is None:
+                    return
+                self.client.sendjson(
+                    'delete', FIREWALL_POLICIES + '/' + policy_id, None)
+                self._send_all(
+                    firewall, [_router_id(ri) for ri in apply_list],
+                    [('delete', FIREWALL_RULES + '/' + rule['id'], None)
+                     for rule in rules])
+        except fw_ext.FirewallInternalDriverError:
+            raise
+        except Exception:
+            LOG.exception(_LE("Failed to delete firewall %s on "
+                              "OpenDaylight"), firewall['id'])
+            raise fw_ext.FirewallInternalDriverError(driver=FWAAS_DRIVER_NAME)
 
     def update_firewall(self, apply_list, firewall):
         """Apply the policy on all trusted interfaces.
 
         Remove previous policy and apply the new policy on all trusted
-        interfaces.
+        interfaces. Only the rules which changed since the policy was last
+        pushed are sent to OpenDaylight.
         """
-        pass
+        self._apply(apply_list, firewall)
 
     def apply_default_policy(self, apply_list, firewall):
         """Apply the default policy on all trusted interfaces.
@@ -72,4 +274,4 @@ class OpenDaylightFwaasDriver(fwaas_base.FwaasDriverBase):
         Remove current policy and apply the default policy on all trusted
         interfaces.
         """
-        pass
+        self._apply(apply_list, firewall, default_policy=True)
@@ -0,0 +1,182 @@
+#
+# Copyright (C) 2015 OpenStack Foundation
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+#
+
+import bisect
+import collections
+
+import netaddr
+
+# Attributes of a firewall rule sent to OpenDaylight. The position of a
+# rule is given by the order of the rules of its policy instead, so that
+# inserting a rule doesn't change the other ones.
+RULE_ATTRIBUTES = ('id', 'tenant_id', 'name', 'description',
+                   'firewall_policy_id', 'shared', 'protocol', 'ip_version',
+                   'source_ip_address', 'destination_ip_address',
+                   'source_port', 'destination_port', 'action', 'enabled')
+
+# Attributes a rule matches traffic on, besides the protocol and addresses
+PORT_ATTRIBUTES = ('source_port', 'destination_port')
+CIDR_ATTRIBUTES = ('source_ip_address', 'destination_ip_address')
+MATCH_ATTRIBUTES = (('protocol', 'ip_version') + CIDR_ATTRIBUTES +
+                    PORT_ATTRIBUTES)
+
+RuleDiff = collections.namedtuple(
+    'RuleDiff', ['inserted', 'removed', 'changed', 'moved'])
+
+
+def compile_rules(firewall):
+    """Return the enabled rules of the policy of a firewall, in order."""
+    return [dict((attr, rule.get(attr)) for attr in RULE_ATTRIBUTES)
+            for rule in firewall.get('firewall_rule_list') or []
+            if rule.get('enabled', True)]
+
+
+def _longest_increasing(indexes):
+    """Return the set of the values of a longest increasing subsequence."""
+    tails = []
+    tail_at = []
+    previous = [None] * len(indexes)
+    for i, index in enumerate(indexes):
+        length = bisect.bisect_left(tails, index)
+        if length == len(tails):
+            tails.append(index)
+            tail_at.append(i)
+        else:
+            tails[length] = index
+            tail_at[length] = i
+        previous[i] = tail_at[length - 1] if length else None
+    kept = set()
+    i = tail_at[-1] if tail_at else None
+    while i is not None:
+        kept.add(indexes[i])
+        i = previous[i]
+    return kept
+
+
+def diff_rules(old_rules, new_rules):
+    """Compute the changes turning an ordered rule list into another.
+
+    Return a RuleDiff of the rules inserted, the ids of the rules
+    removed, the rules whose attributes changed, and the ids of the rules
+    which moved relative to the others. The moved rules are the fewest
+    which, taken out, leave the remaining common rules in the same order.
+    """
+    old_by_id = dict((rule['id'], rule) for rule in old_rules)
+    new_ids = set(rule['id'] for rule in new_rules)
+    inserted = [rule for rule in new_rules if rule['id'] not in old_by_id]
+    removed = [rule['id'] for rule in old_rules if rule['id'] not in new_ids]
+    changed = [rule for rule in new_rules if rule['id'] in old_by_id and
+               rule != old_by_id[rule['id']]]
+
+    old_index = dict((rule['id'], i) for i, rule in enumerate(old_rules))
+    common = [rule['id'] for rule in new_rules if rule['id'] in old_by_id]
+    kept = _longest_increasing([old_index[rule_id] for rule_id in common])
+    moved = [rule_id for rule_id in common if old_index[rule_id] not in kept]
+    return RuleDiff(inserted, removed, changed, moved)
+
+
+def _port_range(port):
+    """Return the (min, max) range of a port or port range like '80:90'."""
+    low, _sep, high = str(port).partition(':')
+    return int(low), int(high or low)
+
+
+def _format_port_range(low, high):
+    return str(low) if low == high else '%d:%d' % (low, high)
+
+
+def _covers(match, other, attr):
+    """Whether the values of attr of two rules make the first cover the
+    traffic of the second. An unset value matches any traffic.
+    """
+    value, other_value = match[attr], other[attr]
+    if value is None:
+        return True
+    if other_value is None:
+        return False
+    if attr in CIDR_ATTRIBUTES:
+        return netaddr.IPNetwork(other_value) in netaddr.IPNetwork(value)
+    if attr in PORT_ATTRIBUTES:
+        low, high = _port_range(value)
+        other_low, other_high = _port_range(other_value)
+        return low <= other_low and other_high <= high
+    return value == other_value
+
+
+def _shadows(rule, other):
+    """Whether rule matches all the traffic other matches."""
+    return all(_covers(rule, other, attr) for attr in MATCH_ATTRIBUTES)
+
+
+def _merge_values(attr, value, other_value):
+    """Return the union of two values of attr, None if it isn't one value."""
+    if value is None or other_value is None:
+        return None
+    if attr in CIDR_ATTRIBUTES:
+        merged = netaddr.cidr_merge([value, other_value])
+        return str(merged[0]) if len(merged) == 1 else None
+    if attr in PORT_ATTRIBUTES:
+        low, high = _port_range(value)
+        other_low, other_high = _port_range(other_value)
+        if other_low > high + 1 or low > other_high + 1:
+            return None
+        return _format_port_range(min(low, other_low), max(high, other_high))
+    return None
+
+
+def _merge(rule, other):
+    """Return a rule matching the traffic of two adjacent rules, or None.
+
+    Rules merge when they have the same action and only differ by one
+    port range or CIDR, and both values join into one range or CIDR.
+    """
+    if rule['action'] != other['action']:
+        return None
+    differing = [attr for attr in MATCH_ATTRIBUTES
+                 if rule[attr] != other[attr]]
+    if len(differing) != 1:
+        return None
+    attr = differing[0]
+    merged_value = _merge_values(attr, rule[attr], other[attr])
+    if merged_value is None:
+        return None
+    merged = dict(rule)
+    merged[attr] = merged_value
+    return merged
+
+
+def optimize_rules(rules):
+    """Remove the rules which can never match, and merge adjacent ones.
+
+    A rule is dropped when an earlier rule matches all its traffic, then
+    adjacent rules with the same action are merged into the first one when
+    their port ranges or CIDRs join. Neither changes what traffic the
+    policy allows. Return the optimized rules and the number of rules
+    removed.
+    """
+    kept = []
+    for rule in rules:
+        if not any(_shadows(earlier, rule) for earlier in kept):
+            kept.append(rule)
+
+    optimized = []
+    for rule in kept:
+        merged = _merge(optimized[-1], rule) if optimized else None
+        if merged is not None:
+            optimized[-1] = merged
+        else:
+            optimized.append(rule)
+    return optimized, len(rules) - len(optimized)
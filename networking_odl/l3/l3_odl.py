@@ -14,23 +14,38 @@
 #  under the License.
 #
 
+import atexit
+import collections
+
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import excutils
+import requests
 
+from neutron.api import extensions
 from neutron.api.rpc.agentnotifiers import l3_rpc_agent_api
 from neutron.api.rpc.handlers import l3_rpc
 from neutron.common import constants as q_const
 from neutron.common import rpc as n_rpc
 from neutron.common import topics
+from neutron.common import utils
+from neutron import context as neutron_context
 from neutron.db import extraroute_db
 from neutron.db import l3_agentschedulers_db
 from neutron.db import l3_dvr_db
 from neutron.db import l3_gwmode_db
 from neutron.plugins.common import constants
 
+from networking_odl.common import batching
 from networking_odl.common import client as odl_client
 from networking_odl.common import config  # noqa
+from networking_odl.common import dispatcher
+from networking_odl.common import resync
 from networking_odl.common import utils as odl_utils
+from networking_odl import extensions as odl_extensions
+from networking_odl.openstack.common._i18n import _LE
+from networking_odl.openstack.common._i18n import _LW
+from networking_odl.openstack.common import loopingcall
 
 try:
     from neutron.db.db_base_plugin_v2 import common_db_mixin
@@ -60,9 +75,11 @@ class OpenDaylightL3RouterPlugin(
     request/response.
     """
     supported_extension_aliases = ["dvr", "router", "ext-gw-mode",
-                                   "extraroute"]
+                                   "extraroute", "bulk-router-interface"]
+    out_of_sync = False
 
     def __init__(self):
+        extensions.append_api_extensions_path(odl_extensions.__path__)
         self.setup_rpc()
         self.client = odl_client.OpenDaylightRestClient(
             cfg.CONF.ml2_odl.url,
@@ -70,6 +87,38 @@ class OpenDaylightL3RouterPlugin(
             cfg.CONF.ml2_odl.password,
             cfg.CONF.ml2_odl.timeout
         )
+        # Router of the floating IPs, see _fip_ordering_key
+        self._fip_routers = {}
+        # Routers whose interface could not be added, see resync
+        self._interface_routers = set()
+        window = cfg.CONF.ml2_odl.floatingip_batch_window / 1000.0
+        self.fip_create_batcher = batching.Batcher(
+            self.sync_floatingip_creates, window=window)
+        self.fip_update_batcher = batching.Batcher(
+            self.sync_floatingip_update, window=window)
+        # NOTE: atexit only runs when the process exits normally, not in
+        # the API workers, which end with os._exit(). The batched or queued
+        # changes lost by a restart are sent by the resync the plugin then
+        # starts with.
+        atexit.register(self.flush_pending)
+        if window or self._async_l3():
+            self.out_of_sync = True
+        if (cfg.CONF.ml2_odl.async_l3 and
+                not cfg.CONF.ml2_odl.dispatch_workers):
+            LOG.warning(_LW("async_l3 requires dispatch_workers, router and "
+                            "floating IP changes are sent synchronously"))
+        elif (self._async_l3() and
+                not cfg.CONF.ml2_odl.l3_resync_interval):
+            LOG.warning(_LW("async_l3 is set without l3_resync_interval, "
+                            "the changes which failed to reach OpenDaylight "
+                            "are only resynced by the next router or "
+                            "floating IP operation"))
+        self.resync_loop = None
+        interval = cfg.CONF.ml2_odl.l3_resync_interval
+        if interval:
+            self.resync_loop = loopingcall.FixedIntervalLoopingCall(
+                self.periodic_resync)
+            self.resync_loop.start(interval, initial_delay=interval)
 
     def setup_rpc(self):
         self.topic = topics.L3PLUGIN
@@ -89,50 +138,309 @@ class OpenDaylightL3RouterPlugin(
         return ("L3 Router Service Plugin for basic L3 forwarding"
                 " using OpenDaylight")
 
+    @staticmethod
+    def _async_l3():
+        # Without dispatch workers, queued calls would run inline and their
+        # failures would no longer reach the API caller
+        return bool(cfg.CONF.ml2_odl.async_l3 and
+                    cfg.CONF.ml2_odl.dispatch_workers)
+
     def filter_update_router_attributes(self, router):
         """Filter out router attributes for an update operation."""
         odl_utils.try_del(router, ['id', 'tenant_id', 'status'])
 
+    def _sendjson(self, method, urlpath, obj, ordering_key, tenant_id=None):
+        """Send a change committed to the Neutron DB over to OpenDaylight.
+
+        Once a call failed, the next one resyncs the routers, their
+        interfaces and the floating IPs with the DB first. The objects a
+        resync reads from the DB already hold a create or a delete, which
+        is then not sent again, while updates and interface changes are.
+
+        With ml2_odl.async_l3 and dispatch workers, the change is queued
+        and sent in order with the other changes of the same ordering key,
+        i.e. of the same router, without the API request waiting for it.
+        """
+        if self.out_of_sync:
+            self.resync()
+            if method != 'put':
+                return
+        if self._async_l3():
+            priority = (dispatcher.UPDATE if method == 'put' else
+                        dispatcher.INTERACTIVE)
+            dispatcher.get_dispatcher().submit_ordered(
+                ordering_key, priority, tenant_id, self._deliver, method,
+                urlpath, obj)
+            return
+        try:
+            self.client.sendjson(method, urlpath, obj)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_LE("Unable to send %(method)s %(urlpath)s to "
+                              "OpenDaylight"),
+                          {'method': method, 'urlpath': urlpath})
+                self._set_out_of_sync(urlpath)
+
+    def _deliver(self, method, urlpath, obj):
+        """Send a change, return the error if it failed."""
+        try:
+            self.client.sendjson(method, urlpath, obj)
+        except Exception as e:
+            # NOTE: the API request may have returned already. The next
+            # change resyncs the routers, their interfaces and the floating
+            # IPs with the Neutron DB, which recovers this one.
+            LOG.exception(_LE("Unable to send %(method)s %(urlpath)s to "
+                              "OpenDaylight"),
+                          {'method': method, 'urlpath': urlpath})
+            self._set_out_of_sync(urlpath)
+            return e
+
+    def _set_out_of_sync(self, urlpath):
+        """Have the next resync recover the change sent to urlpath."""
+        self.out_of_sync = True
+        parts = urlpath.split('/')
+        if parts[0] == ROUTERS and parts[-1] == 'add_router_interface':
+            self._interface_routers.add(parts[1])
+
+    def _fip_ordering_key(self, fip_id, router_id=None, delete=False):
+        """Order the changes of a floating IP behind those of its router."""
+        if delete:
+            return self._fip_routers.pop(fip_id, fip_id)
+        if router_id:
+            self._fip_routers[fip_id] = router_id
+            return router_id
+        return self._fip_routers.get(fip_id, fip_id)
+
+    def _batch_floatingips(self):
+        return (cfg.CONF.ml2_odl.floatingip_batch_window and
+                not self.out_of_sync)
+
+    def flush_pending(self):
+        """Send the floating IP changes waiting in a batch."""
+        self.fip_create_batcher.flush()
+        self.fip_update_batcher.flush()
+
+    def sync_floatingip_creates(self, batch_key, fips):
+        """Create a batch of floating IPs with bulk requests.
+
+        Return the error of each floating IP, for the API requests which
+        created them to fail with it. With async_l3, the floating IPs of
+        each router are queued behind the other changes of the router
+        instead: failures are logged and recovered by the next resync.
+        """
+        if not self._async_l3():
+            return self._create_floatingips(fips)
+        groups = collections.OrderedDict()
+        for fip in fips:
+            ordering_key = self._fip_ordering_key(fip['id'],
+                                                  fip['router_id'])
+            groups.setdefault(ordering_key, []).append(fip)
+        for ordering_key, group in groups.items():
+            dispatcher.get_dispatcher().submit_ordered(
+                ordering_key, dispatcher.INTERACTIVE, None,
+                self._create_floatingips, group)
+
+    def _create_floatingips(self, fips):
+        """Create floating IPs in bulk, one by one for the chunks which
+        fail so that each failure is reported against its floating IP.
+        Return the error of each floating IP, None if it was created.
+        """
+        results = self.client.post_bulk_with_fallback(
+            FLOATINGIPS, fips, cfg.CONF.ml2_odl.bulk_chunk_size)
+        for fip, error in results:
+            if error is not None:
+                LOG.error(_LE("Unable to create floating IP %(fip_id)s in "
+                              "OpenDaylight: %(error)s"),
+                          {'fip_id': fip['id'], 'error': error})
+                self.out_of_sync = True
+        return [error for fip, error in results]
+
+    def sync_floatingip_update(self, fip_id, fips):
+        """Send the latest state of a floating IP updated in a window."""
+        # Floating IPs created earlier have to reach ODL first
+        self.fip_create_batcher.flush()
+        fip = fips[-1]
+        urlpath = FLOATINGIPS + "/" + fip_id
+        obj = {FLOATINGIPS[:-1]: fip}
+        if self._async_l3():
+            dispatcher.get_dispatcher().submit_ordered(
+                self._fip_ordering_key(fip_id, fip['router_id']),
+                dispatcher.UPDATE, fip['tenant_id'], self._deliver, 'put',
+                urlpath, obj)
+        else:
+            return [self._deliver('put', urlpath, obj)]
+
+    def periodic_resync(self):
+        try:
+            self.resync(force=True)
+        except Exception:
+            LOG.exception(_LE("Unable to resync L3 resources with "
+                              "OpenDaylight"))
+
+    @utils.synchronized('odl-l3-resync')
+    def resync(self, force=False):
+        """Reconcile the routers and floating IPs of ODL with Neutron.
+
+        Each collection is read from ODL in one request. Missing objects
+        are created in bulk, changed ones updated and the objects deleted
+        from Neutron are deleted. The interfaces are then added to the
+        routers just created and to those an interface could not be added
+        to. Transition to the in-sync state once all of them are.
+        """
+        if not (force or self.out_of_sync):
+            return
+        self.out_of_sync = True
+        context = neutron_context.get_admin_context()
+        chunk_size = cfg.CONF.ml2_odl.bulk_chunk_size
+        interface_routers = set(self._interface_routers)
+        routers = self.get_routers(context)
+        created = resync.reconcile_collection(
+            self.client, ROUTERS, routers, chunk_size, update=True,
+            filter_update=self.filter_update_router_attributes)
+        interface_routers.update(router['id'] for router in created)
+        failed = self._resync_router_interfaces(
+            context, [router for router in routers
+                      if router['id'] in interface_routers])
+        resync.reconcile_collection(
+            self.client, FLOATINGIPS, self.get_floatingips(context),
+            chunk_size, update=True)
+        self._interface_routers.difference_update(interface_routers)
+        self._interface_routers.update(failed)
+        self.out_of_sync = bool(failed)
+
+    def _resync_router_interfaces(self, context, routers):
+        """Add the interfaces of routers to ODL.
+
+        An interface ODL has already is left alone. Return the ids of the
+        routers an interface could not be added to.
+        """
+        failed = set()
+        if not routers:
+            return failed
+        routers = dict((router['id'], router) for router in routers)
+        filters = {'device_id': list(routers),
+                   'device_owner': list(q_const.ROUTER_INTERFACE_OWNERS)}
+        ports = self._core_plugin.get_ports(context, filters=filters)
+        for port in ports:
+            router_id = port['device_id']
+            url = ROUTERS + "/" + router_id + "/add_router_interface"
+            for fixed_ip in port['fixed_ips']:
+                router_dict = {'subnet_id': fixed_ip['subnet_id'],
+                               'port_id': port['id'],
+                               'id': router_id,
+                               'tenant_id': routers[router_id]['tenant_id']}
+                try:
+                    self.client.sendjson('put', url, router_dict)
+                except Exception as e:
+                    if (isinstance(e, requests.exceptions.HTTPError) and
+                            e.response.status_code ==
+                            requests.codes.conflict):
+                        # ODL has the interface already
+                        continue
+                    LOG.error(_LE("Unable to add interface %(port_id)s to "
+                                  "router %(router_id)s in OpenDaylight: "
+                                  "%(error)s"),
+                              {'port_id': port['id'],
+                               'router_id': router_id, 'error': e})
+                    failed.add(router_id)
+        return failed
+
     def create_router(self, context, router):
         router_dict = super(OpenDaylightL3RouterPlugin, self).create_router(
             context, router)
         url = ROUTERS
-        self.client.sendjson('post', url, {ROUTERS[:-1]: router_dict})
+        self._sendjson('post', url, {ROUTERS[:-1]: router_dict},
+                       router_dict['id'], router_dict['tenant_id'])
         return router_dict
 
+    def diff_router(self, original, router):
+        """Return the attributes of a router which changed in an update.
+
+        The routes are compared as a set. When they changed they are all
+        sent, ODL replacing the routes of the router as a whole and having
+        no request adding or removing a single route.
+        """
+        changed = dict((key, value) for key, value in router.items()
+                       if original.get(key) != value and key != 'routes')
+        if 'routes' in router:
+            old_routes = set(odl_utils.freeze(route)
+                             for route in original.get('routes') or [])
+            new_routes = set(odl_utils.freeze(route)
+                             for route in router['routes'] or [])
+            if old_routes != new_routes:
+                LOG.debug("Router %(id)s routes: %(added)d added, "
+                          "%(removed)d removed",
+                          {'id': router['id'],
+                           'added': len(new_routes - old_routes),
+                           'removed': len(old_routes - new_routes)})
+                changed['routes'] = router['routes']
+        self.filter_update_router_attributes(changed)
+        return changed
+
     def update_router(self, context, id, router):
+        diff_mode = cfg.CONF.ml2_odl.router_update_mode == 'diff'
+        if diff_mode:
+            original = self.get_router(context, id)
         router_dict = super(OpenDaylightL3RouterPlugin, self).update_router(
             context, id, router)
         url = ROUTERS + "/" + id
-        resource = router_dict.copy()
-        self.filter_update_router_attributes(resource)
-        self.client.sendjson('put', url, {ROUTERS[:-1]: resource})
+        if diff_mode:
+            resource = self.diff_router(original, router_dict)
+            if not resource:
+                return router_dict
+        else:
+            resource = router_dict.copy()
+            self.filter_update_router_attributes(resource)
+        self._sendjson('put', url, {ROUTERS[:-1]: resource}, id,
+                       router_dict['tenant_id'])
         return router_dict
 
     def delete_router(self, context, id):
         super(OpenDaylightL3RouterPlugin, self).delete_router(context, id)
         url = ROUTERS + "/" + id
-        self.client.sendjson('delete', url, None)
+        self._sendjson('delete', url, None, id)
 
     def create_floatingip(self, context, floatingip,
                           initial_status=q_const.FLOATINGIP_STATUS_ACTIVE):
         fip_dict = super(OpenDaylightL3RouterPlugin, self).create_floatingip(
             context, floatingip, initial_status)
+        if self._batch_floatingips():
+            # Raises the error of this floating IP once its batch is sent
+            self.fip_create_batcher.add(FLOATINGIPS, fip_dict,
+                                        item_key=fip_dict['id']).wait()
+            return fip_dict
         url = FLOATINGIPS
-        self.client.sendjson('post', url, {FLOATINGIPS[:-1]: fip_dict})
+        self._sendjson('post', url, {FLOATINGIPS[:-1]: fip_dict},
+                       self._fip_ordering_key(fip_dict['id'],
+                                              fip_dict['router_id']),
+                       fip_dict['tenant_id'])
         return fip_dict
 
     def update_floatingip(self, context, id, floatingip):
         fip_dict = super(OpenDaylightL3RouterPlugin, self).update_floatingip(
             context, id, floatingip)
+        if self._batch_floatingips():
+            # An update of a floating IP not created yet amends its create
+            future = self.fip_create_batcher.replace(FLOATINGIPS, id,
+                                                     fip_dict)
+            if future is None:
+                future = self.fip_update_batcher.add(id, fip_dict,
+                                                     item_key=id)
+            future.wait()
+            return fip_dict
         url = FLOATINGIPS + "/" + id
-        self.client.sendjson('put', url, {FLOATINGIPS[:-1]: fip_dict})
+        self._sendjson('put', url, {FLOATINGIPS[:-1]: fip_dict},
+                       self._fip_ordering_key(id, fip_dict['router_id']),
+                       fip_dict['tenant_id'])
         return fip_dict
 
     def delete_floatingip(self, context, id):
         super(OpenDaylightL3RouterPlugin, self).delete_floatingip(context, id)
+        self.fip_create_batcher.flush()
+        self.fip_update_batcher.discard(id)
         url = FLOATINGIPS + "/" + id
-        self.client.sendjson('delete', url, None)
+        self._sendjson('delete', url, None,
+                       self._fip_ordering_key(id, delete=True))
 
     def add_router_interface(self, context, router_id, interface_info):
         new_router = super(
@@ -141,7 +449,8 @@ class OpenDaylightL3RouterPlugin(
         url = ROUTERS + "/" + router_id + "/add_router_interface"
         router_dict = self._generate_router_dict(router_id, interface_info,
                                                  new_router)
-        self.client.sendjson('put', url, router_dict)
+        self._sendjson('put', url, router_dict, router_id,
+                       router_dict['tenant_id'])
         return new_router
 
     def remove_router_interface(self, context, router_id, interface_info):
@@ -151,9 +460,73 @@ class OpenDaylightL3RouterPlugin(
         url = ROUTERS + "/" + router_id + "/remove_router_interface"
         router_dict = self._generate_router_dict(router_id, interface_info,
                                                  new_router)
-        self.client.sendjson('put', url, router_dict)
+        self._sendjson('put', url, router_dict, router_id,
+                       router_dict['tenant_id'])
         return new_router
 
+    def add_router_interfaces(self, context, router_id, interfaces_info):
+        """Attach several subnets or ports to a router.
+
+        Return one result per interface, see _update_router_interfaces.
+        """
+        return self._update_router_interfaces(
+            context, router_id, interfaces_info, 'add_router_interface')
+
+    def remove_router_interfaces(self, context, router_id, interfaces_info):
+        """Detach several subnets or ports from a router.
+
+        Return one result per interface, see _update_router_interfaces.
+        """
+        return self._update_router_interfaces(
+            context, router_id, interfaces_info, 'remove_router_interface')
+
+    def _update_router_interfaces(self, context, router_id, interfaces_info,
+                                  action):
+        """Run an interface action for several interfaces of a router.
+
+        The DB changes are made in one transaction, with a savepoint per
+        interface so that one failing doesn't undo the others. ODL having
+        no aggregated endpoint for them, a request per interface is then
+        sent, concurrently on the dispatch workers if any.
+
+        Return a list of dicts holding, in the order of interfaces_info,
+        the 'interface_info', the 'router_interface' returned by Neutron
+        and the 'error' raised for the interface, or None.
+        """
+        db_action = getattr(super(OpenDaylightL3RouterPlugin, self), action)
+        results = []
+        with context.session.begin(subtransactions=True):
+            for interface_info in interfaces_info:
+                result = {'interface_info': interface_info,
+                          'router_interface': None,
+                          'error': None}
+                try:
+                    with context.session.begin_nested():
+                        result['router_interface'] = db_action(
+                            context, router_id, interface_info)
+                except Exception as e:
+                    result['error'] = e
+                results.append(result)
+
+        url = ROUTERS + "/" + router_id + "/" + action
+        done = [result for result in results if result['error'] is None]
+        router_dicts = [self._generate_router_dict(
+            router_id, result['interface_info'], result['router_interface'])
+            for result in done]
+        if self._async_l3():
+            for router_dict in router_dicts:
+                self._sendjson('put', url, router_dict, router_id,
+                               router_dict['tenant_id'])
+            return results
+        if router_dicts and self.out_of_sync:
+            self.resync()
+        ops = [dispatcher.get_dispatcher().submit(
+            dispatcher.INTERACTIVE, router_dict['tenant_id'], self._deliver,
+            'put', url, router_dict) for router_dict in router_dicts]
+        for result, op in zip(done, ops):
+            result['error'] = op.wait()
+        return results
+
     def _generate_router_dict(self, router_id, interface_info, new_router):
         # Get network info for the subnet that is being added to the router.
         # Check if the interface information is by port-id or subnet-id
@@ -16,14 +16,88 @@
 
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import excutils
 
+from neutron.common import utils
+from neutron import context as neutron_context
+from neutron.plugins.common import constants
+from neutron_lbaas.db.loadbalancer import loadbalancer_db
 from neutron_lbaas.services.loadbalancer.drivers import abstract_driver
 
+from networking_odl.common import batching
 from networking_odl.common import client as odl_client
 from networking_odl.common import config  # noqa
+from networking_odl.common import constants as odl_const
+from networking_odl.common import resync
+from networking_odl.openstack.common._i18n import _LE
+from networking_odl.openstack.common import loopingcall
 
 LOG = logging.getLogger(__name__)
 
+LBAAS = "lbaas"
+
+
+def _path(*parts):
+    return '/'.join((LBAAS,) + parts)
+
+
+def vip_to_loadbalancer(vip):
+    """Map a v1 vip to the ODL load balancer holding its address."""
+    return {'id': vip['id'],
+            'tenant_id': vip['tenant_id'],
+            'name': vip['name'],
+            'description': vip['description'],
+            'vip_address': vip['address'],
+            'vip_subnet_id': vip['subnet_id'],
+            'admin_state_up': vip['admin_state_up']}
+
+
+def vip_to_listener(vip):
+    """Map a v1 vip to the ODL listener forwarding to its pool."""
+    return {'id': vip['id'],
+            'tenant_id': vip['tenant_id'],
+            'name': vip['name'],
+            'description': vip['description'],
+            'protocol': vip['protocol'],
+            'protocol_port': vip['protocol_port'],
+            'connection_limit': vip['connection_limit'],
+            'default_pool_id': vip['pool_id'],
+            'loadbalancers': [{'id': vip['id']}],
+            'admin_state_up': vip['admin_state_up']}
+
+
+def pool_to_odl(pool):
+    odl_pool = {'id': pool['id'],
+                'tenant_id': pool['tenant_id'],
+                'name': pool['name'],
+                'description': pool['description'],
+                'protocol': pool['protocol'],
+                'lb_algorithm': pool['lb_method'],
+                'admin_state_up': pool['admin_state_up'],
+                'listeners': []}
+    if pool.get('vip_id'):
+        odl_pool['listeners'].append({'id': pool['vip_id']})
+    return odl_pool
+
+
+def member_to_odl(member, subnet_id=None):
+    return {'id': member['id'],
+            'tenant_id': member['tenant_id'],
+            'address': member['address'],
+            'protocol_port': member['protocol_port'],
+            'weight': member['weight'],
+            'subnet_id': subnet_id,
+            'admin_state_up': member['admin_state_up']}
+
+
+def health_monitor_to_odl(health_monitor, pool_ids):
+    odl_hm = dict((key, health_monitor.get(key))
+                  for key in ('id', 'tenant_id', 'type', 'delay', 'timeout',
+                              'max_retries', 'http_method', 'url_path',
+                              'expected_codes', 'admin_state_up'))
+    odl_hm['pools'] = [{'id': pool_id} for pool_id in pool_ids]
+    return odl_hm
+
 
 class OpenDaylightLbaasDriverV1(abstract_driver.LoadBalancerAbstractDriver):
 
@@ -31,8 +105,14 @@ class OpenDaylightLbaasDriverV1(abstract_driver.LoadBalancerAbstractDriver):
 
     This code is the backend implementation for the OpenDaylight
     LBaaS V1 driver for Openstack Neutron.
+
+    OpenDaylight models load balancing after the LBaaS v2 API: a vip is
+    sent as a load balancer and a listener sharing its id, pools, members
+    and health monitors as their v2 counterparts.
     """
 
+    out_of_sync = True
+
     def __init__(self, plugin):
         LOG.debug("Initializing OpenDaylight LBaaS driver")
         self.plugin = plugin
@@ -42,56 +122,356 @@ class OpenDaylightLbaasDriverV1(abstract_driver.LoadBalancerAbstractDriver):
             cfg.CONF.ml2_odl.password,
             cfg.CONF.ml2_odl.timeout
         )
+        window = cfg.CONF.ml2_odl.lbaas_member_batch_window / 1000.0
+        self.member_batcher = batching.Batcher(self.sync_member_batch,
+                                               window=window)
+        self.health_monitor_batcher = batching.Batcher(
+            self.sync_health_monitor_batch, window=window)
+        self.resync_loop = None
+        interval = cfg.CONF.ml2_odl.lbaas_resync_interval
+        if interval:
+            self.resync_loop = loopingcall.FixedIntervalLoopingCall(
+                self.periodic_resync)
+            self.resync_loop.start(interval, initial_delay=interval)
+
+    def _send(self, method, urlpath, obj):
+        try:
+            self.client.sendjson(method, urlpath, obj)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_LE("Unable to send %(method)s %(urlpath)s to "
+                              "OpenDaylight"),
+                          {'method': method, 'urlpath': urlpath})
+                self.out_of_sync = True
+
+    def _sync(self, context, calls, delete=False):
+        """Send the (method, urlpath, obj) calls making a change.
+
+        Once a call failed, the next change resyncs ODL with the Neutron
+        DB first. The resync covers the change, unless it is a delete: the
+        objects being deleted are still in the DB.
+        """
+        if self.out_of_sync:
+            self.resync(context)
+            if not delete:
+                return
+        for method, urlpath, obj in calls:
+            self._send(method, urlpath, obj)
+
+    def _sync_with_status(self, context, model, obj_id, calls,
+                          delete=False):
+        """Make a change and report it in the status of the object.
+
+        A failed delete sets the object in ERROR rather than leaving it
+        in PENDING_DELETE.
+        """
+        try:
+            self._sync(context, calls, delete)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self.plugin.update_status(context, model, obj_id,
+                                          constants.ERROR)
+        if not delete:
+            self.plugin.update_status(context, model, obj_id,
+                                      constants.ACTIVE)
+
+    def _pool_subnet_id(self, context, pool_id):
+        return self.plugin.get_pool(context, pool_id)['subnet_id']
 
     def create_vip(self, context, vip):
         """Create a vip on the OpenDaylight Controller."""
-        pass
+        self._sync_with_status(
+            context, loadbalancer_db.Vip, vip['id'],
+            [('post', _path(odl_const.ODL_LOADBALANCERS),
+              {odl_const.ODL_LOADBALANCER: vip_to_loadbalancer(vip)}),
+             ('post', _path(odl_const.ODL_LISTENERS),
+              {odl_const.ODL_LISTENER: vip_to_listener(vip)})])
 
     def update_vip(self, context, old_vip, vip):
         """Update a vip on the OpenDaylight Controller."""
-        pass
+        self._sync_with_status(
+            context, loadbalancer_db.Vip, vip['id'],
+            [('put', _path(odl_const.ODL_LOADBALANCERS, vip['id']),
+              {odl_const.ODL_LOADBALANCER: vip_to_loadbalancer(vip)}),
+             ('put', _path(odl_const.ODL_LISTENERS, vip['id']),
+              {odl_const.ODL_LISTENER: vip_to_listener(vip)})])
 
     def delete_vip(self, context, vip):
         """Delete a vip on the OpenDaylight Controller."""
-        pass
+        self._sync_with_status(
+            context, loadbalancer_db.Vip, vip['id'],
+            [('delete', _path(odl_const.ODL_LISTENERS, vip['id']), None),
+             ('delete', _path(odl_const.ODL_LOADBALANCERS, vip['id']),
+              None)],
+            delete=True)
+        self.plugin._delete_db_vip(context, vip['id'])
 
     def create_pool(self, context, pool):
         """Create a pool on the OpenDaylight Controller."""
-        pass
+        self._sync_with_status(
+            context, loadbalancer_db.Pool, pool['id'],
+            [('post', _path(odl_const.ODL_POOLS),
+              {odl_const.ODL_POOL: pool_to_odl(pool)})])
 
     def update_pool(self, context, old_pool, pool):
         """Update a pool on the OpenDaylight Controller."""
-        pass
+        self._sync_with_status(
+            context, loadbalancer_db.Pool, pool['id'],
+            [('put', _path(odl_const.ODL_POOLS, pool['id']),
+              {odl_const.ODL_POOL: pool_to_odl(pool)})])
 
     def delete_pool(self, context, pool):
         """Delete a pool on the OpenDaylight Controller."""
-        pass
+        self.member_batcher.flush(pool['id'])
+        self._sync_with_status(
+            context, loadbalancer_db.Pool, pool['id'],
+            [('delete', _path(odl_const.ODL_POOLS, pool['id']), None)],
+            delete=True)
+        self.plugin._delete_db_pool(context, pool['id'])
+
+    @staticmethod
+    def _member_path(member, *parts):
+        return _path(odl_const.ODL_POOLS, member['pool_id'],
+                     odl_const.ODL_MEMBERS, *parts)
 
     def create_member(self, context, member):
-        """Create a pool member on the OpenDaylight Controller."""
-        pass
+        """Create a pool member on the OpenDaylight Controller.
+
+        The members added to a pool within
+        ml2_odl.lbaas_member_batch_window are sent in bulk, see
+        sync_member_batch.
+        """
+        if not cfg.CONF.ml2_odl.lbaas_member_batch_window:
+            self._sync_with_status(
+                context, loadbalancer_db.Member, member['id'],
+                [('post', self._member_path(member),
+                  {odl_const.ODL_MEMBER: member_to_odl(
+                      member,
+                      self._pool_subnet_id(context, member['pool_id']))})])
+            return
+        self.member_batcher.add(member['pool_id'], (context, member),
+                                item_key=member['id'])
+
+    def sync_member_batch(self, pool_id, members):
+        """Create the members of a pool queued within a window.
+
+        A chunk which fails is retried one member at a time, so that each
+        member gets its own status.
+        """
+        if not members:
+            return
+        context = members[0][0]
+        try:
+            subnet_id = self._pool_subnet_id(context, pool_id)
+        except Exception:
+            LOG.exception(_LE("Unable to read pool %s"), pool_id)
+            subnet_id = None
+        results = self.client.post_bulk_with_fallback(
+            odl_const.ODL_MEMBERS,
+            [member_to_odl(member, subnet_id) for context, member in members],
+            cfg.CONF.ml2_odl.bulk_chunk_size,
+            _path(odl_const.ODL_POOLS, pool_id, odl_const.ODL_MEMBERS))
+        for (context, member), (odl_member, error) in zip(members, results):
+            status = constants.ACTIVE
+            if error is not None:
+                LOG.error(_LE("Unable to create member %(member_id)s of "
+                              "pool %(pool_id)s in OpenDaylight: "
+                              "%(error)s"),
+                          {'member_id': member['id'], 'pool_id': pool_id,
+                           'error': error})
+                self.out_of_sync = True
+                status = constants.ERROR
+            self.plugin.update_status(context, loadbalancer_db.Member,
+                                      member['id'], status)
 
     def update_member(self, context, old_member, member):
         """Update a pool member on the OpenDaylight Controller."""
-        pass
+        # An update of a member not created yet amends its create
+        if self.member_batcher.replace(member['pool_id'], member['id'],
+                                       (context, member)):
+            return
+        self._sync_with_status(
+            context, loadbalancer_db.Member, member['id'],
+            [('put', self._member_path(member, member['id']),
+              {odl_const.ODL_MEMBER: member_to_odl(
+                  member,
+                  self._pool_subnet_id(context, member['pool_id']))})])
 
     def delete_member(self, context, member):
         """Delete a pool member on the OpenDaylight Controller."""
-        pass
+        # A member deleted before its create was sent never reaches ODL
+        if not self.member_batcher.remove(member['pool_id'], member['id']):
+            self._sync_with_status(
+                context, loadbalancer_db.Member, member['id'],
+                [('delete', self._member_path(member, member['id']), None)],
+                delete=True)
+        self.plugin._delete_db_member(context, member['id'])
+
+    @staticmethod
+    def _health_monitor_pool_ids(health_monitor, exclude=None):
+        return [pool['pool_id'] for pool in health_monitor.get('pools', [])
+                if pool['pool_id'] != exclude]
 
     def create_pool_health_monitor(self, context, health_monitor, pool_id):
-        """Create a pool health monitor on the OpenDaylight Controller."""
-        pass
+        """Create a pool health monitor on the OpenDaylight Controller.
+
+        The associations made within ml2_odl.lbaas_member_batch_window are
+        sent together, see sync_health_monitor_batch.
+        """
+        if not cfg.CONF.ml2_odl.lbaas_member_batch_window:
+            self.sync_health_monitor_batch(
+                odl_const.ODL_HEALTHMONITORS,
+                [(context, health_monitor, pool_id)])
+            return
+        self.health_monitor_batcher.add(
+            odl_const.ODL_HEALTHMONITORS,
+            (context, health_monitor, pool_id),
+            item_key=(health_monitor['id'], pool_id))
+
+    def sync_health_monitor_batch(self, batch_key, associations):
+        """Send the health monitors associated to pools within a window.
+
+        Health monitors ODL doesn't know of yet are created in bulk, the
+        others are updated with their new list of pools.
+        """
+        if not associations:
+            return
+        health_monitors = {}
+        for context, health_monitor, pool_id in associations:
+            health_monitors[health_monitor['id']] = (context, health_monitor)
+        try:
+            existing = set(
+                odl_hm['id'] for odl_hm in self.client.get_collection(
+                    odl_const.ODL_HEALTHMONITORS,
+                    _path(odl_const.ODL_HEALTHMONITORS)))
+            new = [health_monitor_to_odl(
+                   health_monitor, self._health_monitor_pool_ids(
+                       health_monitor))
+                   for context, health_monitor in health_monitors.values()
+                   if health_monitor['id'] not in existing]
+            self.client.post_bulk(odl_const.ODL_HEALTHMONITORS, new,
+                                  cfg.CONF.ml2_odl.bulk_chunk_size,
+                                  _path(odl_const.ODL_HEALTHMONITORS))
+            for context, health_monitor in health_monitors.values():
+                if health_monitor['id'] in existing:
+                    self._send('put', _path(odl_const.ODL_HEALTHMONITORS,
+                                            health_monitor['id']),
+                               {odl_const.ODL_HEALTHMONITOR:
+                                health_monitor_to_odl(
+                                    health_monitor,
+                                    self._health_monitor_pool_ids(
+                                        health_monitor))})
+            status = constants.ACTIVE
+        except Exception:
+            LOG.exception(_LE("Unable to associate %d health monitors in "
+                              "OpenDaylight"), len(associations))
+            self.out_of_sync = True
+            status = constants.ERROR
+        for context, health_monitor, pool_id in associations:
+            self.plugin.update_pool_health_monitor(
+                context, health_monitor['id'], pool_id, status)
 
     def update_pool_health_monitor(self, context, old_health_monitor,
                                    health_monitor, pool_id):
         """Update a pool health monitor on the OpenDaylight Controller."""
-        pass
+        self.health_monitor_batcher.flush()
+        try:
+            self._sync(context, [
+                ('put', _path(odl_const.ODL_HEALTHMONITORS,
+                              health_monitor['id']),
+                 {odl_const.ODL_HEALTHMONITOR: health_monitor_to_odl(
+                     health_monitor,
+                     self._health_monitor_pool_ids(health_monitor))})])
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self.plugin.update_pool_health_monitor(
+                    context, health_monitor['id'], pool_id, constants.ERROR)
+        self.plugin.update_pool_health_monitor(
+            context, health_monitor['id'], pool_id, constants.ACTIVE)
 
     def delete_pool_health_monitor(self, context, health_monitor, pool_id):
         """Delete a pool health monitor on the OpenDaylight Controller."""
-        pass
+        self.health_monitor_batcher.flush()
+        urlpath = _path(odl_const.ODL_HEALTHMONITORS, health_monitor['id'])
+        pool_ids = self._health_monitor_pool_ids(health_monitor,
+                                                 exclude=pool_id)
+        if pool_ids:
+            # Still monitoring other pools
+            call = ('put', urlpath,
+                    {odl_const.ODL_HEALTHMONITOR: health_monitor_to_odl(
+                        health_monitor, pool_ids)})
+        else:
+            call = ('delete', urlpath, None)
+        try:
+            self._sync(context, [call], delete=True)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self.plugin.update_pool_health_monitor(
+                    context, health_monitor['id'], pool_id, constants.ERROR)
+        self.plugin._delete_db_pool_health_monitor(
+            context, health_monitor['id'], pool_id)
 
     def stats(self, context, pool_id):
         """Retrieve pool statistics from the OpenDaylight Controller."""
         pass
+
+    def periodic_resync(self):
+        try:
+            self.resync(force=True)
+        except Exception:
+            LOG.exception(_LE("Unable to resync LBaaS v1 objects with "
+                              "OpenDaylight"))
+
+    @utils.synchronized('odl-lbaas-v1-resync')
+    def resync(self, context=None, force=False):
+        """Reconcile the LBaaS v1 objects of ODL with Neutron.
+
+        Each collection is read from ODL in one request, the missing
+        objects are created in bulk and the changed ones updated, parents
+        before children, then the stale ones deleted, children before
+        parents. Transition to the in-sync state on success.
+        """
+        if not (force or self.out_of_sync):
+            return
+        context = context or neutron_context.get_admin_context()
+        chunk_size = cfg.CONF.ml2_odl.bulk_chunk_size
+        self.out_of_sync = True
+        vips = self.plugin.get_vips(context)
+        pools = self.plugin.get_pools(context)
+        health_monitors = self.plugin.get_health_monitors(context)
+        pool_hms = {}
+        for pool in pools:
+            for hm_id in pool.get('health_monitors', []):
+                pool_hms.setdefault(hm_id, []).append(pool['id'])
+        collections = [
+            (odl_const.ODL_LOADBALANCERS,
+             [vip_to_loadbalancer(vip) for vip in vips]),
+            (odl_const.ODL_LISTENERS, [vip_to_listener(vip) for vip in vips]),
+            (odl_const.ODL_POOLS, [pool_to_odl(pool) for pool in pools]),
+            (odl_const.ODL_HEALTHMONITORS,
+             [health_monitor_to_odl(hm, pool_hms.get(hm['id'], []))
+              for hm in health_monitors])]
+        # The stale objects of each collection, in creation order
+        stale = []
+        for collection_name, resources in collections:
+            stale.append([])
+            resync.reconcile_collection(self.client, collection_name,
+                                        resources, chunk_size,
+                                        _path(collection_name), update=True,
+                                        stale=stale[-1])
+        members = {}
+        for member in self.plugin.get_members(context):
+            members.setdefault(member['pool_id'], []).append(member)
+        stale.append([])
+        for pool in pools:
+            resync.reconcile_collection(
+                self.client, odl_const.ODL_MEMBERS,
+                [member_to_odl(member, pool['subnet_id'])
+                 for member in members.get(pool['id'], [])],
+                chunk_size,
+                _path(odl_const.ODL_POOLS, pool['id'],
+                      odl_const.ODL_MEMBERS),
+                update=True, stale=stale[-1])
+        for paths in reversed(stale):
+            resync.delete_stale(self.client, paths)
+        self.out_of_sync = False
@@ -14,19 +14,101 @@
 #  under the License.
 #
 
+import time
+
+import eventlet
 from oslo_config import cfg
 from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
+from oslo_utils import excutils
 
+from neutron.common import utils
+from neutron import context as neutron_context
 from neutron_lbaas.drivers import driver_base
+from neutron_lbaas.services.loadbalancer import data_models
 
+from networking_odl.common import batching
 from networking_odl.common import client as odl_client
 from networking_odl.common import config  # noqa
 from networking_odl.common import constants as odl_const
+from networking_odl.common import resync
+from networking_odl.openstack.common._i18n import _LE, _LW
+from networking_odl.openstack.common import loopingcall
 
 LOG = logging.getLogger(__name__)
 
 LBAAS = "lbaas"
+STATS_KEYS = ('bytes_in', 'bytes_out', 'active_connections',
+              'total_connections')
+
+
+def serialize(obj):
+    """Return the ODL representation of an LBaaS v2 data model object.
+
+    Scalar attributes are kept as is. Related objects are referenced by
+    their id, e.g. {'listeners': [{'id': ...}]}, instead of being nested.
+    """
+    resource = {}
+    for attr, value in obj.__dict__.items():
+        if attr.startswith('_'):
+            continue
+        if isinstance(value, data_models.BaseDataModel):
+            if hasattr(value, 'id'):
+                resource.setdefault(attr + '_id', value.id)
+            elif attr == 'session_persistence':
+                resource[attr] = serialize(value)
+        elif isinstance(value, list):
+            resource[attr] = [
+                {'id': item.id}
+                if isinstance(item, data_models.BaseDataModel) else item
+                for item in value]
+        else:
+            resource[attr] = value
+    return resource
+
+
+class StatsCollector(object):
+    """Cache of the statistics of all the load balancers known to ODL.
+
+    The statistics are refreshed by a single GET of the load balancer
+    collection every interval seconds, and served from memory until
+    they are ttl seconds old.
+    """
+
+    def __init__(self, client, interval, ttl):
+        self.client = client
+        self.interval = interval
+        self.ttl = ttl
+        # load balancer id -> (expiry time, statistics)
+        self._stats = {}
+        self._loop = loopingcall.FixedIntervalLoopingCall(self.collect)
+
+    def start(self):
+        self._loop.start(self.interval)
+
+    def collect(self):
+        try:
+            lbs = self.client.get_collection(
+                odl_const.ODL_LOADBALANCERS,
+                LBAAS + '/' + odl_const.ODL_LOADBALANCERS)
+        except Exception:
+            LOG.warning(_LW("Unable to collect load balancer statistics "
+                            "from OpenDaylight"), exc_info=True)
+            return
+        expiry = time.time() + self.ttl
+        stats = {}
+        for lb in lbs:
+            lb_stats = lb.get('stats') or {}
+            stats[lb['id']] = (expiry, dict(
+                (key, lb_stats.get(key, 0)) for key in STATS_KEYS))
+        self._stats = stats
+
+    def get(self, lb_id):
+        """Return the cached statistics of a load balancer, or None."""
+        entry = self._stats.get(lb_id)
+        if entry is None or entry[0] < time.time():
+            return None
+        return dict(entry[1])
 
 
 class OpenDaylightLbaasDriverV2(driver_base.LoadBalancerBaseDriver):
@@ -41,11 +123,81 @@ class OpenDaylightLbaasDriverV2(driver_base.LoadBalancerBaseDriver):
             cfg.CONF.ml2_odl.password,
             cfg.CONF.ml2_odl.timeout
         )
-        self._loadbalancer = ODLLoadBalancerManager(self.client)
-        self._listener = ODLListenerManager(self.client)
-        self._pool = ODLPoolManager(self.client)
-        self._member = ODLMemberManager(self.client)
-        self._healthmonitor = ODLHealthMonitorManager(self.client)
+        self.load_balancer = ODLLoadBalancerManager(self)
+        self.listener = ODLListenerManager(self)
+        self.pool = ODLPoolManager(self)
+        self.member = ODLMemberManager(self)
+        self.health_monitor = ODLHealthMonitorManager(self)
+        self.resync_loop = None
+        interval = cfg.CONF.ml2_odl.lbaas_resync_interval
+        if interval:
+            self.resync_loop = loopingcall.FixedIntervalLoopingCall(
+                self.periodic_resync)
+            self.resync_loop.start(interval, initial_delay=interval)
+
+    @property
+    def managers(self):
+        return [self.load_balancer, self.listener, self.pool, self.member,
+                self.health_monitor]
+
+    @property
+    def out_of_sync(self):
+        return any(manager.out_of_sync for manager in self.managers)
+
+    def periodic_resync(self):
+        try:
+            self.resync(force=True)
+        except Exception:
+            LOG.exception(_LE("Unable to resync LBaaS v2 objects with "
+                              "OpenDaylight"))
+
+    @utils.synchronized('odl-lbaas-resync')
+    def resync(self, context=None, force=False):
+        """Reconcile the LBaaS v2 objects of ODL with Neutron.
+
+        Each collection is read from ODL in one request and only the
+        differences are written: missing objects are created in bulk,
+        changed ones updated and stale ones deleted, at most
+        ml2_odl.lbaas_resync_concurrency requests at a time. Parents are
+        created and updated before their children, and the stale objects
+        deleted in a last pass, children before their parents: members,
+        health monitors, pools, listeners then load balancers. The time
+        spent on each collection is reported to the tracer of the client.
+        Transition to the in-sync state on success.
+        """
+        if not (force or self.out_of_sync):
+            return
+        context = context or neutron_context.get_admin_context()
+        db = self.plugin.db
+        chunk_size = cfg.CONF.ml2_odl.bulk_chunk_size
+        pool = eventlet.GreenPool(cfg.CONF.ml2_odl.lbaas_resync_concurrency)
+        collections = [(self.load_balancer, db.get_loadbalancers(context)),
+                       (self.listener, db.get_listeners(context)),
+                       (self.pool, db.get_pools(context)),
+                       (self.health_monitor, db.get_healthmonitors(context))]
+        # The stale objects of each collection, in creation order
+        stale = []
+        for manager, objs in collections:
+            stale.append([])
+            resync.reconcile_collection(
+                self.client, manager.obj_type,
+                [serialize(obj) for obj in objs], chunk_size,
+                manager.url_path, update=True, pool=pool, stale=stale[-1])
+        members = {}
+        for member in db.get_pool_members(context):
+            members.setdefault(member.pool_id, []).append(serialize(member))
+        stale.append([])
+        for odl_pool in collections[2][1]:
+            resync.reconcile_collection(
+                self.client, odl_const.ODL_MEMBERS,
+                members.get(odl_pool.id, []), chunk_size,
+                '/'.join([LBAAS, odl_const.ODL_POOLS, odl_pool.id,
+                          odl_const.ODL_MEMBERS]),
+                update=True, pool=pool, stale=stale[-1])
+        for paths in reversed(stale):
+            resync.delete_stale(self.client, paths, pool)
+        for manager in self.managers:
+            manager.out_of_sync = False
 
 
 class OpenDaylightManager(object):
@@ -61,30 +213,127 @@ class OpenDaylightManager(object):
     """
 
     @log_helpers.log_method_call
-    def __init__(self, client):
-        self.client = client
-        self.url_path = LBAAS + self.obj_type
+    def __init__(self, driver):
+        self.driver = driver
+        self.client = driver.client
+        self.url_path = LBAAS + '/' + self.obj_type
+
+    def collection_path(self, obj):
+        """Return the URL path of the ODL collection holding obj."""
+        return self.url_path
+
+    def _send(self, context, obj, method, urlpath, body, delete=False):
+        try:
+            if self.driver.out_of_sync:
+                # The resync reads the change from the DB, unless the
+                # object is being deleted
+                self.driver.resync(context)
+                if not delete:
+                    method = None
+            if method is not None:
+                self.client.sendjson(method, urlpath, body)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_LE("Unable to %(method)s %(obj_type)s "
+                              "%(obj_id)s in OpenDaylight"),
+                          {'method': method, 'obj_type': self.obj_type,
+                           'obj_id': obj.id})
+                self.out_of_sync = True
+                self.failed_completion(context, obj)
+        self.successful_completion(context, obj, delete=delete)
 
     @log_helpers.log_method_call
     def create(self, context, obj):
-        self.client.sendjson('post', self.url_path, None)
+        self._send(context, obj, 'post', self.collection_path(obj),
+                   {self.obj_type[:-1]: serialize(obj)})
 
     @log_helpers.log_method_call
-    def update(self, context, obj):
-        self.client.sendjson('put', self.url_path + '/' + obj.id, None)
+    def update(self, context, old_obj, obj):
+        self._send(context, obj, 'put',
+                   self.collection_path(obj) + '/' + obj.id,
+                   {self.obj_type[:-1]: serialize(obj)})
 
     @log_helpers.log_method_call
     def delete(self, context, obj):
-        self.client.sendjson('delete', self.url_path + '/' + obj.id, None)
+        self._send(context, obj, 'delete',
+                   self.collection_path(obj) + '/' + obj.id, None,
+                   delete=True)
 
 
 class ODLLoadBalancerManager(OpenDaylightManager,
                              driver_base.BaseLoadBalancerManager):
 
     @log_helpers.log_method_call
-    def __init__(self, client):
+    def __init__(self, driver):
         self.obj_type = odl_const.ODL_LOADBALANCERS
-        super(ODLLoadBalancerManager, self).__init__(client)
+        super(ODLLoadBalancerManager, self).__init__(driver)
+        self.stats_collector = None
+        interval = cfg.CONF.ml2_odl.lbaas_stats_interval
+        if interval:
+            self.stats_collector = StatsCollector(
+                self.client, interval, cfg.CONF.ml2_odl.lbaas_stats_ttl)
+            self.stats_collector.start()
+
+    @staticmethod
+    def graph(lb):
+        """Return the objects of a load balancer in dependency order.
+
+        The result is a list of (manager attribute, objects) pairs: the
+        load balancer, its listeners, their pools, the pool members and
+        the health monitors.
+        """
+        listeners = list(getattr(lb, 'listeners', None) or [])
+        pools = list(getattr(lb, 'pools', None) or [])
+        pool_ids = set(pool.id for pool in pools)
+        for listener in listeners:
+            pool = getattr(listener, 'default_pool', None)
+            if pool is not None and pool.id not in pool_ids:
+                pool_ids.add(pool.id)
+                pools.append(pool)
+        members = [member for pool in pools
+                   for member in getattr(pool, 'members', None) or []]
+        healthmonitors = [pool.healthmonitor for pool in pools
+                          if getattr(pool, 'healthmonitor', None)]
+        return [('load_balancer', [lb]),
+                ('listener', listeners),
+                ('pool', pools),
+                ('member', members),
+                ('health_monitor', healthmonitors)]
+
+    def sync_graph(self, context, lb):
+        """Create a load balancer and the objects under it in ODL.
+
+        Each kind of object is sent in bulk, the members of a pool
+        together, kinds following one another in dependency order.
+        """
+        chunk_size = cfg.CONF.ml2_odl.bulk_chunk_size
+        try:
+            if self.driver.out_of_sync:
+                # The resync covers the graph, read from the DB
+                self.driver.resync(context)
+                objs_by_attr = []
+            else:
+                objs_by_attr = self.graph(lb)
+            for attr, objs in objs_by_attr:
+                manager = getattr(self.driver, attr)
+                by_path = {}
+                for obj in objs:
+                    by_path.setdefault(manager.collection_path(obj),
+                                       []).append(serialize(obj))
+                for urlpath, resources in by_path.items():
+                    self.client.post_bulk(manager.obj_type, resources,
+                                          chunk_size, urlpath)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_LE("Unable to create load balancer %s in "
+                              "OpenDaylight"), lb.id)
+                self.out_of_sync = True
+                self.failed_completion(context, lb)
+        self.successful_completion(context, lb)
+
+    @log_helpers.log_method_call
+    def create(self, context, lb):
+        self.sync_graph(context, lb)
 
     @log_helpers.log_method_call
     def refresh(self, context, lb):
@@ -92,40 +341,108 @@ class ODLLoadBalancerManager(OpenDaylightManager,
 
     @log_helpers.log_method_call
     def stats(self, context, lb):
-        pass
+        """Return the statistics of a load balancer from the cache.
+
+        None, i.e. the statistics stored in the Neutron DB, is returned
+        when they are not collected or too old.
+        """
+        if self.stats_collector is None:
+            return None
+        return self.stats_collector.get(lb.id)
 
 
 class ODLListenerManager(OpenDaylightManager,
                          driver_base.BaseListenerManager):
 
     @log_helpers.log_method_call
-    def __init__(self, client):
+    def __init__(self, driver):
         self.obj_type = odl_const.ODL_LISTENERS
-        super(ODLListenerManager, self).__init__(client)
+        super(ODLListenerManager, self).__init__(driver)
 
 
 class ODLPoolManager(OpenDaylightManager,
                      driver_base.BasePoolManager):
 
     @log_helpers.log_method_call
-    def __init__(self, client):
+    def __init__(self, driver):
         self.obj_type = odl_const.ODL_POOLS
-        super(ODLPoolManager, self).__init__(client)
+        super(ODLPoolManager, self).__init__(driver)
 
 
 class ODLMemberManager(OpenDaylightManager,
                        driver_base.BaseMemberManager):
 
     @log_helpers.log_method_call
-    def __init__(self, client):
+    def __init__(self, driver):
         self.obj_type = odl_const.ODL_MEMBERS
-        super(ODLMemberManager, self).__init__(client)
+        super(ODLMemberManager, self).__init__(driver)
+        self.batcher = batching.Batcher(
+            self.sync_member_batch,
+            window=cfg.CONF.ml2_odl.lbaas_member_batch_window / 1000.0)
+
+    def collection_path(self, member):
+        # Members live under their pool: lbaas/pools/<pool id>/members
+        return '/'.join([LBAAS, odl_const.ODL_POOLS, member.pool_id,
+                         odl_const.ODL_MEMBERS])
+
+    @log_helpers.log_method_call
+    def create(self, context, member):
+        """Create a member, in bulk with the other members of its pool.
+
+        With ml2_odl.lbaas_member_batch_window, the members added to a
+        pool within the window, e.g. by an autoscaling group scaling out,
+        are sent together by sync_member_batch.
+        """
+        if not cfg.CONF.ml2_odl.lbaas_member_batch_window:
+            return super(ODLMemberManager, self).create(context, member)
+        self.batcher.add(member.pool_id, (context, member),
+                         item_key=member.id)
+
+    @log_helpers.log_method_call
+    def update(self, context, old_member, member):
+        # An update of a member not created yet amends its create
+        if not self.batcher.replace(member.pool_id, member.id,
+                                    (context, member)):
+            super(ODLMemberManager, self).update(context, old_member,
+                                                 member)
+
+    @log_helpers.log_method_call
+    def delete(self, context, member):
+        # A member deleted before its create was sent never reaches ODL
+        if self.batcher.remove(member.pool_id, member.id):
+            self.successful_completion(context, member, delete=True)
+            return
+        super(ODLMemberManager, self).delete(context, member)
+
+    def sync_member_batch(self, pool_id, members):
+        """Create the members of a pool queued within a window.
+
+        The members are sent in chunked bulk requests. A chunk which fails
+        is retried one member at a time, the outcome of each member being
+        reported through its completion callback.
+        """
+        if not members:
+            return
+        results = self.client.post_bulk_with_fallback(
+            self.obj_type, [serialize(member) for context, member in members],
+            cfg.CONF.ml2_odl.bulk_chunk_size,
+            self.collection_path(members[0][1]))
+        for (context, member), (odl_member, error) in zip(members, results):
+            if error is None:
+                self.successful_completion(context, member)
+                continue
+            LOG.error(_LE("Unable to create member %(member_id)s of pool "
+                          "%(pool_id)s in OpenDaylight: %(error)s"),
+                      {'member_id': member.id, 'pool_id': pool_id,
+                       'error': error})
+            self.out_of_sync = True
+            self.failed_completion(context, member)
 
 
 class ODLHealthMonitorManager(OpenDaylightManager,
                               driver_base.BaseHealthMonitorManager):
 
     @log_helpers.log_method_call
-    def __init__(self, client):
+    def __init__(self, driver):
         self.obj_type = odl_const.ODL_HEALTHMONITORS
-        super(ODLHealthMonitorManager, self).__init__(client)
+        super(ODLHealthMonitorManager, self).__init__(driver)
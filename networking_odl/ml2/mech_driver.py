@@ -14,6 +14,7 @@
 #    under the License.
 
 import abc
+import atexit
 import six
 
 from oslo_config import cfg
@@ -31,9 +32,11 @@ from neutron.plugins.common import constants
 from neutron.plugins.ml2 import driver_api
 from neutron.plugins.ml2 import driver_context
 
+from networking_odl.common import batching
 from networking_odl.common import callback as odl_call
 from networking_odl.common import client as odl_client
 from networking_odl.common import constants as odl_const
+from networking_odl.common import dispatcher
 from networking_odl.common import utils as odl_utils
 from networking_odl.openstack.common._i18n import _LE
 
@@ -103,7 +106,12 @@ class SubnetFilter(ResourceFilterBase):
 class PortFilter(ResourceFilterBase):
     @staticmethod
     def _add_security_groups(port, context):
-        """Populate the 'security_groups' field with entire records."""
+        """Populate the 'security_groups' field with entire records.
+
+        Left as a list of ids when ml2_odl.port_security_groups is 'id'.
+        """
+        if cfg.CONF.ml2_odl.port_security_groups == 'id':
+            return
         dbcontext = context._plugin_context
         groups = [context._plugin.get_security_group(dbcontext, sg)
                   for sg in port['security_groups']]
@@ -181,6 +189,14 @@ class SecurityGroupRuleFilter(ResourceFilterBase):
         pass
 
 
+# The collections whose queued creates have to reach ODL before those of a
+# collection, in order
+_CREATE_PARENTS = {
+    odl_const.ODL_SUBNETS: (odl_const.ODL_NETWORKS,),
+    odl_const.ODL_PORTS: (odl_const.ODL_NETWORKS, odl_const.ODL_SUBNETS),
+}
+
+
 class OpenDaylightDriver(object):
 
     """OpenDaylight Python Driver for Neutron.
@@ -207,14 +223,41 @@ class OpenDaylightDriver(object):
         )
         self.sec_handler = odl_call.OdlSecurityGroupsHandler(self)
         self.vif_details = {portbindings.CAP_PORT_FILTER: True}
+        self.create_batcher = batching.Batcher(self.sync_bulk_create)
+        self.update_batcher = batching.Batcher(
+            self.sync_coalesced_update,
+            window=cfg.CONF.ml2_odl.update_coalescing_window / 1000.0)
+        # NOTE: atexit only runs when the process exits normally, not in
+        # the API workers, which end with os._exit(). What they had queued
+        # is sent by the full sync the driver starts with, see out_of_sync.
+        atexit.register(self.flush_pending)
 
     def synchronize(self, operation, object_type, context):
         """Synchronize ODL with Neutron following a configuration change."""
         if self.out_of_sync:
             self.sync_full(context._plugin)
+        elif (operation == odl_const.ODL_CREATE and
+              cfg.CONF.ml2_odl.enable_bulk):
+            self.queue_create(object_type, context)
         else:
+            # Creates queued earlier have to reach ODL first
+            self.create_batcher.flush()
+            if (operation == odl_const.ODL_UPDATE and
+                    cfg.CONF.ml2_odl.update_coalescing_window):
+                self.queue_update(object_type, context)
+                return
+            if operation == odl_const.ODL_DELETE:
+                # A pending update is superseded by the delete
+                self.update_batcher.discard(
+                    (object_type, context.current['id']))
             self.sync_single_resource(operation, object_type, context)
 
+    def flush_pending(self):
+        """Send the queued creates and coalesced updates right away."""
+        self.create_batcher.flush()
+        self.sec_handler.rule_batcher.flush()
+        self.update_batcher.flush()
+
     def sync_resources(self, plugin, dbcontext, collection_name):
         """Sync objects from Neutron over to OpenDaylight.
 
@@ -234,7 +277,8 @@ class OpenDaylightDriver(object):
                 # Convert underscores to dashes in the URL for ODL
                 collection_name_url = collection_name.replace('_', '-')
                 urlpath = collection_name_url + '/' + resource['id']
-                self.client.sendjson('get', urlpath, None)
+                self._dispatch(dispatcher.BACKGROUND, None,
+                               self.client.sendjson, 'get', urlpath, None)
             except requests.exceptions.HTTPError as e:
                 with excutils.save_and_reraise_exception() as ctx:
                     if e.response.status_code == requests.codes.not_found:
@@ -247,11 +291,9 @@ class OpenDaylightDriver(object):
                 # If they don't match, update it below
                 pass
 
-        key = collection_name[:-1] if len(to_be_synced) == 1 else (
-            collection_name)
-        # Convert underscores to dashes in the URL for ODL
-        collection_name_url = collection_name.replace('_', '-')
-        self.client.sendjson('post', collection_name_url, {key: to_be_synced})
+        self._dispatch(dispatcher.BACKGROUND, None, self.client.post_bulk,
+                       collection_name, to_be_synced,
+                       cfg.CONF.ml2_odl.bulk_chunk_size)
 
         # https://bugs.launchpad.net/networking-odl/+bug/1371115
         # TODO(yamahata): update resources with unsyned attributes
@@ -268,11 +310,12 @@ class OpenDaylightDriver(object):
         if not self.out_of_sync:
             return
         dbcontext = neutron_context.get_admin_context()
-        for collection_name in [odl_const.ODL_NETWORKS,
+        # NOTE: security groups go first, the ports may only reference them
+        for collection_name in [odl_const.ODL_SGS,
+                                odl_const.ODL_SG_RULES,
+                                odl_const.ODL_NETWORKS,
                                 odl_const.ODL_SUBNETS,
-                                odl_const.ODL_PORTS,
-                                odl_const.ODL_SGS,
-                                odl_const.ODL_SG_RULES]:
+                                odl_const.ODL_PORTS]:
             self.sync_resources(plugin, dbcontext, collection_name)
         self.out_of_sync = False
 
@@ -285,11 +328,13 @@ class OpenDaylightDriver(object):
         """
         # Convert underscores to dashes in the URL for ODL
         object_type_url = object_type.replace('_', '-')
+        priority = dispatcher.get_priority(operation)
+        tenant_id = context.current.get('tenant_id')
         try:
             obj_id = context.current['id']
             if operation == odl_const.ODL_DELETE:
-                self.client.sendjson('delete', object_type_url + '/' + obj_id,
-                                     None)
+                self._dispatch(priority, tenant_id, self.client.sendjson,
+                               'delete', object_type_url + '/' + obj_id, None)
             else:
                 filter_cls = self.FILTER_MAP[object_type]
                 if operation == odl_const.ODL_CREATE:
@@ -302,8 +347,9 @@ class OpenDaylightDriver(object):
                     attr_filter = filter_cls.filter_update_attributes
                 resource = context.current.copy()
                 attr_filter(resource, context)
-                self.client.sendjson(method, urlpath,
-                                     {object_type_url[:-1]: resource})
+                self._dispatch(priority, tenant_id, self.client.sendjson,
+                               method, urlpath,
+                               {object_type_url[:-1]: resource})
         except Exception:
             with excutils.save_and_reraise_exception():
                 LOG.error(_LE("Unable to perform %(operation)s on "
@@ -313,18 +359,145 @@ class OpenDaylightDriver(object):
                            'object_id': obj_id})
                 self.out_of_sync = True
 
+    def queue_create(self, object_type, context):
+        """Queue a create to be sent along with its API request siblings.
+
+        Resources created back-to-back by one Neutron API request, e.g. the
+        ports of a bulk port create, are sent to OpenDaylight as a single
+        bulk request once the request yields. See sync_bulk_create. The
+        creates of the parents of the resource, e.g. the networks and the
+        subnets of a port, are sent first.
+        """
+        for parent_type in _CREATE_PARENTS.get(object_type, ()):
+            self.create_batcher.flush_if(
+                lambda batch_key: batch_key[0] == parent_type)
+        resource = context.current.copy()
+        self.FILTER_MAP[object_type].filter_create_attributes(resource,
+                                                              context)
+        self.create_batcher.add((object_type, resource['tenant_id']),
+                                resource)
+
+    def sync_bulk_create(self, batch_key, resources):
+        """Send a batch of queued creates to OpenDaylight."""
+        object_type, tenant_id = batch_key
+        try:
+            self._dispatch(dispatcher.INTERACTIVE, tenant_id,
+                           self.client.post_bulk, object_type, resources,
+                           cfg.CONF.ml2_odl.bulk_chunk_size)
+        except Exception:
+            # NOTE: this runs after the API request which queued the
+            # creates, the next operation resyncs instead of reraising.
+            LOG.exception(_LE("Unable to create %(count)d %(object_type)s"),
+                          {'count': len(resources),
+                           'object_type': object_type})
+            self.out_of_sync = True
+
+    def queue_update(self, object_type, context):
+        """Queue an update, superseding the pending one of the resource.
+
+        Only the latest state of a resource updated several times within
+        ml2_odl.update_coalescing_window is sent to OpenDaylight, e.g. once
+        for the successive port updates issued while a VM boots.
+        """
+        obj_id = context.current['id']
+        tenant_id = context.current.get('tenant_id')
+        resource = context.current.copy()
+        self.FILTER_MAP[object_type].filter_update_attributes(resource,
+                                                              context)
+        self.update_batcher.add((object_type, obj_id), (tenant_id, resource),
+                                item_key=obj_id)
+
+    def sync_coalesced_update(self, batch_key, updates):
+        """Send the latest state of a resource updated in a window."""
+        object_type, obj_id = batch_key
+        tenant_id, resource = updates[-1]
+        # Convert underscores to dashes in the URL for ODL
+        object_type_url = object_type.replace('_', '-')
+        try:
+            self._dispatch(dispatcher.UPDATE, tenant_id, self.client.sendjson,
+                           'put', object_type_url + '/' + obj_id,
+                           {object_type_url[:-1]: resource})
+        except Exception:
+            LOG.exception(_LE("Unable to perform update on "
+                              "%(object_type)s %(object_id)s"),
+                          {'object_type': object_type, 'object_id': obj_id})
+            self.out_of_sync = True
+
     def sync_from_callback(self, operation, object_type, res_id,
                            resource_dict):
-        if operation == odl_const.ODL_DELETE:
-            self.client.sendjson('delete', object_type + '/' + res_id, None)
-        else:
-            if operation == odl_const.ODL_CREATE:
-                urlpath = object_type
-                method = 'post'
-            elif operation == odl_const.ODL_UPDATE:
-                urlpath = object_type + '/' + res_id
-                method = 'put'
+        method, urlpath = self._callback_request(operation, object_type,
+                                                 res_id)
+        self._dispatch(dispatcher.get_priority(operation), None,
+                       self.client.sendjson, method, urlpath, resource_dict)
+
+    def queue_from_callback(self, ordering_key, operation, object_type,
+                            res_id, resource_dict):
+        """Send a callback operation in the background.
+
+        Operations queued with the same ordering_key, e.g. the id of their
+        security group, reach OpenDaylight in the order they were queued.
+        Failures are logged and trigger a full sync on the next operation.
+        """
+        method, urlpath = self._callback_request(operation, object_type,
+                                                 res_id)
+        return dispatcher.get_dispatcher().submit_ordered(
+            ordering_key, dispatcher.get_priority(operation), None,
+            self._send_from_callback, operation, object_type, method,
+            urlpath, resource_dict)
+
+    def _send_from_callback(self, operation, object_type, method, urlpath,
+                            resource_dict):
+        try:
             self.client.sendjson(method, urlpath, resource_dict)
+        except Exception:
+            LOG.exception(_LE("Unable to perform %(operation)s on "
+                              "%(object_type)s"),
+                          {'operation': operation,
+                           'object_type': object_type})
+            self.out_of_sync = True
+
+    def sync_bulk_from_callback(self, collection_name, object_type,
+                                resources):
+        """Create the resources of a callback with bulk requests."""
+        self._dispatch(dispatcher.INTERACTIVE, None, self.client.post_bulk,
+                       collection_name, resources,
+                       cfg.CONF.ml2_odl.bulk_chunk_size, object_type)
+
+    def queue_bulk_from_callback(self, ordering_key, collection_name,
+                                 object_type, resources):
+        """Create the resources of a callback with bulk requests in the
+        background, behind the operations queued with ordering_key.
+        """
+        return dispatcher.get_dispatcher().submit_ordered(
+            ordering_key, dispatcher.INTERACTIVE, None,
+            self._send_bulk_from_callback, collection_name, object_type,
+            resources)
+
+    def _send_bulk_from_callback(self, collection_name, object_type,
+                                 resources):
+        try:
+            self.client.post_bulk(collection_name, resources,
+                                  cfg.CONF.ml2_odl.bulk_chunk_size,
+                                  object_type)
+        except Exception:
+            LOG.exception(_LE("Unable to create %(count)d %(object_type)s"),
+                          {'count': len(resources),
+                           'object_type': object_type})
+            self.out_of_sync = True
+
+    @staticmethod
+    def _callback_request(operation, object_type, res_id):
+        if operation == odl_const.ODL_CREATE:
+            return 'post', object_type
+        elif operation == odl_const.ODL_UPDATE:
+            return 'put', object_type + '/' + res_id
+        return 'delete', object_type + '/' + res_id
+
+    @staticmethod
+    def _dispatch(priority, tenant_id, fn, *args):
+        """Run a call to OpenDaylight in the lane of its priority class."""
+        return dispatcher.get_dispatcher().call(priority, tenant_id, fn,
+                                                *args)
 
     def bind_port(self, port_context):
         """Set binding for all valid segments
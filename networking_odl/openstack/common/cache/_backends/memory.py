@@ -0,0 +1,322 @@
+# Copyright 2013 Red Hat, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Bounded in-process cache backend.
+
+Supported options:
+
+`max_entries`: Maximum number of entries, 0 for no limit.
+`max_bytes`: Maximum size of the keys and values, 0 for no limit. Sizes
+  are measured with sys.getsizeof and don't include the objects a value
+  refers to.
+`policy`: Entries evicted first once the cache is full: the least recently
+  used ones with `lru`, the default, or the least frequently used ones
+  with `lfu`.
+
+For example: memory://?max_entries=100000&policy=lru
+
+Expired keys are reclaimed as they expire, the expiry times being kept in
+a heap.
+"""
+
+import collections
+import heapq
+import itertools
+import sys
+import threading
+
+from oslo_utils import timeutils
+import six
+
+from networking_odl.openstack.common.cache import backends
+
+
+class _LRUPolicy(object):
+    """Keys in order of use, the least recently used first."""
+
+    def __init__(self):
+        self._order = collections.OrderedDict()
+
+    def add(self, key):
+        self._order[key] = None
+
+    def touch(self, key):
+        del self._order[key]
+        self._order[key] = None
+
+    def remove(self, key):
+        del self._order[key]
+
+    def victim(self):
+        return next(iter(self._order))
+
+
+class _LFUPolicy(object):
+    """Keys by use count, the least recently used first among equals."""
+
+    def __init__(self):
+        self._counts = {}
+        self._buckets = collections.defaultdict(collections.OrderedDict)
+        self._min_count = None
+
+    def _unlink(self, key, count):
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = None
+
+    def add(self, key):
+        self._counts[key] = 1
+        self._buckets[1][key] = None
+        self._min_count = 1
+
+    def touch(self, key):
+        count = self._counts[key]
+        was_min = self._min_count == count
+        self._unlink(key, count)
+        self._counts[key] = count + 1
+        self._buckets[count + 1][key] = None
+        if was_min and self._min_count is None:
+            # The key was alone in the lowest bucket
+            self._min_count = count + 1
+
+    def remove(self, key):
+        self._unlink(key, self._counts.pop(key))
+
+    def victim(self):
+        if self._min_count is None:
+            # A removal emptied the lowest bucket
+            self._min_count = min(self._buckets)
+        return next(iter(self._buckets[self._min_count]))
+
+
+POLICIES = {'lru': _LRUPolicy, 'lfu': _LFUPolicy}
+
+# The expiry heap is rebuilt from the live entries once it holds more than
+# twice as many items, and at least this many
+_MIN_HEAP_COMPACTION = 1024
+
+
+def _sizeof(key, value):
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class MemoryBackend(backends.BaseCache):
+
+    def __init__(self, parsed_url, options=None):
+        super(MemoryBackend, self).__init__(parsed_url, options)
+        self._max_entries = int(self._options.get('max_entries', 0))
+        self._max_bytes = int(self._options.get('max_bytes', 0))
+        policy = self._options.get('policy', 'lru')
+        if policy not in POLICIES:
+            raise ValueError('Unknown eviction policy %s, expected one of '
+                             '%s' % (policy, ', '.join(sorted(POLICIES))))
+        self._policy_class = POLICIES[policy]
+        self._lock = threading.RLock()
+        self._clear()
+
+    @property
+    def size(self):
+        """Size of the cached keys and values, when max_bytes is set."""
+        return self._size
+
+    def __len__(self):
+        with self._lock:
+            self._purge_expired_unlocked(timeutils.utcnow_ts(microsecond=True))
+            return len(self._cache)
+
+    def _expires_at(self, ttl):
+        if not ttl:
+            return 0
+        return timeutils.utcnow_ts(microsecond=True) + ttl
+
+    def _store_unlocked(self, key, value, expires_at, expiring=None):
+        """Store an entry, return False if it is too large to be kept.
+
+        The key is added to the expiring list, if given, instead of the
+        expiry heap.
+        """
+        size = _sizeof(key, value) if self._max_bytes else 0
+        entry = self._cache.get(key)
+        if self._max_bytes and size > self._max_bytes:
+            if entry is not None:
+                self._remove_unlocked(key)
+            return False
+        if entry is None:
+            # Make room first, so that the new key isn't the one evicted
+            self._evict_unlocked(1, size)
+            self._policy.add(key)
+        else:
+            self._size -= entry[2]
+            self._policy.touch(key)
+        self._cache[key] = (expires_at, value, size)
+        self._size += size
+        if expires_at and (entry is None or entry[0] != expires_at):
+            if expiring is None:
+                self._push_expiry_unlocked(key, expires_at)
+            else:
+                expiring.append(key)
+        if entry is not None:
+            self._evict_unlocked()
+        return key in self._cache
+
+    def _push_expiry_unlocked(self, key, expires_at):
+        # NOTE: the heap items of keys since removed or set again with
+        # another expiry are skipped when popped, and dropped when the heap
+        # is compacted, which keeps it bounded with keys churning.
+        heapq.heappush(self._expiry, (expires_at, next(self._counter), key))
+        self._compact_expiry_unlocked()
+
+    def _extend_expiry_unlocked(self, keys, expires_at):
+        """Add keys sharing an expiry time to the expiry heap."""
+        items = [(expires_at, next(self._counter), key) for key in keys]
+        if len(items) < len(self._expiry):
+            for item in items:
+                heapq.heappush(self._expiry, item)
+        else:
+            # Cheaper to rebuild the heap, in O(n), than push each item
+            self._expiry.extend(items)
+            heapq.heapify(self._expiry)
+        self._compact_expiry_unlocked()
+
+    def _compact_expiry_unlocked(self):
+        if len(self._expiry) > max(2 * len(self._cache),
+                                   _MIN_HEAP_COMPACTION):
+            self._expiry = [(entry[0], next(self._counter), k)
+                            for k, entry in six.iteritems(self._cache)
+                            if entry[0]]
+            heapq.heapify(self._expiry)
+
+    def _purge_expired_unlocked(self, now):
+        """Remove the keys expired at now, in O(log n) per heap item."""
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, _seq, key = heapq.heappop(self._expiry)
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == expires_at:
+                self._remove_unlocked(key)
+
+    def _remove_unlocked(self, key):
+        entry = self._cache.pop(key)
+        self._size -= entry[2]
+        self._policy.remove(key)
+        return entry
+
+    def _evict_unlocked(self, entries=0, size=0):
+        """Evict entries until entries more entries of size bytes fit."""
+        while self._cache and (
+                (self._max_entries and
+                 len(self._cache) + entries > self._max_entries) or
+                (self._max_bytes and self._size + size > self._max_bytes)):
+            self._remove_unlocked(self._policy.victim())
+
+    def _live_entry_unlocked(self, key, now):
+        """Return the entry of a key, None if it is missing or expired."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] and now >= entry[0]:
+            self._remove_unlocked(key)
+            return None
+        return entry
+
+    def _set(self, key, value, ttl=0, not_exists=False):
+        with self._lock:
+            now = timeutils.utcnow_ts(microsecond=True)
+            # Expired keys go before any live one is evicted
+            self._purge_expired_unlocked(now)
+            if not_exists and key in self._cache:
+                return False
+            return self._store_unlocked(key, value, self._expires_at(ttl))
+
+    def _get(self, key, default=None):
+        with self._lock:
+            entry = self._live_entry_unlocked(
+                key, timeutils.utcnow_ts(microsecond=True))
+            if entry is None:
+                return default
+            self._policy.touch(key)
+            return entry[1]
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._live_entry_unlocked(
+                key, timeutils.utcnow_ts(microsecond=True)) is not None
+
+    def _incr_append(self, key, other):
+        with self._lock:
+            entry = self._live_entry_unlocked(
+                key, timeutils.utcnow_ts(microsecond=True))
+            if entry is None:
+                return None
+            expires_at, value, _size = entry
+            new_value = value + other
+            self._store_unlocked(key, new_value, expires_at)
+            return new_value
+
+    def _incr(self, key, delta):
+        if not isinstance(delta, int):
+            raise TypeError('delta must be an int instance')
+
+        return self._incr_append(key, delta)
+
+    def _append_tail(self, key, tail):
+        return self._incr_append(key, tail)
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key in self._cache:
+                return self._remove_unlocked(key)[1]
+
+    def _clear(self):
+        with self._lock:
+            self._cache = {}
+            self._policy = self._policy_class()
+            self._size = 0
+            self._expiry = []
+            self._counter = itertools.count()
+
+    # NOTE: the bulk operations below take the lock and read the clock once
+    # for all the keys, rather than once per key as the defaults do.
+
+    def _get_many(self, keys, default):
+        with self._lock:
+            now = timeutils.utcnow_ts(microsecond=True)
+            values = []
+            for key in keys:
+                entry = self._live_entry_unlocked(key, now)
+                if entry is None:
+                    values.append((key, default))
+                else:
+                    self._policy.touch(key)
+                    values.append((key, entry[1]))
+        return iter(values)
+
+    def _set_many(self, data, ttl=0):
+        with self._lock:
+            now = timeutils.utcnow_ts(microsecond=True)
+            self._purge_expired_unlocked(now)
+            expires_at = now + ttl if ttl else 0
+            expiring = []
+            for key, value in six.iteritems(data):
+                self._store_unlocked(key, value, expires_at, expiring)
+            if expiring:
+                self._extend_expiry_unlocked(expiring, expires_at)
+
+    def _unset_many(self, keys):
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._remove_unlocked(key)
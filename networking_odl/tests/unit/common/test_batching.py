@@ -0,0 +1,181 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from networking_odl.common import batching
+from networking_odl.common import utils
+
+import eventlet
+from eventlet import event
+from eventlet.green import threading as green_threading
+import mock
+from oslo_context import context
+import testtools
+
+
+class BatcherTestCase(testtools.TestCase):
+
+    def setUp(self):
+        super(BatcherTestCase, self).setUp()
+        self.flush_fn = mock.Mock()
+        # NOTE: timers never fire in these tests unless stated otherwise
+        self.batcher = batching.Batcher(self.flush_fn, window=60)
+        self.addCleanup(self.batcher.flush)
+
+    def test_flush_on_yield(self):
+        batcher = batching.Batcher(self.flush_fn)
+        batcher.add('ports', 'port-1')
+        batcher.add('ports', 'port-2')
+        self.assertFalse(self.flush_fn.called)
+        eventlet.sleep(0)
+        self.flush_fn.assert_called_once_with('ports', ['port-1', 'port-2'])
+        self.assertEqual(0, len(batcher))
+
+    def test_timed_flush_request_context(self):
+        request_ids = []
+        batcher = batching.Batcher(
+            lambda key, items: request_ids.append(
+                context.get_current().request_id))
+        with utils.request_context(None):
+            context.RequestContext(request_id='req-1')
+            batcher.add('ports', 'port-1')
+        eventlet.sleep(0)
+        self.assertEqual(['req-1'], request_ids)
+
+    def test_flush_batch(self):
+        self.batcher.add('ports', 'port-1')
+        self.batcher.add('networks', 'net-1')
+        self.batcher.flush('ports')
+        self.flush_fn.assert_called_once_with('ports', ['port-1'])
+        self.assertEqual(1, len(self.batcher))
+
+    def test_flush_all(self):
+        self.batcher.add('ports', 'port-1')
+        self.batcher.add('networks', 'net-1')
+        self.batcher.flush()
+        self.assertEqual([mock.call('ports', ['port-1']),
+                          mock.call('networks', ['net-1'])],
+                         self.flush_fn.call_args_list)
+        self.assertEqual(0, len(self.batcher))
+
+    def test_flush_unknown_batch(self):
+        self.batcher.flush('ports')
+        self.assertFalse(self.flush_fn.called)
+
+    def test_add_item_key_keeps_latest(self):
+        self.batcher.add('port-1', {'status': 'DOWN'}, item_key='port-1')
+        self.batcher.add('port-1', {'status': 'ACTIVE'}, item_key='port-1')
+        self.batcher.flush()
+        self.flush_fn.assert_called_once_with('port-1', [{'status': 'ACTIVE'}])
+
+    def test_discard(self):
+        self.batcher.add('ports', 'port-1')
+        self.batcher.discard('ports')
+        self.batcher.discard('ports')
+        self.batcher.flush()
+        self.assertFalse(self.flush_fn.called)
+
+    def test_replace(self):
+        self.batcher.add('floatingips', {'port_id': None}, item_key='fip-1')
+        self.assertTrue(self.batcher.replace('floatingips', 'fip-1',
+                                             {'port_id': 'port-1'}))
+        self.assertFalse(self.batcher.replace('floatingips', 'fip-2',
+                                              {'port_id': 'port-1'}))
+        self.batcher.flush()
+        self.assertFalse(self.batcher.replace('floatingips', 'fip-1',
+                                              {'port_id': None}))
+        self.flush_fn.assert_called_once_with('floatingips',
+                                              [{'port_id': 'port-1'}])
+
+    def test_remove(self):
+        self.batcher.add('pool-1', 'member-1', item_key='member-1')
+        self.batcher.add('pool-1', 'member-2', item_key='member-2')
+        self.assertTrue(self.batcher.remove('pool-1', 'member-1'))
+        self.assertFalse(self.batcher.remove('pool-1', 'member-1'))
+        self.assertFalse(self.batcher.remove('pool-2', 'member-2'))
+        self.batcher.flush()
+        self.flush_fn.assert_called_once_with('pool-1', ['member-2'])
+
+    @mock.patch.object(batching, 'threading', green_threading)
+    def test_flush_waits_for_flush_in_flight(self):
+        # NOTE: Neutron runs with threading monkey patched by eventlet
+        release = event.Event()
+        flushed = []
+
+        def flush_fn(key, items):
+            if key == 'networks':
+                release.wait()
+            flushed.append(key)
+
+        batcher = batching.Batcher(flush_fn, window=60)
+        batcher.add('networks', 'net-1')
+        # e.g. the flush started by the timer of the networks
+        in_flight = eventlet.spawn(batcher.flush)
+        eventlet.sleep(0)
+        batcher.add('subnets', 'subnet-1')
+        flush = eventlet.spawn(batcher.flush, 'subnets')
+        eventlet.sleep(0.01)
+        # The subnets wait for the networks in flight
+        self.assertEqual([], flushed)
+        self.assertEqual(1, len(batcher))
+        release.send()
+        in_flight.wait()
+        flush.wait()
+        self.assertEqual(['networks', 'subnets'], flushed)
+
+    def test_flush_if(self):
+        self.batcher.add(('ports', 'tenant-1'), 'port-1')
+        self.batcher.add(('networks', 'tenant-1'), 'net-1')
+        self.batcher.add(('networks', 'tenant-2'), 'net-2')
+        self.batcher.flush_if(lambda key: key[0] == 'networks')
+        self.assertEqual([mock.call(('networks', 'tenant-1'), ['net-1']),
+                          mock.call(('networks', 'tenant-2'), ['net-2'])],
+                         self.flush_fn.call_args_list)
+        self.assertEqual(1, len(self.batcher))
+
+    def test_future(self):
+        error = ValueError()
+        self.flush_fn.return_value = [None, error]
+        future_1 = self.batcher.add('floatingips', 'fip-1', item_key='fip-1')
+        future_2 = self.batcher.add('floatingips', 'fip-2')
+        self.assertIs(future_1, self.batcher.replace('floatingips', 'fip-1',
+                                                     'fip-1-updated'))
+        self.assertFalse(future_1.ready())
+        self.batcher.flush()
+        self.assertIsNone(future_1.wait())
+        self.assertRaises(ValueError, future_2.wait)
+
+    def test_future_waits_for_timed_flush(self):
+        batcher = batching.Batcher(self.flush_fn, window=0.01)
+        future = batcher.add('floatingips', 'fip-1')
+        future.wait()
+        self.flush_fn.assert_called_once_with('floatingips', ['fip-1'])
+
+    def test_future_flush_fn_failure(self):
+        self.flush_fn.side_effect = [ValueError, None]
+        future_1 = self.batcher.add('routers', 'fip-1')
+        future_2 = self.batcher.add('floatingips', 'fip-2')
+        self.assertRaises(ValueError, self.batcher.flush)
+        # The other batches are flushed all the same
+        self.assertEqual(2, self.flush_fn.call_count)
+        self.assertRaises(ValueError, future_1.wait)
+        self.assertIsNone(future_2.wait())
+
+    def test_future_removed_or_discarded(self):
+        future_1 = self.batcher.add('pool-1', 'member-1', item_key='member-1')
+        future_2 = self.batcher.add('pool-2', 'member-2')
+        self.batcher.remove('pool-1', 'member-1')
+        self.batcher.discard('pool-2')
+        self.assertTrue(future_1.ready())
+        self.assertTrue(future_2.ready())
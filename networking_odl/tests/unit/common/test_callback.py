@@ -18,6 +18,7 @@ from networking_odl.common import constants as odl_const
 from networking_odl.ml2.mech_driver import OpenDaylightDriver
 
 import mock
+from oslo_config import cfg
 import testtools
 
 from neutron.callbacks import events
@@ -34,6 +35,14 @@ class ODLCallbackTestCase(testtools.TestCase):
         self.sgh = callback.OdlSecurityGroupsHandler(self.odl_client)
         super(ODLCallbackTestCase, self).setUp()
 
+    def test_dispatch_table(self):
+        dispatch = self.sgh._dispatch_table[(resources.SECURITY_GROUP_RULE,
+                                             events.AFTER_DELETE)]
+        self.assertEqual((odl_const.ODL_SG_RULES, odl_const.ODL_SG_RULE,
+                          'security-group-rules', odl_const.ODL_DELETE),
+                         dispatch)
+        self.assertEqual(5, len(self.sgh._dispatch_table))
+
     @mock.patch.object(OpenDaylightDriver, 'sync_from_callback')
     def test_callback_sg_create(self, sfc):
         context = mock.Mock()
@@ -127,3 +136,120 @@ class ODLCallbackTestCase(testtools.TestCase):
         sfc.assert_called_with(odl_const.ODL_DELETE,
                                'security-group-rules',
                                FAKE_ID, None)
+
+    @mock.patch.object(OpenDaylightDriver, 'sync_bulk_from_callback')
+    def test_callback_sg_rules_create_bulk(self, sbfc):
+        cfg.CONF.set_override('enable_bulk', True, 'ml2_odl')
+        self.addCleanup(cfg.CONF.clear_override, 'enable_bulk', 'ml2_odl')
+        context = mock.Mock()
+        rules = [mock.Mock() for i in range(3)]
+        for rule in rules:
+            self.sgh.sg_callback(resources.SECURITY_GROUP_RULE,
+                                 events.AFTER_CREATE,
+                                 "trigger",
+                                 context=context,
+                                 security_group_rule=rule)
+        self.assertFalse(sbfc.called)
+        self.sgh.rule_batcher.flush()
+
+        sbfc.assert_called_once_with(odl_const.ODL_SG_RULES,
+                                     'security-group-rules', rules)
+
+    @mock.patch.object(OpenDaylightDriver, 'sync_bulk_from_callback')
+    @mock.patch.object(OpenDaylightDriver, 'sync_from_callback')
+    def test_callback_sg_rules_delete_flushes_bulk(self, sfc, sbfc):
+        cfg.CONF.set_override('enable_bulk', True, 'ml2_odl')
+        self.addCleanup(cfg.CONF.clear_override, 'enable_bulk', 'ml2_odl')
+        context = mock.Mock()
+        rule = mock.Mock()
+        self.sgh.sg_callback(resources.SECURITY_GROUP_RULE,
+                             events.AFTER_CREATE, "trigger",
+                             context=context, security_group_rule=rule)
+        self.sgh.sg_callback(resources.SECURITY_GROUP_RULE,
+                             events.AFTER_DELETE, "trigger",
+                             context=context,
+                             security_group_rule_id=FAKE_ID)
+
+        sbfc.assert_called_once_with(odl_const.ODL_SG_RULES,
+                                     'security-group-rules', [rule])
+        sfc.assert_called_once_with(odl_const.ODL_DELETE,
+                                    'security-group-rules', FAKE_ID, None)
+
+    @mock.patch.object(OpenDaylightDriver, 'queue_from_callback')
+    def test_callback_async_ordering_keys(self, qfc):
+        cfg.CONF.set_override('async_sg_callbacks', True, 'ml2_odl')
+        self.addCleanup(cfg.CONF.clear_override, 'async_sg_callbacks',
+                        'ml2_odl')
+        context = mock.Mock()
+        sg = {'id': 'sg-1'}
+        rule = {'id': 'rule-1', 'security_group_id': 'sg-1'}
+        self.sgh.sg_callback(resources.SECURITY_GROUP, events.AFTER_CREATE,
+                             "trigger", context=context, security_group=sg)
+        self.sgh.sg_callback(resources.SECURITY_GROUP_RULE,
+                             events.AFTER_CREATE, "trigger",
+                             context=context, security_group_rule=rule)
+        trigger = mock.Mock()
+        trigger.get_security_group_rule.return_value = rule
+        self.sgh.rule_before_delete(resources.SECURITY_GROUP_RULE,
+                                    events.BEFORE_DELETE, trigger,
+                                    context=context,
+                                    security_group_rule_id='rule-1')
+        self.sgh.sg_callback(resources.SECURITY_GROUP_RULE,
+                             events.AFTER_DELETE, trigger,
+                             context=context,
+                             security_group_rule_id='rule-1')
+
+        trigger.get_security_group_rule.assert_called_once_with(
+            context, 'rule-1', fields=['security_group_id'])
+        self.assertEqual(
+            [mock.call('sg-1', odl_const.ODL_CREATE, 'security-groups',
+                       None, {'security_group': sg}),
+             mock.call('sg-1', odl_const.ODL_CREATE, 'security-group-rules',
+                       None, {'security_group_rule': rule}),
+             mock.call('sg-1', odl_const.ODL_DELETE, 'security-group-rules',
+                       'rule-1', None)],
+            qfc.call_args_list)
+        self.assertEqual({}, self.sgh._deleted_rule_sgs[context])
+
+    @mock.patch.object(OpenDaylightDriver, 'queue_from_callback')
+    def test_callback_async_rule_delete_ordering_key(self, qfc):
+        cfg.CONF.set_override('async_sg_callbacks', True, 'ml2_odl')
+        self.addCleanup(cfg.CONF.clear_override, 'async_sg_callbacks',
+                        'ml2_odl')
+        self.sgh.sg_callback(resources.SECURITY_GROUP_RULE,
+                             events.AFTER_DELETE, "trigger",
+                             context=mock.Mock(),
+                             security_group_rule_id='rule-1',
+                             security_group_id='sg-1')
+        self.sgh.sg_callback(resources.SECURITY_GROUP_RULE,
+                             events.AFTER_DELETE, "trigger",
+                             context=mock.Mock(),
+                             security_group_rule_id='rule-2')
+
+        self.assertEqual(
+            [mock.call('sg-1', odl_const.ODL_DELETE, 'security-group-rules',
+                       'rule-1', None),
+             mock.call('rule-2', odl_const.ODL_DELETE,
+                       'security-group-rules', 'rule-2', None)],
+            qfc.call_args_list)
+
+    @mock.patch.object(OpenDaylightDriver, 'queue_bulk_from_callback')
+    def test_callback_async_bulk_rules_per_group(self, qbfc):
+        for opt in ('async_sg_callbacks', 'enable_bulk'):
+            cfg.CONF.set_override(opt, True, 'ml2_odl')
+            self.addCleanup(cfg.CONF.clear_override, opt, 'ml2_odl')
+        rules = [{'id': 'rule-%d' % i, 'security_group_id': 'sg-%d' % (i % 2)}
+                 for i in range(3)]
+        for rule in rules:
+            self.sgh.sg_callback(resources.SECURITY_GROUP_RULE,
+                                 events.AFTER_CREATE, "trigger",
+                                 context=mock.Mock(),
+                                 security_group_rule=rule)
+        self.sgh.rule_batcher.flush()
+
+        self.assertEqual(
+            [mock.call('sg-0', odl_const.ODL_SG_RULES, 'security-group-rules',
+                       [rules[0], rules[2]]),
+             mock.call('sg-1', odl_const.ODL_SG_RULES, 'security-group-rules',
+                       [rules[1]])],
+            qbfc.call_args_list)
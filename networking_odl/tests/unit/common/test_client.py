@@ -0,0 +1,135 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from networking_odl.common import client
+from networking_odl.common import tracing
+
+import mock
+import requests
+import testtools
+
+
+class RecordingTracer(tracing.NoopTracer):
+
+    def __init__(self):
+        self.spans = []
+
+    def report(self, span):
+        self.spans.append(span)
+
+
+class OpenDaylightRestClientTestCase(testtools.TestCase):
+
+    def setUp(self):
+        super(OpenDaylightRestClientTestCase, self).setUp()
+        self.tracer = RecordingTracer()
+        self.client = client.OpenDaylightRestClient(
+            'http://localhost:8080/controller/nb/v2/neutron', 'admin',
+            'admin', 10, tracer=self.tracer)
+
+    def _sendjson(self, status_code, request_id=None):
+        response = mock.Mock(status_code=status_code)
+        if status_code >= 400:
+            response.raise_for_status.side_effect = (
+                requests.exceptions.HTTPError())
+        request_context = mock.Mock(request_id=request_id)
+        with mock.patch('requests.request',
+                        return_value=response) as mock_request, \
+                mock.patch('oslo_context.context.get_current',
+                           return_value=request_context):
+            self.client.sendjson('post', 'networks',
+                                 {'network': {'id': 'fake-id'}})
+        return mock_request
+
+    def test_sendjson_request_id_header(self):
+        mock_request = self._sendjson(201, request_id='req-1234')
+        headers = mock_request.call_args[1]['headers']
+        self.assertEqual('req-1234', headers[client.REQUEST_ID_HEADER])
+
+    def test_sendjson_without_request_context(self):
+        mock_request = self._sendjson(201)
+        headers = mock_request.call_args[1]['headers']
+        self.assertNotIn(client.REQUEST_ID_HEADER, headers)
+
+    def test_sendjson_reports_span(self):
+        mock_request = self._sendjson(201, request_id='req-1234')
+        self.assertEqual(1, len(self.tracer.spans))
+        span = self.tracer.spans[0]
+        self.assertEqual('post', span.tags['method'])
+        self.assertEqual('networks', span.tags['urlpath'])
+        self.assertEqual('req-1234', span.tags['request_id'])
+        self.assertEqual(201, span.tags['status'])
+        self.assertEqual(len(mock_request.call_args[1]['data']),
+                         span.tags['payload_size'])
+        self.assertIsNotNone(span.duration)
+
+    def test_sendjson_reports_span_on_error(self):
+        self.assertRaises(requests.exceptions.HTTPError,
+                          self._sendjson, 404)
+        span = self.tracer.spans[0]
+        self.assertEqual(404, span.tags['status'])
+        self.assertEqual('HTTPError', span.tags['error'])
+
+    def test_post_bulk_chunks(self):
+        resources = [{'id': str(i)} for i in range(5)]
+        with mock.patch.object(self.client, 'sendjson') as mock_sendjson:
+            self.client.post_bulk('security_group_rules', resources, 2)
+        self.assertEqual(
+            [mock.call('post', 'security-group-rules',
+                       {'security_group_rules': resources[0:2]}),
+             mock.call('post', 'security-group-rules',
+                       {'security_group_rules': resources[2:4]}),
+             mock.call('post', 'security-group-rules',
+                       {'security_group_rule': resources[4]})],
+            mock_sendjson.call_args_list)
+
+    def test_post_bulk_nothing_to_send(self):
+        with mock.patch.object(self.client, 'sendjson') as mock_sendjson:
+            self.client.post_bulk('ports', [], 100)
+        self.assertFalse(mock_sendjson.called)
+
+    def test_post_bulk_with_fallback(self):
+        resources = [{'id': str(i)} for i in range(5)]
+        error = Exception()
+
+        def sendjson(method, urlpath, obj):
+            # The first chunk and the resource 1 are rejected
+            if obj == {'ports': resources[0:2]} or obj == {
+                    'port': resources[1]}:
+                raise error
+
+        with mock.patch.object(self.client, 'sendjson',
+                               side_effect=sendjson) as mock_sendjson:
+            results = self.client.post_bulk_with_fallback(
+                'ports', resources, 2, 'fake/ports')
+        self.assertEqual([(resources[0], None), (resources[1], error),
+                          (resources[2], None), (resources[3], None),
+                          (resources[4], None)], results)
+        self.assertEqual(
+            [mock.call('post', 'fake/ports', {'ports': resources[0:2]}),
+             mock.call('post', 'fake/ports', {'port': resources[0]}),
+             mock.call('post', 'fake/ports', {'port': resources[1]}),
+             mock.call('post', 'fake/ports', {'ports': resources[2:4]}),
+             mock.call('post', 'fake/ports', {'port': resources[4]})],
+            mock_sendjson.call_args_list)
+
+    def test_get_collection(self):
+        response = mock.Mock()
+        response.json.return_value = {'routers': [{'id': 'fake-id'}]}
+        with mock.patch.object(self.client, 'sendjson',
+                               return_value=response) as mock_sendjson:
+            routers = self.client.get_collection('routers')
+        mock_sendjson.assert_called_once_with('get', 'routers', None)
+        self.assertEqual([{'id': 'fake-id'}], routers)
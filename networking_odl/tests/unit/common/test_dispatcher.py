@@ -0,0 +1,148 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from networking_odl.common import constants as odl_const
+from networking_odl.common import dispatcher
+from networking_odl.common import utils
+
+from oslo_context import context
+import testtools
+
+WEIGHTS = {dispatcher.INTERACTIVE: 4,
+           dispatcher.UPDATE: 2,
+           dispatcher.BACKGROUND: 1}
+
+
+class DispatcherTestCase(testtools.TestCase):
+
+    def setUp(self):
+        super(DispatcherTestCase, self).setUp()
+        self.executed = []
+
+    def _record(self, name):
+        self.executed.append(name)
+        return name
+
+    def _block_worker(self, disp):
+        """Keep the only worker busy until the returned event is set."""
+        release = threading.Event()
+        disp.submit(dispatcher.INTERACTIVE, None, release.wait)
+        return release
+
+    def test_get_priority(self):
+        self.assertEqual(dispatcher.INTERACTIVE,
+                         dispatcher.get_priority(odl_const.ODL_CREATE))
+        self.assertEqual(dispatcher.INTERACTIVE,
+                         dispatcher.get_priority(odl_const.ODL_DELETE))
+        self.assertEqual(dispatcher.UPDATE,
+                         dispatcher.get_priority(odl_const.ODL_UPDATE))
+
+    def test_call_without_workers(self):
+        disp = dispatcher.Dispatcher(0, WEIGHTS)
+        self.assertEqual('create',
+                         disp.call(dispatcher.INTERACTIVE, 'tenant',
+                                   self._record, 'create'))
+        self.assertEqual(['create'], self.executed)
+
+    def test_call_reraises(self):
+        disp = dispatcher.Dispatcher(1, WEIGHTS)
+        self.assertRaises(ZeroDivisionError,
+                          disp.call, dispatcher.UPDATE, None, lambda: 1 / 0)
+
+    def test_weighted_round_robin(self):
+        disp = dispatcher.Dispatcher(1, WEIGHTS)
+        release = self._block_worker(disp)
+        ops = []
+        for i in range(7):
+            for priority in dispatcher.PRIORITIES:
+                ops.append(disp.submit(priority, None, self._record,
+                                       '%s-%d' % (priority, i)))
+        release.set()
+        for op in ops:
+            op.wait()
+        # Interactive operations get 4 slots out of 7 while all the queues
+        # are busy, updates 2 and background work 1.
+        first_round = [name.split('-')[0] for name in self.executed[:7]]
+        self.assertEqual(4, first_round.count(dispatcher.INTERACTIVE))
+        self.assertEqual(2, first_round.count(dispatcher.UPDATE))
+        self.assertEqual(1, first_round.count(dispatcher.BACKGROUND))
+        self.assertEqual(21, len(self.executed))
+
+    def test_fifo_within_priority(self):
+        disp = dispatcher.Dispatcher(1, WEIGHTS)
+        release = self._block_worker(disp)
+        ops = [disp.submit(dispatcher.BACKGROUND, None, self._record, i)
+               for i in range(5)]
+        release.set()
+        for op in ops:
+            op.wait()
+        self.assertEqual(list(range(5)), self.executed)
+
+    def test_round_robin_across_tenants(self):
+        disp = dispatcher.Dispatcher(1, WEIGHTS)
+        release = self._block_worker(disp)
+        ops = [disp.submit(dispatcher.INTERACTIVE, 'noisy', self._record,
+                           'noisy-%d' % i) for i in range(4)]
+        ops += [disp.submit(dispatcher.INTERACTIVE, tenant_id, self._record,
+                            tenant_id) for tenant_id in ('quiet1', 'quiet2')]
+        release.set()
+        for op in ops:
+            op.wait()
+        self.assertEqual(['noisy-0', 'quiet1', 'quiet2', 'noisy-1',
+                          'noisy-2', 'noisy-3'], self.executed)
+
+    def test_tenant_max_inflight(self):
+        disp = dispatcher.Dispatcher(2, WEIGHTS, tenant_max_inflight=1)
+        release = threading.Event()
+        blocked = disp.submit(dispatcher.INTERACTIVE, 'noisy', release.wait)
+        queued = disp.submit(dispatcher.INTERACTIVE, 'noisy', self._record,
+                             'noisy')
+        # The second worker is free, yet only serves the other tenant
+        disp.call(dispatcher.INTERACTIVE, 'quiet', self._record, 'quiet')
+        self.assertEqual(['quiet'], self.executed)
+        release.set()
+        blocked.wait()
+        queued.wait()
+        self.assertEqual(['quiet', 'noisy'], self.executed)
+
+    def test_submit_ordered(self):
+        disp = dispatcher.Dispatcher(3, WEIGHTS)
+        release = threading.Event()
+        first = disp.submit_ordered('sg-1', dispatcher.BACKGROUND, None,
+                                    release.wait)
+        ops = [disp.submit_ordered('sg-1', dispatcher.INTERACTIVE, None,
+                                   self._record, 'sg-1-%d' % i)
+               for i in range(3)]
+        # Calls of other keys are not held back
+        disp.submit_ordered('sg-2', dispatcher.INTERACTIVE, None,
+                            self._record, 'sg-2').wait()
+        self.assertEqual(['sg-2'], self.executed)
+        release.set()
+        first.wait()
+        for op in ops:
+            op.wait()
+        self.assertEqual(['sg-2', 'sg-1-0', 'sg-1-1', 'sg-1-2'],
+                         self.executed)
+        self.assertEqual({}, disp._ordered)
+
+    def test_request_context(self):
+        disp = dispatcher.Dispatcher(1, WEIGHTS)
+        with utils.request_context(None):
+            context.RequestContext(request_id='req-1')
+            op = disp.submit(dispatcher.INTERACTIVE, None,
+                             lambda: context.get_current().request_id)
+        self.assertEqual('req-1', op.wait())
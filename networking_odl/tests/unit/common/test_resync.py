@@ -0,0 +1,132 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from networking_odl.common import resync
+from networking_odl.common import tracing
+
+import eventlet
+import mock
+import testtools
+
+
+class RecordingTracer(tracing.NoopTracer):
+
+    def __init__(self):
+        self.spans = []
+
+    def report(self, span):
+        self.spans.append(span)
+
+
+class ResyncTestCase(testtools.TestCase):
+
+    def test_diff_collection(self):
+        neutron_resources = [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}]
+        odl_resources = [{'id': 'b'}, {'id': 'd'}]
+        missing, extra = resync.diff_collection(neutron_resources,
+                                                odl_resources)
+        self.assertEqual([{'id': 'a'}, {'id': 'c'}], missing)
+        self.assertEqual(['d'], extra)
+
+    def test_find_changed(self):
+        neutron_resources = [{'id': 'a', 'name': 'new'},
+                             {'id': 'b', 'name': 'same', 'extra': 1},
+                             {'id': 'c', 'name': 'missing'}]
+        odl_resources = [{'id': 'a', 'name': 'old'},
+                         {'id': 'b', 'name': 'same'}]
+        self.assertEqual([{'id': 'a', 'name': 'new'}],
+                         resync.find_changed(neutron_resources,
+                                             odl_resources))
+
+    def test_reconcile_collection(self):
+        client = mock.Mock()
+        client.get_collection.return_value = [{'id': 'b'}, {'id': 'd'}]
+        created = resync.reconcile_collection(
+            client, 'floatingips', [{'id': 'a'}, {'id': 'b'}], 100)
+
+        self.assertEqual([{'id': 'a'}], created)
+        client.get_collection.assert_called_once_with('floatingips',
+                                                      'floatingips')
+        client.post_bulk.assert_called_once_with(
+            'floatingips', [{'id': 'a'}], 100, 'floatingips')
+        client.sendjson.assert_called_once_with('delete', 'floatingips/d',
+                                                None)
+
+    def test_reconcile_collection_urlpath(self):
+        client = mock.Mock()
+        client.get_collection.return_value = []
+        resync.reconcile_collection(client, 'loadbalancers', [], 100,
+                                    urlpath='lbaas/loadbalancers')
+        client.get_collection.assert_called_once_with('loadbalancers',
+                                                      'lbaas/loadbalancers')
+        self.assertFalse(client.sendjson.called)
+
+    def test_reconcile_collection_update(self):
+        client = mock.Mock(tracer=RecordingTracer())
+        client.get_collection.return_value = [{'id': 'a', 'weight': 1},
+                                              {'id': 'b', 'weight': 1},
+                                              {'id': 'c', 'weight': 1}]
+        resync.reconcile_collection(
+            client, 'members', [{'id': 'a', 'weight': 2},
+                                {'id': 'b', 'weight': 1}], 100,
+            urlpath='lbaas/pools/pool-id/members', update=True,
+            pool=eventlet.GreenPool(2))
+
+        self.assertEqual(
+            [mock.call('put', 'lbaas/pools/pool-id/members/a',
+                       {'member': {'id': 'a', 'weight': 2}}),
+             mock.call('delete', 'lbaas/pools/pool-id/members/c', None)],
+            client.sendjson.call_args_list)
+        span = client.tracer.spans[0]
+        self.assertEqual('members', span.tags['collection'])
+        self.assertEqual((0, 1, 1), (span.tags['created'],
+                                     span.tags['updated'],
+                                     span.tags['deleted']))
+        self.assertIsNotNone(span.duration)
+
+    def test_reconcile_collection_filter_update(self):
+        client = mock.Mock()
+        client.get_collection.return_value = [{'id': 'a', 'name': 'old'}]
+        router = {'id': 'a', 'name': 'new', 'status': 'ACTIVE'}
+        resync.reconcile_collection(
+            client, 'routers', [router], 100, update=True,
+            filter_update=lambda resource: resource.pop('status'))
+
+        client.sendjson.assert_called_once_with(
+            'put', 'routers/a', {'router': {'id': 'a', 'name': 'new'}})
+        self.assertEqual('ACTIVE', router['status'])
+
+    def test_reconcile_collection_stale(self):
+        client = mock.Mock()
+        client.get_collection.return_value = [{'id': 'a'}, {'id': 'b'}]
+        stale = ['pools/x']
+        resync.reconcile_collection(client, 'pools', [{'id': 'b'}], 100,
+                                    stale=stale)
+        self.assertFalse(client.sendjson.called)
+        self.assertEqual(['pools/x', 'pools/a'], stale)
+
+        resync.delete_stale(client, stale, pool=eventlet.GreenPool(2))
+        self.assertEqual([mock.call('delete', 'pools/x', None),
+                          mock.call('delete', 'pools/a', None)],
+                         client.sendjson.call_args_list)
+
+    def test_reconcile_collection_failure(self):
+        client = mock.Mock(tracer=RecordingTracer())
+        client.get_collection.return_value = [{'id': 'a'}]
+        client.sendjson.side_effect = ValueError
+        self.assertRaises(ValueError, resync.reconcile_collection,
+                          client, 'pools', [], 100,
+                          pool=eventlet.GreenPool(2))
+        self.assertEqual('ValueError', client.tracer.spans[0].tags['error'])
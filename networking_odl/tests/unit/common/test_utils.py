@@ -0,0 +1,53 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from networking_odl.common import utils
+
+from oslo_context import context
+
+import mock
+import testtools
+
+
+class UtilsTestCase(testtools.TestCase):
+
+    def test_try_del(self):
+        d = {'id': 'fake-id', 'status': 'ACTIVE'}
+        utils.try_del(d, ['status', 'tenant_id'])
+        self.assertEqual({'id': 'fake-id'}, d)
+
+    def test_freeze(self):
+        route = {'destination': '10.0.0.0/24', 'nexthop': '192.168.0.1'}
+        self.assertEqual(utils.freeze(route), utils.freeze(dict(route)))
+        self.assertEqual(1, len(set([utils.freeze([route]),
+                                     utils.freeze([dict(route)])])))
+        self.assertNotEqual(
+            utils.freeze(route),
+            utils.freeze(dict(route, nexthop='192.168.0.2')))
+
+    def test_request_context(self):
+        with utils.request_context(None):
+            first = context.RequestContext(request_id='req-1')
+            second = context.RequestContext(request_id='req-2',
+                                            overwrite=False)
+            with utils.request_context(second):
+                self.assertIs(second, context.get_current())
+            self.assertIs(first, context.get_current())
+
+    def test_request_context_installs_with_update_store(self):
+        ctx = context.RequestContext(request_id='req-1', overwrite=False)
+        with mock.patch.object(ctx, 'update_store') as update_store:
+            with utils.request_context(ctx):
+                update_store.assert_called_once_with()
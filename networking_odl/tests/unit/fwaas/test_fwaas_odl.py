@@ -17,9 +17,14 @@ test_fwaas_odl
 Tests for the L3 FWaaS plugin for networking-odl.
 """
 
+import mock
+from oslo_config import cfg
+import requests
+
 from networking_odl.fwaas import driver as fwaas_odl
 
 from neutron.tests import base
+from neutron_fwaas.extensions import firewall as fw_ext
 
 
 class TestODL_FWaaS(base.BaseTestCase):
@@ -27,3 +32,156 @@ class TestODL_FWaaS(base.BaseTestCase):
     def test_init(self):
         # just create an instance of OpenDaylightFwaasDriver
         fwaas_odl.OpenDaylightFwaasDriver()
+
+
+class TestODL_FWaaS_Policy(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestODL_FWaaS_Policy, self).setUp()
+        self.driver = fwaas_odl.OpenDaylightFwaasDriver()
+        self.driver.client = mock.Mock()
+        self.driver.client.get_collection.return_value = []
+        self.apply_list = [mock.Mock(router_id='router-2'),
+                           mock.Mock(router_id='router-1')]
+
+    def _firewall(self, rules):
+        return {'id': 'fw', 'tenant_id': 'tenant', 'admin_state_up': True,
+                'firewall_policy_id': 'policy',
+                'firewall_rule_list': [
+                    {'id': rule_id, 'enabled': True, 'action': 'allow',
+                     'protocol': 'tcp',
+                     'destination_port': str(10 * ord(rule_id))}
+                    for rule_id in rules]}
+
+    def _create(self, rules):
+        not_found = requests.exceptions.HTTPError(
+            response=mock.Mock(status_code=requests.codes.not_found))
+        self.driver.client.sendjson.side_effect = [not_found, None, None,
+                                                   None]
+        if not isinstance(rules, dict):
+            rules = self._firewall(rules)
+        self.driver.create_firewall(self.apply_list, rules)
+        self.driver.client.reset_mock()
+        self.driver.client.sendjson.side_effect = None
+
+    def test_create_firewall(self):
+        self._create(['a', 'b'])
+        self.assertEqual(['router-1', 'router-2'],
+                         self.driver._firewalls['fw']['router_ids'])
+        self.assertEqual(['a', 'b'],
+                         [r['id'] for r in self.driver._policies['policy']])
+
+    def test_update_firewall_sends_diff(self):
+        self._create(['a', 'b', 'c'])
+        firewall = self._firewall(['a', 'c', 'd'])
+        firewall['firewall_rule_list'][1]['action'] = 'deny'
+        self.driver.update_firewall(self.apply_list, firewall)
+        client = self.driver.client
+        client.sendjson.assert_has_calls([
+            mock.call('post', fwaas_odl.FIREWALL_RULES, mock.ANY),
+            mock.call('put', fwaas_odl.FIREWALL_RULES + '/c', mock.ANY)],
+            any_order=True)
+        self.assertEqual('d', client.sendjson.call_args_list[0][0][2][
+            'firewall_rule']['id'])
+        client.sendjson.assert_has_calls([
+            mock.call('put', fwaas_odl.FIREWALL_POLICIES + '/policy',
+                      {'firewall_policy': {
+                          'id': 'policy', 'tenant_id': 'tenant',
+                          'firewall_rules': ['a', 'c', 'd']}}),
+            mock.call('delete', fwaas_odl.FIREWALL_RULES + '/b', None)])
+        # The firewall itself did not change
+        self.assertEqual(4, client.sendjson.call_count)
+
+    def test_update_firewall_unchanged(self):
+        self._create(['a', 'b'])
+        self.driver.update_firewall(self.apply_list,
+                                    self._firewall(['a', 'b']))
+        self.assertFalse(self.driver.client.sendjson.called)
+
+    def test_apply_default_policy(self):
+        self._create(['a'])
+        self.driver.apply_default_policy(self.apply_list,
+                                         self._firewall(['a']))
+        self.driver.client.sendjson.assert_called_once_with(
+            'put', fwaas_odl.FIREWALLS + '/fw', mock.ANY)
+        payload = self.driver.client.sendjson.call_args[0][2]['firewall']
+        self.assertIsNone(payload['firewall_policy_id'])
+
+    def test_delete_firewall(self):
+        self._create(['a'])
+        self.driver.delete_firewall(self.apply_list, self._firewall(['a']))
+        self.driver.client.sendjson.assert_has_calls([
+            mock.call('delete', fwaas_odl.FIREWALLS + '/fw', None),
+            mock.call('delete', fwaas_odl.FIREWALL_POLICIES + '/policy',
+                      None),
+            mock.call('delete', fwaas_odl.FIREWALL_RULES + '/a', None)])
+        self.assertEqual({}, self.driver._policies)
+        self.assertEqual({}, self.driver._firewalls)
+
+    def test_delete_firewall_policy_in_use(self):
+        self._create(['a'])
+        # Another firewall uses the policy in ODL, e.g. since a restart
+        self.driver.client.get_collection.return_value = [
+            {'id': 'fw-2', 'firewall_policy_id': 'policy'}]
+        self.driver.delete_firewall(self.apply_list, self._firewall(['a']))
+        self.driver.client.get_collection.assert_called_once_with(
+            'firewalls', fwaas_odl.FIREWALLS)
+        self.driver.client.sendjson.assert_called_once_with(
+            'delete', fwaas_odl.FIREWALLS + '/fw', None)
+        self.assertIn('policy', self.driver._policies)
+
+    def test_delete_firewall_after_restart(self):
+        self.driver.client.sendjson.side_effect = [
+            None, mock.Mock(json=lambda: {'firewall_policy': {
+                'firewall_rules': ['a', 'b']}}), None, None, None]
+        self.driver.delete_firewall(self.apply_list, self._firewall(['a']))
+        # The rules of the policy are read from ODL
+        self.driver.client.sendjson.assert_has_calls([
+            mock.call('get', fwaas_odl.FIREWALL_POLICIES + '/policy', None),
+            mock.call('delete', fwaas_odl.FIREWALL_POLICIES + '/policy',
+                      None)])
+        self.driver.client.sendjson.assert_has_calls([
+            mock.call('delete', fwaas_odl.FIREWALL_RULES + '/a', None),
+            mock.call('delete', fwaas_odl.FIREWALL_RULES + '/b', None)],
+            any_order=True)
+
+    def test_update_firewall_failure(self):
+        self._create(['a'])
+        self.driver.client.sendjson.side_effect = Exception
+        self.assertRaises(fw_ext.FirewallInternalDriverError,
+                          self.driver.update_firewall, self.apply_list,
+                          self._firewall(['b']))
+        self.assertNotIn('policy', self.driver._policies)
+
+    def test_create_firewall_optimizes_rules(self):
+        cfg.CONF.set_override('optimize_firewall_rules', True, 'ml2_odl')
+        self.addCleanup(cfg.CONF.clear_override, 'optimize_firewall_rules',
+                        'ml2_odl')
+        firewall = self._firewall(['a', 'b'])
+        # A duplicate of a is shadowed by it
+        firewall['firewall_rule_list'].append(
+            dict(firewall['firewall_rule_list'][0], id='c'))
+        self._create(firewall)
+        self.assertEqual(['a', 'b'],
+                         [r['id'] for r in self.driver._policies['policy']])
+
+    def test_create_firewall_without_optimization(self):
+        self._create(['a', 'a'])
+        self.assertEqual(2, len(self.driver._policies['policy']))
+
+    def test_update_firewall_reports_all_failures(self):
+        self._create(['a', 'b', 'c'])
+        firewall = self._firewall(['a', 'b', 'c'])
+        for rule in firewall['firewall_rule_list']:
+            rule['action'] = 'deny'
+        self.driver.client.sendjson.side_effect = [Exception, None, Exception]
+        with mock.patch.object(fwaas_odl, 'LOG') as mock_log:
+            self.assertRaises(fw_ext.FirewallInternalDriverError,
+                              self.driver.update_firewall, self.apply_list,
+                              firewall)
+        # All the rules were sent, and the failures reported at once
+        self.assertEqual(3, self.driver.client.sendjson.call_count)
+        self.assertEqual(1, mock_log.error.call_count)
+        report = mock_log.error.call_args[0][1]
+        self.assertEqual(2, report['failed'])
+        self.assertEqual('router-1, router-2', report['routers'])
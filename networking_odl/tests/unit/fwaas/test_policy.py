@@ -0,0 +1,106 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+test_policy
+----------------------------------
+
+Tests for the firewall policy compilation of the FWaaS driver.
+"""
+
+from networking_odl.fwaas import policy
+
+import testtools
+
+
+def _rule(rule_id, **kwargs):
+    rule = dict((attr, None) for attr in policy.RULE_ATTRIBUTES)
+    rule.update(id=rule_id, enabled=True, action='allow')
+    rule.update(kwargs)
+    return rule
+
+
+class TestPolicy(testtools.TestCase):
+
+    def test_compile_rules(self):
+        firewall = {'firewall_rule_list': [
+            dict(_rule('a'), position=1),
+            _rule('b', enabled=False),
+            _rule('c')]}
+        rules = policy.compile_rules(firewall)
+        self.assertEqual(['a', 'c'], [rule['id'] for rule in rules])
+        self.assertNotIn('position', rules[0])
+
+    def test_compile_rules_without_policy(self):
+        self.assertEqual([], policy.compile_rules({}))
+
+    def test_diff_rules_unchanged(self):
+        rules = [_rule(rule_id) for rule_id in 'abc']
+        self.assertEqual(([], [], [], []),
+                         policy.diff_rules(rules, list(rules)))
+
+    def test_diff_rules(self):
+        old = [_rule(rule_id) for rule_id in 'abcde']
+        new = [_rule('x'), _rule('a'), _rule('c', action='deny'),
+               _rule('d'), _rule('b'), _rule('e')]
+        diff = policy.diff_rules(old, new)
+        self.assertEqual(['x'], [rule['id'] for rule in diff.inserted])
+        self.assertEqual([], diff.removed)
+        self.assertEqual(['c'], [rule['id'] for rule in diff.changed])
+        # b moved after d, a, c, d and e kept their relative order
+        self.assertEqual(['b'], diff.moved)
+
+    def test_diff_rules_removed(self):
+        old = [_rule(rule_id) for rule_id in 'abc']
+        new = [_rule('c'), _rule('a')]
+        diff = policy.diff_rules(old, new)
+        self.assertEqual(['b'], diff.removed)
+        self.assertEqual(1, len(diff.moved))
+
+    def test_diff_rules_large_policy(self):
+        old = [_rule('rule-%d' % i) for i in range(500)]
+        new = list(old)
+        new[250] = _rule('rule-250', destination_port='8080')
+        diff = policy.diff_rules(old, new)
+        self.assertEqual(([], [], [new[250]], []), diff)
+
+    def test_optimize_rules_shadowed(self):
+        rules = [_rule('web', protocol='tcp', destination_port='80:90',
+                       destination_ip_address='10.0.0.0/16'),
+                 _rule('deny', protocol='tcp', destination_port='81',
+                       destination_ip_address='10.0.1.0/24', action='deny'),
+                 _rule('any', action='deny'),
+                 _rule('never', protocol='udp')]
+        optimized, removed = policy.optimize_rules(rules)
+        self.assertEqual(['web', 'any'], [rule['id'] for rule in optimized])
+        self.assertEqual(2, removed)
+
+    def test_optimize_rules_merges_adjacent(self):
+        rules = [_rule('a', protocol='tcp', destination_port='80:89'),
+                 _rule('b', protocol='tcp', destination_port='90'),
+                 _rule('c', protocol='tcp', destination_port='91:100'),
+                 _rule('d', protocol='tcp', source_ip_address='10.0.0.0/25'),
+                 _rule('e', protocol='tcp', source_ip_address='10.0.0.128/25')]
+        optimized, removed = policy.optimize_rules(rules)
+        self.assertEqual(3, removed)
+        self.assertEqual(['a', 'd'], [rule['id'] for rule in optimized])
+        self.assertEqual('80:100', optimized[0]['destination_port'])
+        self.assertEqual('10.0.0.0/24', optimized[1]['source_ip_address'])
+
+    def test_optimize_rules_keeps_distinct_rules(self):
+        rules = [_rule('a', protocol='tcp', destination_port='80'),
+                 _rule('b', protocol='tcp', destination_port='81',
+                       action='deny'),
+                 _rule('c', protocol='tcp', destination_port='443'),
+                 _rule('d', protocol='udp', destination_port='443',
+                       source_ip_address='10.0.0.0/24')]
+        self.assertEqual((rules, 0), policy.optimize_rules(rules))
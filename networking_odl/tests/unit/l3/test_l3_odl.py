@@ -19,9 +19,19 @@ test_l3_odl
 Tests for the L3 service plugin for networking-odl.
 """
 import copy
+import eventlet
 import mock
+import requests
 
+from oslo_config import cfg
+
+from networking_odl.common import dispatcher
+from networking_odl.extensions import bulkrouterinterface
+from networking_odl.l3 import l3_odl
+
+from neutron.common import exceptions as n_exc
 from neutron.extensions import l3
+from neutron.tests import base
 from neutron.tests.unit.api.v2 import test_base
 from neutron.tests.unit.extensions import base as test_extensions_base
 from webob import exc
@@ -303,3 +313,519 @@ class Testodll3(test_extensions_base.ExtensionTestCase):
         self.assertEqual(res['id'], router_id)
         self.assertEqual(res['subnet_id'],
                          "a2f1f29d-571b-4533-907f-5803ab96ead1")
+
+
+class OpenDaylightL3RouterPluginTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(OpenDaylightL3RouterPluginTestCase, self).setUp()
+        plugin_cls = l3_odl.OpenDaylightL3RouterPlugin
+        mock.patch.object(plugin_cls, 'setup_rpc').start()
+        mock.patch.object(l3_odl.extensions,
+                          'append_api_extensions_path').start()
+        mock.patch.object(l3_odl.atexit, 'register').start()
+        mock.patch.object(l3_odl.neutron_context,
+                          'get_admin_context').start()
+        self.core_plugin = mock.patch.object(plugin_cls,
+                                             '_core_plugin').start()
+        self.core_plugin.get_ports.return_value = []
+        self._create_plugin()
+
+    def _create_plugin(self):
+        self.plugin = l3_odl.OpenDaylightL3RouterPlugin()
+        self.client = mock.patch.object(self.plugin, 'client').start()
+        self.client.get_collection.return_value = []
+
+    def _override(self, name, value):
+        cfg.CONF.set_override(name, value, 'ml2_odl')
+        self.addCleanup(cfg.CONF.clear_override, name, 'ml2_odl')
+
+    def test_out_of_sync_at_startup_with_floatingip_batching(self):
+        self.assertFalse(self.plugin.out_of_sync)
+        self._override('floatingip_batch_window', 100)
+        self._create_plugin()
+        self.assertTrue(self.plugin.out_of_sync)
+
+    def test_out_of_sync_at_startup_with_async_l3(self):
+        self._override('async_l3', True)
+        self._override('dispatch_workers', 2)
+        self._override('l3_resync_interval', 600)
+        with mock.patch.object(l3_odl.loopingcall,
+                               'FixedIntervalLoopingCall'), \
+                mock.patch.object(l3_odl.LOG, 'warning') as warning:
+            self._create_plugin()
+        self.assertTrue(self.plugin.out_of_sync)
+        self.assertFalse(warning.called)
+
+    def test_async_l3_without_resync_interval_warns(self):
+        self._override('async_l3', True)
+        self._override('dispatch_workers', 2)
+        with mock.patch.object(l3_odl.LOG, 'warning') as warning:
+            self._create_plugin()
+        self.assertTrue(self.plugin.out_of_sync)
+        self.assertTrue(warning.called)
+
+    def test_sendjson(self):
+        self.plugin._sendjson('put', 'routers/r1', {'router': {}}, 'r1')
+        self.client.sendjson.assert_called_once_with(
+            'put', 'routers/r1', {'router': {}})
+        self.assertFalse(self.plugin.out_of_sync)
+
+    def test_sendjson_failure(self):
+        self.client.sendjson.side_effect = ValueError
+        self.assertRaises(ValueError, self.plugin._sendjson,
+                          'post', 'routers', {'router': {}}, 'r1')
+        self.assertTrue(self.plugin.out_of_sync)
+
+    def test_sendjson_out_of_sync_update(self):
+        self.plugin.out_of_sync = True
+        with mock.patch.object(self.plugin, 'resync') as resync:
+            self.plugin._sendjson('put', 'routers/r1/add_router_interface',
+                                  {'id': 'r1'}, 'r1')
+        resync.assert_called_once_with()
+        self.client.sendjson.assert_called_once_with(
+            'put', 'routers/r1/add_router_interface', {'id': 'r1'})
+
+    def test_sendjson_out_of_sync_create(self):
+        self.plugin.out_of_sync = True
+        with mock.patch.object(self.plugin, 'resync') as resync:
+            self.plugin._sendjson('post', 'routers', {'router': {}}, 'r1')
+            self.plugin._sendjson('delete', 'routers/r1', None, 'r1')
+        self.assertEqual(2, resync.call_count)
+        self.assertFalse(self.client.sendjson.called)
+
+    def test_resync(self):
+        routers = [{'id': 'r1', 'tenant_id': 't', 'name': 'new',
+                    'status': 'ACTIVE'},
+                   {'id': 'r2', 'tenant_id': 't', 'name': 'r2',
+                    'status': 'ACTIVE'}]
+        fips = [{'id': 'f1', 'router_id': 'r1', 'port_id': 'p2'}]
+        odl = {'routers': [{'id': 'r1', 'tenant_id': 't', 'name': 'old'},
+                           {'id': 'r3'}],
+               'floatingips': [{'id': 'f1', 'router_id': 'r1',
+                                'port_id': 'p1'}]}
+        self.client.get_collection.side_effect = (
+            lambda collection, urlpath: odl[collection])
+        self.plugin.out_of_sync = True
+        with mock.patch.object(self.plugin, 'get_routers',
+                               return_value=routers), \
+                mock.patch.object(self.plugin, 'get_floatingips',
+                                  return_value=fips), \
+                mock.patch.object(self.plugin, '_resync_router_interfaces',
+                                  return_value=set()) as interfaces:
+            self.plugin.resync()
+
+        self.client.post_bulk.assert_has_calls(
+            [mock.call('routers', [routers[1]], 100, 'routers'),
+             mock.call('floatingips', [], 100, 'floatingips')])
+        self.assertEqual(
+            [mock.call('put', 'routers/r1', {'router': {'name': 'new'}}),
+             mock.call('delete', 'routers/r3', None),
+             mock.call('put', 'floatingips/f1', {'floatingip': fips[0]})],
+            self.client.sendjson.call_args_list)
+        # Only the routers created get their interfaces added
+        interfaces.assert_called_once_with(mock.ANY, [routers[1]])
+        self.assertFalse(self.plugin.out_of_sync)
+
+    def _resync_with_interfaces(self, odl_routers):
+        routers = [{'id': 'r1', 'tenant_id': 't'}]
+        self.core_plugin.get_ports.return_value = [
+            {'id': 'p1', 'device_id': 'r1',
+             'fixed_ips': [{'subnet_id': 's1'}]}]
+        self.client.get_collection.side_effect = (
+            lambda collection, urlpath: odl_routers if collection == 'routers'
+            else [])
+        with mock.patch.object(self.plugin, 'get_routers',
+                               return_value=routers), \
+                mock.patch.object(self.plugin, 'get_floatingips',
+                                  return_value=[]):
+            self.plugin.periodic_resync()
+
+    def test_periodic_resync_leaves_interfaces_alone(self):
+        self._resync_with_interfaces([{'id': 'r1', 'tenant_id': 't'}])
+        self.assertFalse(self.client.sendjson.called)
+        self.assertFalse(self.plugin.out_of_sync)
+
+    def test_resync_readds_interfaces_which_failed(self):
+        self.client.sendjson.side_effect = ValueError
+        self.assertRaises(ValueError, self.plugin._sendjson, 'put',
+                          'routers/r1/add_router_interface', {'id': 'r1'},
+                          'r1')
+        self.client.sendjson.side_effect = [ValueError, None]
+        self._resync_with_interfaces([{'id': 'r1', 'tenant_id': 't'}])
+        self.assertTrue(self.plugin.out_of_sync)
+        # The router is retried until its interfaces were added
+        self._resync_with_interfaces([{'id': 'r1', 'tenant_id': 't'}])
+        self.assertFalse(self.plugin.out_of_sync)
+        self.client.sendjson.reset_mock()
+        self._resync_with_interfaces([{'id': 'r1', 'tenant_id': 't'}])
+        self.assertFalse(self.client.sendjson.called)
+
+    def test_resync_failure_stays_out_of_sync(self):
+        self.client.get_collection.side_effect = ValueError
+        with mock.patch.object(self.plugin, 'get_routers', return_value=[]):
+            self.assertRaises(ValueError, self.plugin.resync, force=True)
+        self.assertTrue(self.plugin.out_of_sync)
+
+    def test_resync_router_interfaces(self):
+        self.core_plugin.get_ports.return_value = [
+            {'id': 'p1', 'device_id': 'r1',
+             'fixed_ips': [{'subnet_id': 's1'}, {'subnet_id': 's2'}]}]
+        context = mock.Mock()
+        self.plugin._resync_router_interfaces(
+            context, [{'id': 'r1', 'tenant_id': 't'}])
+
+        filters = self.core_plugin.get_ports.call_args[1]['filters']
+        self.assertEqual(['r1'], filters['device_id'])
+        url = 'routers/r1/add_router_interface'
+        self.assertEqual(
+            [mock.call('put', url, {'subnet_id': 's1', 'port_id': 'p1',
+                                    'id': 'r1', 'tenant_id': 't'}),
+             mock.call('put', url, {'subnet_id': 's2', 'port_id': 'p1',
+                                    'id': 'r1', 'tenant_id': 't'})],
+            self.client.sendjson.call_args_list)
+
+    def test_resync_router_interfaces_already_present(self):
+        self.core_plugin.get_ports.return_value = [
+            {'id': 'p1', 'device_id': 'r1',
+             'fixed_ips': [{'subnet_id': 's1'}, {'subnet_id': 's2'}]},
+            {'id': 'p2', 'device_id': 'r2',
+             'fixed_ips': [{'subnet_id': 's3'}]}]
+        conflict = requests.exceptions.HTTPError(
+            response=mock.Mock(status_code=requests.codes.conflict))
+        error = requests.exceptions.HTTPError(
+            response=mock.Mock(status_code=requests.codes.bad_request))
+        self.client.sendjson.side_effect = [conflict, None, error]
+        failed = self.plugin._resync_router_interfaces(
+            mock.Mock(), [{'id': 'r1', 'tenant_id': 't'},
+                          {'id': 'r2', 'tenant_id': 't'}])
+        self.assertEqual(3, self.client.sendjson.call_count)
+        self.assertEqual(set(['r2']), failed)
+
+    def test_resync_router_interfaces_without_routers(self):
+        self.plugin._resync_router_interfaces(mock.Mock(), [])
+        self.assertFalse(self.core_plugin.get_ports.called)
+
+    @mock.patch.object(dispatcher, 'get_dispatcher')
+    def test_sendjson_async(self, get_dispatcher):
+        self._override('async_l3', True)
+        self._override('dispatch_workers', 4)
+        self.plugin._sendjson('put', 'routers/r1', {'router': {}}, 'r1',
+                              'tenant')
+        self.plugin._sendjson('delete', 'floatingips/f1', None, 'r1')
+
+        submit = get_dispatcher.return_value.submit_ordered
+        self.assertEqual(
+            [mock.call('r1', dispatcher.UPDATE, 'tenant',
+                       self.plugin._deliver, 'put', 'routers/r1',
+                       {'router': {}}),
+             mock.call('r1', dispatcher.INTERACTIVE, None,
+                       self.plugin._deliver, 'delete', 'floatingips/f1',
+                       None)],
+            submit.call_args_list)
+        self.assertFalse(self.client.sendjson.called)
+
+    @mock.patch.object(dispatcher, 'get_dispatcher')
+    def test_sendjson_async_without_workers(self, get_dispatcher):
+        self._override('async_l3', True)
+        self.client.sendjson.side_effect = ValueError
+        self.assertRaises(ValueError, self.plugin._sendjson,
+                          'post', 'routers', {'router': {}}, 'r1')
+        self.assertFalse(get_dispatcher.called)
+        self.assertTrue(self.plugin.out_of_sync)
+
+    def test_deliver_failure(self):
+        self.client.sendjson.side_effect = ValueError
+        self.plugin._deliver('put', 'routers/r1', {'router': {}})
+        self.assertTrue(self.plugin.out_of_sync)
+
+    def test_fip_ordering_key(self):
+        key = self.plugin._fip_ordering_key
+        # A floating IP without router is ordered on its own
+        self.assertEqual('f1', key('f1'))
+        self.assertEqual('r1', key('f1', 'r1'))
+        # Its disassociation stays behind the changes of its router
+        self.assertEqual('r1', key('f1'))
+        self.assertEqual('r2', key('f1', 'r2'))
+        self.assertEqual('r2', key('f1', delete=True))
+        self.assertEqual('f1', key('f1', delete=True))
+        self.assertEqual({}, self.plugin._fip_routers)
+
+    def _patch_db(self, method, **kwargs):
+        # The DB method the plugin calls through super()
+        return mock.patch.object(l3_odl.extraroute_db.ExtraRoute_db_mixin,
+                                 method, **kwargs).start()
+
+    def _create_batched_fips(self):
+        self._override('floatingip_batch_window', 100)
+        self._create_plugin()
+        self.plugin.out_of_sync = False
+        fips = [{'id': 'f%d' % i, 'router_id': 'r%d' % (i % 2),
+                 'tenant_id': 't'} for i in range(3)]
+        self._patch_db('create_floatingip', side_effect=fips)
+        # The API requests wait for their batch to be sent
+        creates = [eventlet.spawn(self.plugin.create_floatingip, mock.Mock(),
+                                  {'floatingip': {}}) for fip in fips]
+        eventlet.sleep(0)
+        return fips, creates
+
+    def test_create_floatingip_batched(self):
+        fips, creates = self._create_batched_fips()
+        self.client.post_bulk_with_fallback.side_effect = (
+            lambda collection, fips, chunk_size: [(fip, None)
+                                                  for fip in fips])
+        self.assertFalse(self.client.post_bulk_with_fallback.called)
+        self.plugin.flush_pending()
+
+        self.assertEqual(fips, [create.wait() for create in creates])
+        self.client.post_bulk_with_fallback.assert_called_once_with(
+            'floatingips', fips, 100)
+        self.assertFalse(self.plugin.out_of_sync)
+
+    def test_create_floatingip_batched_failure(self):
+        fips, creates = self._create_batched_fips()
+        self.client.post_bulk_with_fallback.side_effect = (
+            lambda collection, fips, chunk_size: [(fips[0], None),
+                                                  (fips[1], ValueError()),
+                                                  (fips[2], None)])
+        self.plugin.flush_pending()
+
+        # Only the request of the floating IP which failed fails
+        self.assertEqual(fips[0], creates[0].wait())
+        self.assertRaises(ValueError, creates[1].wait)
+        self.assertEqual(fips[2], creates[2].wait())
+        self.assertEqual(1, self.client.post_bulk_with_fallback.call_count)
+        self.assertTrue(self.plugin.out_of_sync)
+
+    @mock.patch.object(dispatcher, 'get_dispatcher')
+    def test_create_floatingip_batched_async(self, get_dispatcher):
+        self._override('async_l3', True)
+        self._override('dispatch_workers', 4)
+        fips, creates = self._create_batched_fips()
+        self.plugin.flush_pending()
+
+        self.assertEqual(fips, [create.wait() for create in creates])
+        self.assertEqual(
+            [mock.call('r0', dispatcher.INTERACTIVE, None,
+                       self.plugin._create_floatingips, [fips[0], fips[2]]),
+             mock.call('r1', dispatcher.INTERACTIVE, None,
+                       self.plugin._create_floatingips, [fips[1]])],
+            get_dispatcher.return_value.submit_ordered.call_args_list)
+        self.assertFalse(self.client.post_bulk_with_fallback.called)
+
+    def _update_floatingip(self, fip_id):
+        update = eventlet.spawn(self.plugin.update_floatingip, mock.Mock(),
+                                fip_id, {})
+        eventlet.sleep(0)
+        return update
+
+    def test_update_floatingip_batched(self):
+        fips, creates = self._create_batched_fips()
+        self.client.post_bulk_with_fallback.side_effect = (
+            lambda collection, fips, chunk_size: [(fip, None)
+                                                  for fip in fips])
+        update = self._patch_db('update_floatingip')
+        # An update of a floating IP not created yet amends its create
+        update.return_value = dict(fips[0], router_id=None)
+        amend = self._update_floatingip('f0')
+        self.plugin.flush_pending()
+        self.assertEqual(update.return_value, amend.wait())
+        self.client.post_bulk_with_fallback.assert_called_once_with(
+            'floatingips', [update.return_value, fips[1], fips[2]], 100)
+
+        update.return_value = dict(fips[1], router_id='r0')
+        coalesced = self._update_floatingip('f1')
+        self.assertFalse(self.client.sendjson.called)
+        self.plugin.flush_pending()
+        self.assertEqual(update.return_value, coalesced.wait())
+        self.client.sendjson.assert_called_once_with(
+            'put', 'floatingips/f1', {'floatingip': update.return_value})
+
+    def test_update_floatingip_batched_failure(self):
+        fips, creates = self._create_batched_fips()
+        self.client.post_bulk_with_fallback.return_value = []
+        self.plugin.flush_pending()
+        self._patch_db('update_floatingip', return_value=fips[0])
+        self.client.sendjson.side_effect = ValueError
+        update = self._update_floatingip('f0')
+        self.plugin.flush_pending()
+        self.assertRaises(ValueError, update.wait)
+        self.assertTrue(self.plugin.out_of_sync)
+
+    @mock.patch.object(dispatcher, 'get_dispatcher')
+    def test_update_floatingip_batched_async(self, get_dispatcher):
+        self._override('async_l3', True)
+        self._override('dispatch_workers', 4)
+        self._override('floatingip_batch_window', 100)
+        self._create_plugin()
+        self.plugin.out_of_sync = False
+        fip = {'id': 'f1', 'router_id': 'r1', 'tenant_id': 't'}
+        self._patch_db('update_floatingip', return_value=fip)
+        update = self._update_floatingip('f1')
+        self.plugin.flush_pending()
+        update.wait()
+
+        get_dispatcher.return_value.submit_ordered.assert_called_once_with(
+            'r1', dispatcher.UPDATE, 't', self.plugin._deliver, 'put',
+            'floatingips/f1', {'floatingip': fip})
+
+    @staticmethod
+    def _get_routers():
+        routes = [{'destination': '10.0.%d.0/24' % i,
+                   'nexthop': '192.168.0.%d' % i} for i in range(3)]
+        original = {'id': 'r1', 'tenant_id': 't', 'status': 'ACTIVE',
+                    'name': 'router1', 'admin_state_up': True,
+                    'routes': routes}
+        return original, dict(original, routes=list(reversed(routes)))
+
+    def test_diff_router_unchanged(self):
+        original, router = self._get_routers()
+        # The order of the routes doesn't matter
+        self.assertEqual({}, self.plugin.diff_router(original, router))
+
+    def test_diff_router(self):
+        original, router = self._get_routers()
+        router.update(name='router2', status='DOWN')
+        self.assertEqual({'name': 'router2'},
+                         self.plugin.diff_router(original, router))
+
+    def test_diff_router_routes(self):
+        original, router = self._get_routers()
+        router['routes'] = router['routes'][1:] + [
+            {'destination': '10.1.0.0/24', 'nexthop': '192.168.0.1'}]
+        self.assertEqual({'routes': router['routes']},
+                         self.plugin.diff_router(original, router))
+
+    def _update_router(self, original, router):
+        self._patch_db('update_router', return_value=router)
+        with mock.patch.object(self.plugin, 'get_router',
+                               return_value=original):
+            self.assertEqual(router, self.plugin.update_router(
+                mock.Mock(), 'r1', {'router': {}}))
+
+    def test_update_router_full(self):
+        original, router = self._get_routers()
+        router['name'] = 'router2'
+        self._update_router(original, router)
+        resource = dict(router)
+        for key in ('id', 'tenant_id', 'status'):
+            del resource[key]
+        self.client.sendjson.assert_called_once_with(
+            'put', 'routers/r1', {'router': resource})
+
+    def test_update_router_diff(self):
+        self._override('router_update_mode', 'diff')
+        original, router = self._get_routers()
+        router['name'] = 'router2'
+        self._update_router(original, router)
+        self.client.sendjson.assert_called_once_with(
+            'put', 'routers/r1', {'router': {'name': 'router2'}})
+
+    def test_update_router_diff_unchanged(self):
+        self._override('router_update_mode', 'diff')
+        original, router = self._get_routers()
+        self._update_router(original, router)
+        self.assertFalse(self.client.sendjson.called)
+
+    def _update_router_interfaces(self, action, db_results):
+        self._patch_db(action[:-1], side_effect=db_results)
+        context = mock.MagicMock()
+        results = getattr(self.plugin, action)(
+            context, 'r1', [{'subnet_id': 's1'}, {'port_id': 'p2'},
+                            {'subnet_id': 's3'}])
+        # One transaction, with a savepoint per interface
+        context.session.begin.assert_called_once_with(subtransactions=True)
+        self.assertEqual(3, context.session.begin_nested.call_count)
+        return results
+
+    def test_add_router_interfaces(self):
+        self.client.sendjson.side_effect = [None, ValueError]
+        results = self._update_router_interfaces(
+            'add_router_interfaces',
+            [{'port_id': 'p1', 'tenant_id': 't'}, ValueError,
+             {'port_id': 'p3', 'tenant_id': 't'}])
+
+        self.assertEqual([None, ValueError, ValueError],
+                         [result['error'] and type(result['error'])
+                          for result in results])
+        self.assertEqual({'port_id': 'p1', 'tenant_id': 't'},
+                         results[0]['router_interface'])
+        url = 'routers/r1/add_router_interface'
+        self.assertEqual(
+            [mock.call('put', url, {'subnet_id': 's1', 'port_id': 'p1',
+                                    'id': 'r1', 'tenant_id': 't'}),
+             mock.call('put', url, {'subnet_id': 's3', 'port_id': 'p3',
+                                    'id': 'r1', 'tenant_id': 't'})],
+            self.client.sendjson.call_args_list)
+        # The interface which failed in ODL is recovered by the resync
+        self.assertTrue(self.plugin.out_of_sync)
+        self.assertEqual(set(['r1']), self.plugin._interface_routers)
+
+    @mock.patch.object(dispatcher, 'get_dispatcher')
+    def test_remove_router_interfaces_async(self, get_dispatcher):
+        self._override('async_l3', True)
+        self._override('dispatch_workers', 4)
+        results = self._update_router_interfaces(
+            'remove_router_interfaces',
+            [{'port_id': 'p1', 'tenant_id': 't'},
+             {'subnet_id': 's2', 'tenant_id': 't'},
+             {'port_id': 'p3', 'tenant_id': 't'}])
+
+        self.assertEqual([None] * 3, [result['error'] for result in results])
+        url = 'routers/r1/remove_router_interface'
+        self.assertEqual(
+            [mock.call('r1', dispatcher.UPDATE, 't', self.plugin._deliver,
+                       'put', url, {'subnet_id': subnet_id,
+                                    'port_id': port_id, 'id': 'r1',
+                                    'tenant_id': 't'})
+             for subnet_id, port_id in (('s1', 'p1'), ('s2', 'p2'),
+                                        ('s3', 'p3'))],
+            get_dispatcher.return_value.submit_ordered.call_args_list)
+
+
+class BulkRouterInterfaceTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(BulkRouterInterfaceTestCase, self).setUp()
+        self.plugin = mock.Mock()
+        mock.patch.object(
+            bulkrouterinterface.manager.NeutronManager,
+            'get_service_plugins',
+            return_value={bulkrouterinterface.constants.L3_ROUTER_NAT:
+                          self.plugin}).start()
+        actions = bulkrouterinterface.Bulkrouterinterface.get_actions()
+        self.handlers = dict((action.action_name, action.handler)
+                             for action in actions)
+        self.request = mock.Mock()
+
+    def test_add_router_interfaces(self):
+        interfaces = [{'subnet_id': 's1'}, {'port_id': 'p2'}]
+        self.plugin.add_router_interfaces.return_value = [
+            {'interface_info': interfaces[0],
+             'router_interface': {'port_id': 'p1'}, 'error': None},
+            {'interface_info': interfaces[1], 'router_interface': None,
+             'error': ValueError('in use')}]
+        response = self.handlers['add_router_interfaces'](
+            {'add_router_interfaces': {'interfaces': interfaces}},
+            self.request, 'r1')
+
+        self.plugin.add_router_interfaces.assert_called_once_with(
+            self.request.context, 'r1', interfaces)
+        self.assertEqual([None, 'in use'],
+                         [result['error']
+                          for result in response['router_interfaces']])
+
+    def test_remove_router_interfaces_without_list(self):
+        self.assertRaises(
+            exc.HTTPBadRequest, self.handlers['remove_router_interfaces'],
+            {'remove_router_interfaces': {'interfaces': 's1'}},
+            self.request, 'r1')
+        self.assertFalse(self.plugin.remove_router_interfaces.called)
+
+    def test_router_not_found(self):
+        self.plugin.get_router.side_effect = n_exc.NotFound
+        self.assertRaises(
+            exc.HTTPNotFound, self.handlers['add_router_interfaces'],
+            {'add_router_interfaces': {'interfaces': []}}, self.request,
+            'r1')
+        self.assertFalse(self.plugin.add_router_interfaces.called)
@@ -19,6 +19,8 @@ Tests for the LBaaS plugin for networking-odl.
 
 import mock
 
+from oslo_config import cfg
+
 from networking_odl.lbaas import driver_v1 as lbaas_odl
 
 from neutron.tests import base
@@ -30,3 +32,149 @@ class TestODL_LBaaS(base.BaseTestCase):
         # just create an instance of OpenDaylightLbaasDriverV1
         self.plugin = mock.Mock()
         lbaas_odl.OpenDaylightLbaasDriverV1(self.plugin)
+
+
+class TestODL_LBaaS_Operations(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestODL_LBaaS_Operations, self).setUp()
+        self.plugin = mock.Mock()
+        self.plugin.get_pool.return_value = {'id': 'pool-id',
+                                             'subnet_id': 'subnet-id'}
+        self._create_driver()
+        self.context = mock.Mock()
+        self.vip = {'id': 'vip-id', 'tenant_id': 'tenant', 'name': 'vip',
+                    'description': '', 'address': '10.0.0.10',
+                    'subnet_id': 'subnet-id', 'protocol': 'HTTP',
+                    'protocol_port': 80, 'connection_limit': -1,
+                    'pool_id': 'pool-id', 'admin_state_up': True}
+        self.members = [{'id': 'member-%d' % i, 'tenant_id': 'tenant',
+                         'pool_id': 'pool-id', 'address': '10.0.0.%d' % i,
+                         'protocol_port': 80, 'weight': 1,
+                         'admin_state_up': True} for i in range(3)]
+
+    def _create_driver(self):
+        self.driver = lbaas_odl.OpenDaylightLbaasDriverV1(self.plugin)
+        self.driver.client = mock.Mock()
+        self.driver.out_of_sync = False
+
+    def _batch_members(self):
+        cfg.CONF.set_override('lbaas_member_batch_window', 100, 'ml2_odl')
+        self.addCleanup(cfg.CONF.clear_override, 'lbaas_member_batch_window',
+                        'ml2_odl')
+        self._create_driver()
+
+    def test_create_vip(self):
+        self.driver.create_vip(self.context, self.vip)
+        calls = self.driver.client.sendjson.call_args_list
+        self.assertEqual(['lbaas/loadbalancers', 'lbaas/listeners'],
+                         [call[0][1] for call in calls])
+        self.assertEqual('10.0.0.10',
+                         calls[0][0][2]['loadbalancer']['vip_address'])
+        self.assertEqual('pool-id',
+                         calls[1][0][2]['listener']['default_pool_id'])
+        self.plugin.update_status.assert_called_once_with(
+            self.context, lbaas_odl.loadbalancer_db.Vip, 'vip-id',
+            lbaas_odl.constants.ACTIVE)
+
+    def test_create_vip_out_of_sync(self):
+        self.driver.out_of_sync = True
+        with mock.patch.object(self.driver, 'resync') as resync:
+            self.driver.create_vip(self.context, self.vip)
+        # The resync reads the vip from the DB
+        resync.assert_called_once_with(self.context)
+        self.assertFalse(self.driver.client.sendjson.called)
+        self.plugin.update_status.assert_called_once_with(
+            self.context, lbaas_odl.loadbalancer_db.Vip, 'vip-id',
+            lbaas_odl.constants.ACTIVE)
+
+    def test_delete_vip_out_of_sync(self):
+        self.driver.out_of_sync = True
+        with mock.patch.object(self.driver, 'resync') as resync:
+            self.driver.delete_vip(self.context, self.vip)
+        resync.assert_called_once_with(self.context)
+        self.assertEqual(
+            [mock.call('delete', 'lbaas/listeners/vip-id', None),
+             mock.call('delete', 'lbaas/loadbalancers/vip-id', None)],
+            self.driver.client.sendjson.call_args_list)
+        self.plugin._delete_db_vip.assert_called_once_with(self.context,
+                                                           'vip-id')
+
+    def test_delete_pool_failure(self):
+        self.driver.client.sendjson.side_effect = ValueError
+        self.assertRaises(ValueError, self.driver.delete_pool, self.context,
+                          {'id': 'pool-id'})
+        self.plugin.update_status.assert_called_once_with(
+            self.context, lbaas_odl.loadbalancer_db.Pool, 'pool-id',
+            lbaas_odl.constants.ERROR)
+        self.assertFalse(self.plugin._delete_db_pool.called)
+        self.assertTrue(self.driver.out_of_sync)
+
+    def test_create_member(self):
+        self.driver.create_member(self.context, self.members[0])
+        self.driver.client.sendjson.assert_called_once_with(
+            'post', 'lbaas/pools/pool-id/members',
+            {'member': lbaas_odl.member_to_odl(self.members[0],
+                                               'subnet-id')})
+        self.assertEqual(0, len(self.driver.member_batcher))
+        self.plugin.update_status.assert_called_once_with(
+            self.context, lbaas_odl.loadbalancer_db.Member, 'member-0',
+            lbaas_odl.constants.ACTIVE)
+
+    def test_create_members_batched(self):
+        self._batch_members()
+        self.driver.client.post_bulk_with_fallback.side_effect = (
+            lambda name, members, chunk_size, urlpath: [
+                (member, None) for member in members])
+        for member in self.members:
+            self.driver.create_member(self.context, member)
+        self.driver.delete_member(self.context, self.members[2])
+        self.driver.member_batcher.flush()
+        self.driver.client.post_bulk_with_fallback.assert_called_once_with(
+            'members', [lbaas_odl.member_to_odl(member, 'subnet-id')
+                        for member in self.members[:2]],
+            mock.ANY, 'lbaas/pools/pool-id/members')
+        self.assertFalse(self.driver.client.sendjson.called)
+        self.assertEqual(2, self.plugin.update_status.call_count)
+        self.plugin._delete_db_member.assert_called_once_with(
+            self.context, 'member-2')
+
+    def test_create_members_batched_fallback(self):
+        self._batch_members()
+        self.driver.client.post_bulk_with_fallback.side_effect = (
+            lambda name, members, chunk_size, urlpath: [
+                (members[0], None), (members[1], ValueError())])
+        for member in self.members[:2]:
+            self.driver.create_member(self.context, member)
+        self.driver.member_batcher.flush()
+        self.assertEqual(
+            [mock.call(self.context, lbaas_odl.loadbalancer_db.Member,
+                       'member-0', lbaas_odl.constants.ACTIVE),
+             mock.call(self.context, lbaas_odl.loadbalancer_db.Member,
+                       'member-1', lbaas_odl.constants.ERROR)],
+            self.plugin.update_status.call_args_list)
+        self.assertTrue(self.driver.out_of_sync)
+
+    def test_resync(self):
+        self.plugin.get_vips.return_value = [self.vip]
+        self.plugin.get_pools.return_value = [
+            {'id': 'pool-id', 'tenant_id': 'tenant', 'name': 'pool',
+             'description': '', 'protocol': 'HTTP',
+             'lb_method': 'ROUND_ROBIN', 'admin_state_up': True,
+             'vip_id': 'vip-id', 'subnet_id': 'subnet-id',
+             'health_monitors': []}]
+        self.plugin.get_health_monitors.return_value = []
+        self.plugin.get_members.return_value = self.members
+        self.driver.client.get_collection.return_value = []
+        self.driver.out_of_sync = True
+        self.driver.resync(self.context)
+        self.assertEqual(
+            ['lbaas/loadbalancers', 'lbaas/listeners', 'lbaas/pools',
+             'lbaas/healthmonitors', 'lbaas/pools/pool-id/members'],
+            [call[0][3]
+             for call in self.driver.client.post_bulk.call_args_list])
+        self.assertFalse(self.driver.out_of_sync)
+
+    def test_resync_in_sync(self):
+        self.driver.resync(self.context)
+        self.assertFalse(self.driver.client.get_collection.called)
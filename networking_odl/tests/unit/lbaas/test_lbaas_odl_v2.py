@@ -22,6 +22,7 @@ import mock
 from networking_odl.lbaas import driver_v2 as lbaas_odl
 
 from neutron.tests import base
+from neutron_lbaas.services.loadbalancer import data_models
 
 
 class TestODL_LBaaS(base.BaseTestCase):
@@ -30,3 +31,208 @@ class TestODL_LBaaS(base.BaseTestCase):
         # just create an instance of OpenDaylightLbaasDriverV2
         self.plugin = mock.Mock()
         lbaas_odl.OpenDaylightLbaasDriverV2(self.plugin)
+
+
+class TestODLManagers(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestODLManagers, self).setUp()
+        self.driver = lbaas_odl.OpenDaylightLbaasDriverV2(mock.Mock())
+        self.client = mock.patch.object(self.driver, 'client').start()
+        for manager in (self.driver.load_balancer, self.driver.listener,
+                        self.driver.pool, self.driver.member,
+                        self.driver.health_monitor):
+            manager.client = self.client
+            manager.out_of_sync = False
+        self.members = [data_models.Member(id='member-%d' % i,
+                                           pool_id='pool-id',
+                                           address='10.0.0.%d' % i,
+                                           protocol_port=80)
+                        for i in range(3)]
+        self.pool = data_models.Pool(id='pool-id', members=self.members)
+        self.listener = data_models.Listener(id='listener-id',
+                                             loadbalancer_id='lb-id',
+                                             default_pool=self.pool)
+        self.lb = data_models.LoadBalancer(id='lb-id',
+                                           listeners=[self.listener])
+
+    def test_serialize(self):
+        pool = lbaas_odl.serialize(self.pool)
+        self.assertEqual('pool-id', pool['id'])
+        self.assertEqual([{'id': 'member-0'}, {'id': 'member-1'},
+                          {'id': 'member-2'}], pool['members'])
+        listener = lbaas_odl.serialize(self.listener)
+        self.assertEqual('pool-id', listener['default_pool_id'])
+        self.assertEqual('lb-id', listener['loadbalancer_id'])
+
+    def test_create_member(self):
+        context = mock.Mock()
+        with mock.patch.object(self.driver.member,
+                               'successful_completion') as completion:
+            self.driver.member.create(context, self.members[0])
+        self.client.sendjson.assert_called_once_with(
+            'post', 'lbaas/pools/pool-id/members',
+            {'member': lbaas_odl.serialize(self.members[0])})
+        completion.assert_called_once_with(context, self.members[0],
+                                           delete=False)
+
+    def test_create_failure(self):
+        context = mock.Mock()
+        self.client.sendjson.side_effect = ValueError
+        with mock.patch.object(self.driver.listener,
+                               'failed_completion') as completion:
+            self.assertRaises(ValueError, self.driver.listener.create,
+                              context, self.listener)
+        completion.assert_called_once_with(context, self.listener)
+        self.assertTrue(self.driver.listener.out_of_sync)
+
+    def test_create_loadbalancer_graph(self):
+        with mock.patch.object(self.driver.load_balancer,
+                               'successful_completion'):
+            self.driver.load_balancer.create(mock.Mock(), self.lb)
+        self.assertEqual(
+            ['lbaas/loadbalancers', 'lbaas/listeners', 'lbaas/pools',
+             'lbaas/pools/pool-id/members'],
+            [call[0][3] for call in self.client.post_bulk.call_args_list])
+        members = self.client.post_bulk.call_args_list[3][0][1]
+        self.assertEqual(3, len(members))
+
+    def test_create_members_batched(self):
+        self.config(lbaas_member_batch_window=100, group='ml2_odl')
+        manager = self.driver.member
+        context = mock.Mock()
+        self.client.post_bulk_with_fallback.side_effect = (
+            lambda name, members, chunk_size, urlpath: [
+                (member, None) for member in members])
+        with mock.patch.object(manager, 'successful_completion') as done:
+            for member in self.members:
+                manager.create(context, member)
+            manager.delete(context, self.members[2])
+            self.assertFalse(self.client.post_bulk_with_fallback.called)
+            manager.batcher.flush()
+        self.client.post_bulk_with_fallback.assert_called_once_with(
+            'members', [lbaas_odl.serialize(member)
+                        for member in self.members[:2]],
+            mock.ANY, 'lbaas/pools/pool-id/members')
+        self.assertEqual(
+            [mock.call(context, self.members[2], delete=True),
+             mock.call(context, self.members[0]),
+             mock.call(context, self.members[1])],
+            done.call_args_list)
+        self.assertFalse(self.client.sendjson.called)
+
+    def test_create_members_batched_fallback(self):
+        self.config(lbaas_member_batch_window=100, group='ml2_odl')
+        manager = self.driver.member
+        context = mock.Mock()
+        self.client.post_bulk_with_fallback.side_effect = (
+            lambda name, members, chunk_size, urlpath: [
+                (members[0], None), (members[1], ValueError())])
+        with mock.patch.object(manager, 'successful_completion') as done, \
+                mock.patch.object(manager, 'failed_completion') as failed:
+            for member in self.members[:2]:
+                manager.create(context, member)
+            manager.batcher.flush()
+        done.assert_called_once_with(context, self.members[0])
+        failed.assert_called_once_with(context, self.members[1])
+        self.assertTrue(manager.out_of_sync)
+
+    def test_resync(self):
+        db = self.driver.plugin.db
+        db.get_loadbalancers.return_value = [self.lb]
+        db.get_listeners.return_value = [self.listener]
+        db.get_pools.return_value = [self.pool]
+        db.get_healthmonitors.return_value = []
+        db.get_pool_members.return_value = self.members
+        stale_member = {'id': 'member-9'}
+        changed_member = dict(lbaas_odl.serialize(self.members[0]),
+                              protocol_port=8080)
+        self.client.get_collection.side_effect = lambda name, path: (
+            [changed_member, stale_member] if name == 'members' else [])
+        self.driver.listener.out_of_sync = True
+        self.driver.resync(mock.Mock())
+
+        self.assertEqual(
+            ['lbaas/loadbalancers', 'lbaas/listeners', 'lbaas/pools',
+             'lbaas/healthmonitors', 'lbaas/pools/pool-id/members'],
+            [call[0][1]
+             for call in self.client.get_collection.call_args_list])
+        self.assertEqual(
+            [mock.call('put', 'lbaas/pools/pool-id/members/member-0',
+                       {'member': lbaas_odl.serialize(self.members[0])}),
+             mock.call('delete', 'lbaas/pools/pool-id/members/member-9',
+                       None)],
+            self.client.sendjson.call_args_list)
+        members = self.client.post_bulk.call_args_list[-1][0][1]
+        self.assertEqual(['member-1', 'member-2'],
+                         [member['id'] for member in members])
+        self.assertFalse(self.driver.out_of_sync)
+
+    def test_resync_deletes_children_first(self):
+        db = self.driver.plugin.db
+        db.get_loadbalancers.return_value = []
+        db.get_listeners.return_value = []
+        db.get_pools.return_value = [self.pool]
+        db.get_healthmonitors.return_value = []
+        db.get_pool_members.return_value = []
+        self.client.get_collection.side_effect = lambda name, path: [
+            {'id': 'stale-' + name}]
+        self.driver.resync(mock.Mock(), force=True)
+
+        self.assertEqual(
+            ['lbaas/pools/pool-id/members/stale-members',
+             'lbaas/healthmonitors/stale-healthmonitors',
+             'lbaas/pools/stale-pools',
+             'lbaas/listeners/stale-listeners',
+             'lbaas/loadbalancers/stale-loadbalancers'],
+            [call[0][1] for call in self.client.sendjson.call_args_list])
+        self.assertEqual(['pool-id'], [
+            resource['id'] for resource
+            in self.client.post_bulk.call_args_list[2][0][1]])
+
+    def test_update_out_of_sync_resyncs(self):
+        self.driver.pool.out_of_sync = True
+        with mock.patch.object(self.driver, 'resync') as mock_resync, \
+                mock.patch.object(self.driver.pool,
+                                  'successful_completion') as done:
+            context = mock.Mock()
+            self.driver.pool.update(context, self.pool, self.pool)
+        mock_resync.assert_called_once_with(context)
+        self.assertFalse(self.client.sendjson.called)
+        done.assert_called_once_with(context, self.pool, delete=False)
+
+
+class TestStatsCollector(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestStatsCollector, self).setUp()
+        self.client = mock.Mock()
+        self.client.get_collection.return_value = [
+            {'id': 'lb-1', 'stats': {'bytes_in': 10, 'bytes_out': 20,
+                                     'active_connections': 1,
+                                     'total_connections': 5}},
+            {'id': 'lb-2'}]
+        self.collector = lbaas_odl.StatsCollector(self.client, 10, 30)
+
+    @mock.patch('time.time', return_value=1000)
+    def test_collect(self, mock_time):
+        self.collector.collect()
+        self.client.get_collection.assert_called_once_with(
+            'loadbalancers', 'lbaas/loadbalancers')
+        self.assertEqual({'bytes_in': 10, 'bytes_out': 20,
+                          'active_connections': 1, 'total_connections': 5},
+                         self.collector.get('lb-1'))
+        self.assertEqual(0, self.collector.get('lb-2')['bytes_in'])
+        self.assertIsNone(self.collector.get('lb-3'))
+
+    @mock.patch('time.time', return_value=1000)
+    def test_expired(self, mock_time):
+        self.collector.collect()
+        mock_time.return_value = 1031
+        self.assertIsNone(self.collector.get('lb-1'))
+
+    def test_collect_failure_keeps_cache(self):
+        self.collector.collect()
+        self.client.get_collection.side_effect = ValueError
+        self.collector.collect()
+        self.assertEqual(10, self.collector.get('lb-1')['bytes_in'])
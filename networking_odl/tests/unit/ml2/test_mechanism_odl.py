@@ -236,14 +236,18 @@ class OpenDaylightMechanismDriverTestCase(base.BaseTestCase):
                                exc_class=None, *args, **kwargs):
         self.mech.odl_drv.out_of_sync = False
         request_response = self._get_mock_request_response(status_code)
+        request_context = mock.Mock(request_id='req-fake')
         with mock.patch('requests.request',
-                        return_value=request_response) as mock_method:
+                        return_value=request_response) as mock_method, \
+                mock.patch('oslo_context.context.get_current',
+                           return_value=request_context):
             if exc_class is not None:
                 self.assertRaises(exc_class, method, context)
             else:
                 method(context)
         mock_method.assert_called_once_with(
-            headers={'Content-Type': 'application/json'},
+            headers={'Content-Type': 'application/json',
+                     client.REQUEST_ID_HEADER: 'req-fake'},
             auth=(config.cfg.CONF.ml2_odl.username,
                   config.cfg.CONF.ml2_odl.password),
             timeout=config.cfg.CONF.ml2_odl.timeout, *args, **kwargs)
@@ -368,6 +372,116 @@ class OpenDaylightMechanismDriverTestCase(base.BaseTestCase):
             self._test_delete_resource_postcommit(
                 'port', status_code, requests.exceptions.HTTPError)
 
+    def test_create_port_postcommit_bulk(self):
+        config.cfg.CONF.set_override('enable_bulk', True, 'ml2_odl')
+        self.mech.odl_drv.out_of_sync = False
+        contexts = []
+        for i in range(3):
+            context = self._get_mock_operation_context('port')
+            context.current['id'] = 'port-%d' % i
+            contexts.append(context)
+        with mock.patch.object(client.OpenDaylightRestClient,
+                               'sendjson') as mock_sendjson:
+            for context in contexts:
+                self.mech.create_port_postcommit(context)
+            self.assertFalse(mock_sendjson.called)
+            self.mech.odl_drv.create_batcher.flush()
+        mock_sendjson.assert_called_once_with('post', 'ports',
+                                              {'ports': mock.ANY})
+        ports = mock_sendjson.call_args[0][2]['ports']
+        self.assertEqual(['port-0', 'port-1', 'port-2'],
+                         [port['id'] for port in ports])
+
+    def test_update_port_postcommit_flushes_bulk_creates(self):
+        config.cfg.CONF.set_override('enable_bulk', True, 'ml2_odl')
+        self.mech.odl_drv.out_of_sync = False
+        context = self._get_mock_operation_context('port')
+        with mock.patch.object(client.OpenDaylightRestClient,
+                               'sendjson') as mock_sendjson:
+            self.mech.create_port_postcommit(context)
+            self.mech.update_port_postcommit(context)
+        self.assertEqual(['post', 'put'],
+                         [call[0][0] for call in mock_sendjson.call_args_list])
+
+    def test_create_port_postcommit_bulk_flushes_parent_creates(self):
+        config.cfg.CONF.set_override('enable_bulk', True, 'ml2_odl')
+        self.mech.odl_drv.out_of_sync = False
+        with mock.patch.object(client.OpenDaylightRestClient,
+                               'sendjson') as mock_sendjson:
+            self.mech.create_network_postcommit(
+                self._get_mock_operation_context('network'))
+            self.mech.create_subnet_postcommit(
+                self._get_mock_operation_context('subnet'))
+            self.mech.create_port_postcommit(
+                self._get_mock_operation_context('port'))
+            self.assertEqual(
+                ['networks', 'subnets'],
+                [call[0][1] for call in mock_sendjson.call_args_list])
+            self.mech.odl_drv.create_batcher.flush()
+        self.assertEqual(['networks', 'subnets', 'ports'],
+                         [call[0][1] for call in mock_sendjson.call_args_list])
+
+    def test_update_port_postcommit_coalesced(self):
+        config.cfg.CONF.set_override('update_coalescing_window', 100,
+                                     'ml2_odl')
+        self.mech.odl_drv.out_of_sync = False
+        context = self._get_mock_operation_context('port')
+        with mock.patch.object(client.OpenDaylightRestClient,
+                               'sendjson') as mock_sendjson:
+            self.mech.update_port_postcommit(context)
+            context.current['device_owner'] = 'compute:nova'
+            self.mech.update_port_postcommit(context)
+            self.assertFalse(mock_sendjson.called)
+            self.mech.odl_drv.flush_pending()
+        mock_sendjson.assert_called_once_with(
+            'put', 'ports/' + context.current['id'], {'port': mock.ANY})
+        port = mock_sendjson.call_args[0][2]['port']
+        self.assertEqual('compute:nova', port['device_owner'])
+
+    def test_delete_port_postcommit_discards_coalesced_update(self):
+        config.cfg.CONF.set_override('update_coalescing_window', 100,
+                                     'ml2_odl')
+        self.mech.odl_drv.out_of_sync = False
+        context = self._get_mock_operation_context('port')
+        with mock.patch.object(client.OpenDaylightRestClient,
+                               'sendjson') as mock_sendjson:
+            self.mech.update_port_postcommit(context)
+            self.mech.delete_port_postcommit(context)
+            self.mech.odl_drv.flush_pending()
+        mock_sendjson.assert_called_once_with(
+            'delete', 'ports/' + context.current['id'], None)
+
+    def test_port_security_groups_by_id(self):
+        config.cfg.CONF.set_override('port_security_groups', 'id',
+                                     'ml2_odl')
+        context = self._get_mock_operation_context('port')
+        port = context.current.copy()
+        self.mech.odl_drv.FILTER_MAP[
+            odl_const.ODL_PORTS].filter_update_attributes(port, context)
+        self.assertEqual(context.current['security_groups'],
+                         port['security_groups'])
+        self.assertFalse(context._plugin.get_security_group.called)
+
+    def test_queue_from_callback_failure_sets_out_of_sync(self):
+        self.mech.odl_drv.out_of_sync = False
+        with mock.patch.object(client.OpenDaylightRestClient, 'sendjson',
+                               side_effect=requests.exceptions.HTTPError):
+            op = self.mech.odl_drv.queue_from_callback(
+                'sg-1', odl_const.ODL_DELETE, 'security-groups', 'sg-1',
+                None)
+            op.wait()
+        self.assertTrue(self.mech.odl_drv.out_of_sync)
+
+    def test_queue_bulk_from_callback_failure_sets_out_of_sync(self):
+        self.mech.odl_drv.out_of_sync = False
+        with mock.patch.object(client.OpenDaylightRestClient, 'post_bulk',
+                               side_effect=requests.exceptions.HTTPError):
+            op = self.mech.odl_drv.queue_bulk_from_callback(
+                'sg-1', odl_const.ODL_SG_RULES, 'security-group-rules',
+                [{'id': 'rule-1'}, {'id': 'rule-2'}])
+            op.wait()
+        self.assertTrue(self.mech.odl_drv.out_of_sync)
+
     def test_port_emtpy_tenant_id_work_around(self):
         """Validate the work around code of port creation"""
         plugin = mock.Mock()
@@ -0,0 +1,193 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from networking_odl.openstack.common.cache._backends import memory
+
+from oslo_utils import timeutils
+from six.moves.urllib import parse
+import testtools
+
+
+def _cache(url='memory://'):
+    """Build a backend from a URL the way cache.get_cache does."""
+    parsed = parse.urlparse(url)
+    return memory.MemoryBackend(parsed,
+                                options=dict(parse.parse_qsl(parsed.query)))
+
+
+class MemoryBackendTestCase(testtools.TestCase):
+
+    def setUp(self):
+        super(MemoryBackendTestCase, self).setUp()
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+    def test_set_get(self):
+        cache = _cache()
+        self.assertTrue(cache.set('port', 'value', 0))
+        self.assertEqual('value', cache['port'])
+        self.assertIsNone(cache.get('missing'))
+        self.assertFalse(cache.set('port', 'other', 0, not_exists=True))
+        del cache['port']
+        self.assertNotIn('port', cache)
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, _cache, 'memory://?policy=fifo')
+
+    def test_lru_max_entries(self):
+        cache = _cache('memory://?max_entries=2&policy=lru')
+        cache['a'] = 1
+        cache['b'] = 2
+        cache.get('a')
+        cache['c'] = 3
+        self.assertEqual(2, len(cache))
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertIn('c', cache)
+
+    def test_lfu_max_entries(self):
+        cache = _cache('memory://?max_entries=2&policy=lfu')
+        cache['a'] = 1
+        cache['b'] = 2
+        for _i in range(3):
+            cache.get('b')
+        cache.get('a')
+        cache['c'] = 3
+        # a is less used than b, and c is the newest entry
+        self.assertNotIn('a', cache)
+        self.assertIn('b', cache)
+        cache['d'] = 4
+        self.assertNotIn('c', cache)
+        self.assertIn('b', cache)
+
+    def test_lfu_policy_after_remove(self):
+        policy = memory._LFUPolicy()
+        for key in 'abc':
+            policy.add(key)
+        policy.touch('b')
+        policy.touch('b')
+        policy.touch('c')
+        # Removing the least used key leaves c as the least used one
+        policy.remove('a')
+        self.assertEqual('c', policy.victim())
+        policy.touch('c')
+        policy.touch('c')
+        self.assertEqual('b', policy.victim())
+
+    def test_max_bytes(self):
+        cache = _cache('memory://?max_bytes=1000')
+        for i in range(100):
+            cache['key-%d' % i] = 'x' * 100
+        self.assertLessEqual(cache.size, 1000)
+        self.assertIn('key-99', cache)
+        self.assertNotIn('key-0', cache)
+        # An entry larger than the cache is not kept
+        self.assertFalse(cache.set('big', 'x' * 2000, 0))
+
+    def test_ttl(self):
+        cache = _cache('memory://?default_ttl=10')
+        cache['port'] = 'value'
+        cache.set('network', 'value', 0)
+        timeutils.advance_time_seconds(10)
+        self.assertNotIn('port', cache)
+        self.assertEqual('value', cache['network'])
+        self.assertEqual(1, len(cache))
+
+    def test_incr_append(self):
+        cache = _cache()
+        cache.set('count', 1, 10)
+        self.assertEqual(3, cache.incr('count', 2))
+        cache['list'] = [1]
+        self.assertEqual([1, 2, 3], cache.append_tail('list', [2, 3]))
+        self.assertIsNone(cache.incr('missing'))
+        timeutils.advance_time_seconds(10)
+        # Increments keep the expiry of the key
+        self.assertNotIn('count', cache)
+
+    def test_expired_keys_reclaimed(self):
+        cache = _cache()
+        for i in range(100):
+            cache.set('port-%d' % i, i, 10)
+        cache.set('network', 'value', 20)
+        timeutils.advance_time_seconds(10)
+        # Reclaimed without being read
+        cache.set('router', 'value', 0)
+        self.assertEqual(2, len(cache._cache))
+        self.assertEqual(1, len(cache._expiry))
+
+    def test_expired_keys_evicted_first(self):
+        cache = _cache('memory://?max_entries=2')
+        cache.set('a', 1, 0)
+        cache.set('b', 2, 5)
+        cache.get('b')
+        timeutils.advance_time_seconds(5)
+        cache.set('c', 3, 0)
+        self.assertIn('a', cache)
+        self.assertIn('c', cache)
+
+    def test_expiry_heap_bounded(self):
+        cache = _cache()
+        for i in range(10000):
+            timeutils.advance_time_seconds(0.001)
+            cache.set('port-%d' % (i % 10), i, 60)
+        self.assertEqual(10, len(cache))
+        self.assertLessEqual(len(cache._expiry),
+                             memory._MIN_HEAP_COMPACTION)
+
+    def test_reset_expiry(self):
+        cache = _cache()
+        cache.set('port', 1, 5)
+        cache.set('port', 2, 20)
+        timeutils.advance_time_seconds(10)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(2, cache['port'])
+
+    def test_get_many(self):
+        cache = _cache()
+        cache['a'] = 1
+        cache.set('b', 2, 5)
+        timeutils.advance_time_seconds(5)
+        self.assertEqual([('a', 1), ('b', None), ('c', None)],
+                         list(cache.get_many(['a', 'b', 'c'], None)))
+        self.assertEqual([('c', memory.backends.NOTSET)],
+                         list(cache.get_many(['c'])))
+
+    def test_set_many(self):
+        cache = _cache('memory://?max_entries=3')
+        cache['old'] = 0
+        cache.set_many(dict(('port-%d' % i, i) for i in range(5)), ttl=10)
+        self.assertEqual(3, len(cache))
+        self.assertNotIn('old', cache)
+        timeutils.advance_time_seconds(10)
+        cache.set('network', 'value', 0)
+        self.assertEqual(1, len(cache))
+        self.assertEqual([], cache._expiry)
+
+    def test_set_many_large_batch(self):
+        cache = _cache()
+        cache.set('port', 0, 100)
+        cache.set_many(dict(('port-%d' % i, i) for i in range(2000)), ttl=10)
+        self.assertEqual(2001, len(cache))
+        self.assertEqual(2001, len(cache._expiry))
+        timeutils.advance_time_seconds(10)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(0, cache['port'])
+
+    def test_unset_many(self):
+        cache = _cache()
+        cache.update(a=1, b=2, c=3)
+        cache.unset_many(['a', 'c', 'missing'])
+        self.assertEqual([('b', 2)], list(cache.get_many(['b'])))
+        self.assertEqual(1, len(cache))
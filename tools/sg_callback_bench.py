@@ -0,0 +1,58 @@
+#    Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Microbenchmark of OdlSecurityGroupsHandler.sg_callback.
+
+Measures the time spent in the callback itself for security group rule
+creates, the call to OpenDaylight being replaced by a mock.
+
+Usage: python tools/sg_callback_bench.py [iterations]
+"""
+from __future__ import print_function
+
+import sys
+import timeit
+
+import mock
+from neutron.callbacks import events
+from neutron.callbacks import resources
+
+from networking_odl.common import callback
+
+
+def main(argv):
+    iterations = int(argv[1]) if len(argv) > 1 else 100000
+    handler = callback.OdlSecurityGroupsHandler(mock.Mock())
+    rule = {'id': '3f5cdc3b-6a5c-4f8e-a3ce-b1b8a5cf3f5e',
+            'security_group_id': '2f9244b4-9bee-4e81-bc4a-3f3c2045b3d7',
+            'tenant_id': 'test-tenant',
+            'direction': 'ingress',
+            'ethertype': 'IPv4',
+            'protocol': 'tcp',
+            'port_range_min': 22,
+            'port_range_max': 22,
+            'remote_ip_prefix': '0.0.0.0/0',
+            'remote_group_id': None}
+    kwargs = {'context': mock.Mock(), 'security_group_rule': rule}
+
+    def run():
+        handler.sg_callback(resources.SECURITY_GROUP_RULE,
+                            events.AFTER_CREATE, 'trigger', **kwargs)
+
+    best = min(timeit.Timer(run).repeat(3, iterations))
+    print('%d callbacks in %.3fs, %.2fus per callback' %
+          (iterations, best, best * 1e6 / iterations))
+
+
+if __name__ == '__main__':
+    main(sys.argv)